@@ -0,0 +1,272 @@
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import random
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from compartilhado.constantes import (
+    URL_BASE_SERVIDOR, PASTA_RELATORIOS_CLIENTE, FORMATO_ENVIO_CLIENTE, COMPRESSAO_ENVIO_CLIENTE,
+    CARGA_CHEGADAS, CARGA_TAXA_RPS, CARGA_DURACAO_S, CARGA_USUARIOS, CARGA_TIMEOUT_S,
+    CARGA_PESOS_CASOS, CARGA_PESOS_ALGORITMOS, CARGA_EVITAR_CACHE
+)
+from compartilhado.formatos_sinal import serializar_sinal
+from cliente.main_cliente import MAPA_TESTES_VALIDOS, criar_csv_sinal_exemplo
+
+
+def _modulo_httpx():
+    # httpx é dependência opcional: só é necessária para o teste de carga
+    try:
+        import httpx
+    except ImportError as e:
+        raise ImportError("O teste de carga do cliente requer o pacote 'httpx'.") from e
+    return httpx
+
+
+def interpretar_pesos(texto: str, chaves_validas) -> dict:
+    # 'caso_30x30_1:3,caso_60x60_1:1' -> {'caso_30x30_1': 3.0, 'caso_60x60_1': 1.0}; vazio = pesos iguais
+    if not texto.strip():
+        return {chave: 1.0 for chave in chaves_validas}
+    pesos = {}
+    for item in texto.split(","):
+        chave, _, peso = item.strip().partition(":")
+        if chave not in chaves_validas:
+            raise ValueError(f"'{chave}' não é válido; use um de: {', '.join(chaves_validas)}")
+        pesos[chave] = float(peso or 1)
+    return pesos
+
+
+def gerar_chegadas(modo: str, taxa_rps: float, duracao_s: float, rng: random.Random) -> list[float]:
+    # Instantes de envio (s desde o início), independentes das respostas (malha aberta)
+    chegadas, instante = [], 0.0
+    while True:
+        instante += rng.expovariate(taxa_rps) if modo == "poisson" else 1.0 / taxa_rps
+        if instante >= duracao_s:
+            return chegadas
+        chegadas.append(instante)
+
+
+def percentis_ms(latencias: list) -> dict:
+    if not latencias:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "media_ms": None, "max_ms": None}
+    valores = np.asarray(latencias) * 1000
+    p50, p95, p99 = np.percentile(valores, [50, 95, 99])
+    return {"p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "media_ms": valores.mean(), "max_ms": valores.max()}
+
+
+def resumir(amostras: list, duracao_s: float) -> list[dict]:
+    # Uma linha por (modelo, algoritmo) e uma linha total; latências só das requisições bem-sucedidas
+    grupos = {}
+    for amostra in amostras:
+        grupos.setdefault((amostra["modelo_imagem_id"], amostra["algoritmo"]), []).append(amostra)
+    grupos[("total", "total")] = amostras
+
+    linhas = []
+    for (modelo, algoritmo), itens in sorted(grupos.items(), key=lambda g: g[0] == ("total", "total")):
+        sucessos = [a for a in itens if a["resultado"] == "sucesso"]
+        linhas.append({
+            "modelo_imagem_id": modelo,
+            "algoritmo": algoritmo,
+            "enviadas": len(itens),
+            "sucessos": len(sucessos),
+            "erros": sum(a["resultado"] == "erro" for a in itens),
+            "timeouts": sum(a["resultado"] == "timeout" for a in itens),
+            "vazao_rps": len(sucessos) / duracao_s if duracao_s > 0 else 0.0,
+            **percentis_ms([a["latencia_s"] for a in sucessos]),
+        })
+    return linhas
+
+
+class TesteCarga:
+    # Gerador de carga em malha aberta: as requisições partem nos instantes sorteados
+    # (Poisson ou taxa fixa) mesmo que as anteriores ainda não tenham voltado, limitadas a
+    # 'usuarios' simultâneas. A latência é medida a partir do instante previsto de envio,
+    # incluindo a espera por um usuário livre, para não esconder a fila quando o servidor satura.
+
+    def __init__(self, url_base: str = URL_BASE_SERVIDOR, chegadas: str = CARGA_CHEGADAS,
+                 taxa_rps: float = CARGA_TAXA_RPS, duracao_s: float = CARGA_DURACAO_S,
+                 usuarios: int = CARGA_USUARIOS, timeout_s: float = CARGA_TIMEOUT_S,
+                 pesos_casos: dict = None, pesos_algoritmos: dict = None,
+                 evitar_cache: bool = CARGA_EVITAR_CACHE, semente: int = None,
+                 formato_envio: str = FORMATO_ENVIO_CLIENTE, compressao: str = COMPRESSAO_ENVIO_CLIENTE):
+        if chegadas not in ("poisson", "fixa"):
+            raise ValueError("chegadas deve ser 'poisson' ou 'fixa'.")
+        self.url_base = url_base
+        self.chegadas = chegadas
+        self.taxa_rps = taxa_rps
+        self.duracao_s = duracao_s
+        self.usuarios = usuarios
+        self.timeout_s = timeout_s
+        self.pesos_casos = pesos_casos or interpretar_pesos(CARGA_PESOS_CASOS, MAPA_TESTES_VALIDOS)
+        self.pesos_algoritmos = pesos_algoritmos or interpretar_pesos(CARGA_PESOS_ALGORITMOS, ("CGNE", "CGNR", "SVD"))
+        self.evitar_cache = evitar_cache
+        self.formato_envio = formato_envio
+        self.compressao = compressao
+        self.rng = random.Random(semente)
+        self.amostras = []
+        self.duracao_real_s = 0.0
+        self._sinais = {}
+        self._perturbacoes = itertools.count() # envios com evitar_cache (seguro entre threads)
+
+    def configuracao(self) -> dict:
+        return {
+            "url_base": self.url_base,
+            "chegadas": self.chegadas,
+            "taxa_rps": self.taxa_rps,
+            "duracao_s": self.duracao_s,
+            "usuarios": self.usuarios,
+            "timeout_s": self.timeout_s,
+            "pesos_casos": self.pesos_casos,
+            "pesos_algoritmos": self.pesos_algoritmos,
+            "evitar_cache": self.evitar_cache,
+            "formato_envio": self.formato_envio,
+            "compressao": self.compressao,
+        }
+
+    def _carregar_sinais(self) -> None:
+        # Cada caso é lido uma única vez; com evitar_cache o vetor é perturbado a cada envio
+        for caso in self.pesos_casos:
+            teste = MAPA_TESTES_VALIDOS[caso]
+            if not os.path.exists(teste["caminho_csv_sinal"]):
+                criar_csv_sinal_exemplo(teste["caminho_csv_sinal"], teste["tamanho_vetor_g_esperado"])
+            vetor = pd.read_csv(teste["caminho_csv_sinal"], header=None).values.flatten()
+            self._sinais[caso] = (vetor, serializar_sinal(vetor, self.formato_envio, self.compressao))
+
+    def _conteudo_sinal(self, caso: str) -> tuple[bytes, str, str]:
+        vetor, serializado = self._sinais[caso]
+        if not self.evitar_cache:
+            return serializado
+        # Uma amostra deslocada de alguns ULPs na precisão de envio (uma perturbação relativa menor que
+        # o epsilon do float32 desapareceria na conversão): mesma reconstrução, outro endereço no cache.
+        # O n-ésimo envio desloca a amostra n % tamanho em 1 + n // tamanho ULPs, sem repetir conteúdos.
+        numero = next(self._perturbacoes)
+        perturbado = vetor.astype(np.float32 if self.formato_envio == "float32" else np.float64)
+        indice, ulps = numero % perturbado.size, 1 + numero // perturbado.size
+        perturbado[indice] += ulps * np.spacing(perturbado[indice])
+        return serializar_sinal(perturbado, self.formato_envio, self.compressao)
+
+    async def _enviar(self, cliente, usuarios_livres: asyncio.Semaphore, instante_previsto: float,
+                      inicio: float, numero: int) -> None:
+        caso = self.rng.choices(list(self.pesos_casos), weights=list(self.pesos_casos.values()))[0]
+        algoritmo = self.rng.choices(list(self.pesos_algoritmos), weights=list(self.pesos_algoritmos.values()))[0]
+        teste = MAPA_TESTES_VALIDOS[caso]
+        amostra = {
+            "numero": numero,
+            "caso": caso,
+            "modelo_imagem_id": teste["modelo_imagem_id"],
+            "algoritmo": algoritmo,
+            "instante_previsto_s": instante_previsto,
+            "status_code": None,
+            "resultado": None,
+            "detalhe": None,
+        }
+        async with usuarios_livres:
+            envio = time.perf_counter()
+            amostra["espera_usuario_s"] = envio - (inicio + instante_previsto)
+            conteudo, tipo, extensao = await asyncio.to_thread(self._conteudo_sinal, caso)
+            dados = {
+                "identificacao_usuario": f"carga_{numero % self.usuarios}",
+                "algoritmo_selecionado": algoritmo,
+                "modelo_imagem_id": teste["modelo_imagem_id"],
+                "dimensoes_imagem": list(teste["dimensoes_imagem_esperada"]),
+            }
+            nome_arquivo = os.path.splitext(os.path.basename(teste["caminho_csv_sinal"]))[0] + extensao
+            httpx = _modulo_httpx()
+            try:
+                resposta = await cliente.post(
+                    f"{self.url_base}/reconstruir_imagem/",
+                    data={"dados_json": json.dumps(dados)},
+                    files={"arquivo_sinal": (nome_arquivo, conteudo, tipo)},
+                )
+                amostra["status_code"] = resposta.status_code
+                if resposta.status_code == 200:
+                    amostra["resultado"] = "sucesso"
+                    amostra["numero_iteracoes"] = resposta.json()["metadados"].get("numero_iteracoes")
+                else:
+                    amostra["resultado"] = "erro"
+                    amostra["detalhe"] = resposta.text[:200]
+            except httpx.TimeoutException:
+                amostra["resultado"] = "timeout"
+            except httpx.HTTPError as e:
+                amostra["resultado"] = "erro"
+                amostra["detalhe"] = f"{type(e).__name__}: {e}"
+            fim = time.perf_counter()
+            amostra["tempo_servico_s"] = fim - envio
+            amostra["latencia_s"] = fim - (inicio + instante_previsto)
+        self.amostras.append(amostra)
+
+    async def executar(self) -> list[dict]:
+        httpx = _modulo_httpx()
+        self._carregar_sinais()
+        chegadas = gerar_chegadas(self.chegadas, self.taxa_rps, self.duracao_s, self.rng)
+        print(f"Teste de carga: {len(chegadas)} requisições ({self.chegadas}, {self.taxa_rps} req/s, "
+              f"{self.duracao_s:.0f} s, até {self.usuarios} simultâneas) para {self.url_base}...")
+
+        usuarios_livres = asyncio.Semaphore(self.usuarios)
+        # Conexões reaproveitadas entre as requisições de todos os usuários
+        limites = httpx.Limits(max_connections=self.usuarios, max_keepalive_connections=self.usuarios)
+        async with httpx.AsyncClient(timeout=self.timeout_s, limits=limites) as cliente:
+            inicio = time.perf_counter()
+            tarefas = []
+            for numero, instante in enumerate(chegadas):
+                espera = inicio + instante - time.perf_counter()
+                if espera > 0:
+                    await asyncio.sleep(espera)
+                tarefas.append(asyncio.ensure_future(self._enviar(cliente, usuarios_livres, instante, inicio, numero)))
+            await asyncio.gather(*tarefas)
+            self.duracao_real_s = time.perf_counter() - inicio
+        return self.amostras
+
+    def salvar_relatorios(self, pasta: str = PASTA_RELATORIOS_CLIENTE) -> dict:
+        # Resumo em CSV e JSON (com a configuração do teste) e as amostras individuais em CSV
+        os.makedirs(pasta, exist_ok=True)
+        resumo = resumir(self.amostras, self.duracao_real_s)
+        carimbo = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        caminhos = {
+            "resumo_csv": os.path.join(pasta, f"relatorio_carga_{carimbo}.csv"),
+            "resumo_json": os.path.join(pasta, f"relatorio_carga_{carimbo}.json"),
+            "amostras_csv": os.path.join(pasta, f"relatorio_carga_{carimbo}_requisicoes.csv"),
+        }
+        pd.DataFrame(resumo).to_csv(caminhos["resumo_csv"], index=False)
+        amostras = pd.DataFrame(self.amostras)
+        if not amostras.empty: # testes curtos ou de taxa baixa podem não sortear nenhuma chegada
+            amostras = amostras.sort_values("numero")
+        amostras.to_csv(caminhos["amostras_csv"], index=False)
+        with open(caminhos["resumo_json"], "w") as f:
+            json.dump({
+                "id_teste": str(uuid.uuid4()),
+                "data_hora": datetime.datetime.now().isoformat(),
+                "configuracao": self.configuracao(),
+                "duracao_real_s": self.duracao_real_s,
+                "resumo": resumo,
+            }, f, indent=4, default=float)
+        return caminhos
+
+
+def imprimir_resumo(resumo: list) -> None:
+    print(f"{'modelo':<16}{'algoritmo':<10}{'enviadas':>9}{'ok':>6}{'erros':>7}{'timeouts':>9}"
+          f"{'req/s':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for linha in resumo:
+        p = [f"{linha[k]:10.1f}" if linha[k] is not None else f"{'-':>10}" for k in ("p50_ms", "p95_ms", "p99_ms")]
+        print(f"{linha['modelo_imagem_id']:<16}{linha['algoritmo']:<10}{linha['enviadas']:>9}{linha['sucessos']:>6}"
+              f"{linha['erros']:>7}{linha['timeouts']:>9}{linha['vazao_rps']:>8.2f}{''.join(p)}")
+
+
+def executar_teste_carga(**parametros) -> dict:
+    teste = TesteCarga(**parametros)
+    asyncio.run(teste.executar())
+    caminhos = teste.salvar_relatorios()
+    print("\n--- Teste de carga concluído ---")
+    imprimir_resumo(resumir(teste.amostras, teste.duracao_real_s))
+    for caminho in caminhos.values():
+        print(f"Relatório salvo em: {caminho}")
+    return caminhos
+
+
+if __name__ == "__main__":
+    executar_teste_carga()
@@ -5,7 +5,6 @@ import datetime
 import uuid
 import numpy as np
 import pandas as pd
-import io
 import os
 import json
 import matplotlib.pyplot as plt
@@ -18,8 +17,10 @@ from compartilhado.constantes import (
     DIMENSOES_H_30X30, DIMENSOES_H_60X60, # Importa as dimensões das matrizes H
     DIMENSOES_IMAGEM_30X30, DIMENSOES_IMAGEM_60X60, # Importa as dimensões das imagens
     PASTA_MODELOS_SERVIDOR,
-    PASTA_IMAGENS_RECONSTRUIDAS_SERVIDOR
+    PASTA_IMAGENS_RECONSTRUIDAS_SERVIDOR,
+    FORMATO_ENVIO_CLIENTE, COMPRESSAO_ENVIO_CLIENTE, MODO_CLIENTE
 )
+from compartilhado.formatos_sinal import serializar_sinal
 
 # cria as pastas do cliente se não existirem
 os.makedirs(PASTA_IMAGENS_CLIENTE, exist_ok=True)
@@ -85,7 +86,8 @@ def criar_csv_sinal_exemplo(filepath: str, tamanho_g: int):
 
 # Funções do Cliente
 
-def simular_envio_requisicao():
+def simular_envio_requisicao(formato_envio: str = FORMATO_ENVIO_CLIENTE, compressao: str = COMPRESSAO_ENVIO_CLIENTE):
+    # formato_envio: 'csv', 'npy', 'float32' ou 'float64'; compressao: None, 'gzip' ou 'zstd'
     
     identificacao_usuario = f"usuario_{uuid.uuid4().hex[:8]}"
     algoritmo_selecionado = random.choice(["CGNE", "CGNR"])
@@ -106,10 +108,16 @@ def simular_envio_requisicao():
 
     # Ler o conteúdo do CSV
     try:
-        with open(caminho_csv_sinal, 'r') as f_csv:
-            csv_content = f_csv.read()
-        csv_buffer = io.StringIO(csv_content) # Cria um buffer em memória para enviar
-        csv_buffer.seek(0) # Retorna ao início do buffer para leitura
+        if formato_envio == "csv" and not compressao:
+            with open(caminho_csv_sinal, 'r') as f_csv:
+                csv_content = f_csv.read()
+            conteudo_sinal, tipo_conteudo = csv_content, 'text/csv'
+            nome_arquivo_sinal = os.path.basename(caminho_csv_sinal)
+        else:
+            # Envio binário: o CSV é lido uma vez aqui e convertido para o formato escolhido
+            vetor_sinal = pd.read_csv(caminho_csv_sinal, header=None).values.flatten()
+            conteudo_sinal, tipo_conteudo, extensao = serializar_sinal(vetor_sinal, formato_envio, compressao)
+            nome_arquivo_sinal = os.path.splitext(os.path.basename(caminho_csv_sinal))[0] + extensao
     except Exception as e:
         print(f"Erro ao ler o arquivo CSV {caminho_csv_sinal}: {e}")
         return None
@@ -123,7 +131,7 @@ def simular_envio_requisicao():
     }
 
     # Arquivos para a requisição multipart/form-data
-    files = {'arquivo_sinal': (os.path.basename(caminho_csv_sinal), csv_buffer.getvalue(), 'text/csv')}
+    files = {'arquivo_sinal': (nome_arquivo_sinal, conteudo_sinal, tipo_conteudo)}
 
     # Enviar a requisição
     print(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] Enviando requisição de {identificacao_usuario} para {algoritmo_selecionado} ({dimensoes_imagem[0]}x{dimensoes_imagem[1]}) usando sinal de {os.path.basename(caminho_csv_sinal)}...")
@@ -217,7 +225,7 @@ def gerar_relatorio_imagens_reconstruidas(resultados: list):
             PASTA_IMAGENS_RECONSTRUIDAS_SERVIDOR, 
             res['caminho_imagem_servidor']
         )
-        caminho_imagem_cliente_local = os.path.join(PASTA_IMAGENS_CLIENTE, res['caminho_imagem_servidor'])
+        caminho_imagem_cliente_local = os.path.join(PASTA_IMAGENS_CLIENTE, os.path.basename(res['caminho_imagem_servidor']))
         
         if os.path.exists(caminho_imagem_servidor_completo):
             try:
@@ -330,6 +338,12 @@ if __name__ == "__main__":
             criar_csv_sinal_exemplo(val["caminho_csv_sinal"], val["tamanho_vetor_g_esperado"])
 
 
+    if MODO_CLIENTE == "carga":
+        # Teste de carga em malha aberta (cliente/carga.py): relatórios CSV/JSON de latência e vazão
+        from cliente.carga import executar_teste_carga
+        executar_teste_carga()
+        raise SystemExit
+
     # Passo 3: Iniciar a simulação de envio de requisições 
     resultados_reconstrucao = []
     dados_desempenho_servidor = []
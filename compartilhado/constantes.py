@@ -10,33 +10,251 @@ DIMENSOES_IMAGEM_PADRAO = DIMENSOES_IMAGEM_30X30
 DIMENSOES_H_30X30 = (27904, 900)
 S_PARA_GANHO_30X30 = 436 # Amostras do sinal
 N_PARA_GANHO_30X30 = 64  # Elementos sensores 
-MAX_ITERACOES_30X30 = 10 
+MAX_ITERACOES_30X30 = int(os.getenv('MAX_ITERACOES_30X30', 100)) # limite de segurança (ver PARADA_*)
 TOLERANCIA_30X30 = 1e-4 
 
 # Modelo 60x60 pixels
 DIMENSOES_H_60X60 = (50816, 3600)
 S_PARA_GANHO_60X60 = 794
 N_PARA_GANHO_60X60 = 64
-MAX_ITERACOES_60X60 = 10
-TOLERANCIA_60X60 = 1e-4 
+MAX_ITERACOES_60X60 = int(os.getenv('MAX_ITERACOES_60X60', 100))
+TOLERANCIA_60X60 = 1e-4
+
+# Valores usados para modelos descobertos na pasta de modelos sem esses campos no manifesto
+N_SENSORES_PADRAO = 64
+MAX_ITERACOES_PADRAO = int(os.getenv('MAX_ITERACOES', 100))
+TOLERANCIA_PADRAO = 1e-4
+
+# Parada dos algoritmos iterativos (CGNE/CGNR). MAX_ITERACOES é só o limite de segurança; cada
+# sinal para quando o primeiro critério é atendido:
+# - tolerância: resíduo relativo das equações normais ||Hᵀg - (HᵀH + lambda·I)f|| / ||Hᵀg|| abaixo de
+#   TOLERANCIA (a mesma definição nos dois algoritmos), avaliada após PARADA_MIN_ITERACOES;
+# - discrepância: ||g - Hf|| <= tau·σ·√m, com σ o ruído por amostra de g (PARADA_RUIDO_SINAL,
+#   'auto' estima pelas diferenças entre amostras vizinhas); PARADA_TAU_DISCREPANCIA 0 desativa;
+# - estagnação: ||g - Hf|| caiu menos que a fração PARADA_REDUCAO_ESTAGNACAO nas últimas
+#   PARADA_JANELA_ESTAGNACAO iterações (0 desativa);
+# - tempo: PARADA_TEMPO_MAXIMO_S segundos de algoritmo (0 desativa).
+# Valem para todos os modelos; o manifesto pode defini-los por modelo (min_iteracoes, tau_discrepancia,
+# ruido_sinal, janela_estagnacao, reducao_estagnacao, tempo_maximo_s).
+PARADA_MIN_ITERACOES = int(os.getenv('PARADA_MIN_ITERACOES', 2))
+PARADA_TAU_DISCREPANCIA = float(os.getenv('PARADA_TAU_DISCREPANCIA', 0))
+PARADA_RUIDO_SINAL = os.getenv('PARADA_RUIDO_SINAL', 'auto')
+PARADA_JANELA_ESTAGNACAO = int(os.getenv('PARADA_JANELA_ESTAGNACAO', 3))
+PARADA_REDUCAO_ESTAGNACAO = float(os.getenv('PARADA_REDUCAO_ESTAGNACAO', 1e-4))
+PARADA_TEMPO_MAXIMO_S = float(os.getenv('PARADA_TEMPO_MAXIMO_S', 0))
+
+# Armazenamento das matrizes H: 'densa', 'esparsa' (CSR) ou 'auto' (esparsa se a
+# fração de não nulos ficar abaixo do limiar)
+FORMATO_MATRIZ_H = os.getenv('FORMATO_MATRIZ_H', 'densa')
+LIMIAR_DENSIDADE_ESPARSA = float(os.getenv('LIMIAR_DENSIDADE_ESPARSA', 0.25))
+
+# Operador fora da memória: modelos densos cuja H (na precisão usada) passa de LIMITE_H_EM_MEMORIA_MB
+# ficam em disco em blocos de linhas de ~BLOCOS_H_MB (pasta matriz_h_<id>_blocos_<precisão>, gerada
+# a partir do .npy na primeira carga) e os produtos com H e Hᵀ percorrem os blocos em BLOCOS_H_THREADS
+# threads, com BLOCOS_H_ANTECIPADOS blocos pedidos ao disco à frente. BLOCOS_H_COMPRESSAO='zlib'
+# comprime os blocos (menos disco e leitura, mais CPU a cada passagem). HᵀH só é usada se também
+# couber no limite. 0 = sempre em memória.
+LIMITE_H_EM_MEMORIA_MB = float(os.getenv('LIMITE_H_EM_MEMORIA_MB', 0))
+BLOCOS_H_MB = float(os.getenv('BLOCOS_H_MB', 64))
+BLOCOS_H_THREADS = int(os.getenv('BLOCOS_H_THREADS', min(4, os.cpu_count() or 1)))
+BLOCOS_H_ANTECIPADOS = int(os.getenv('BLOCOS_H_ANTECIPADOS', 2))
+BLOCOS_H_COMPRESSAO = os.getenv('BLOCOS_H_COMPRESSAO') or None # None ou 'zlib'
+
+# Modo compartilhado: matrizes H densas abertas com mmap (somente leitura), de modo que
+# todos os workers do uvicorn usem as mesmas páginas da cache do SO
+MODELOS_COMPARTILHADOS = os.getenv('MODELOS_COMPARTILHADOS', '0') == '1'
+# Modelos carregados e aquecidos na inicialização, com uma reconstrução de teste (separados por
+# vírgula); /prontidao/ responde 503 até todos estarem prontos e eles nunca são descartados
+MODELOS_PRE_CARREGADOS = [m.strip() for m in os.getenv('MODELOS_PRE_CARREGADOS', '').split(',') if m.strip()]
+
+# Limite (MB) para os operadores dos modelos em memória; acima dele os modelos menos usados
+# são descartados, exceto os pré-carregados (0 = sem limite). Estruturas mapeadas de arquivos
+# (modo compartilhado) não contam: são páginas do cache do SO, que o kernel pode descartar
+LIMITE_MEMORIA_MODELOS_MB = float(os.getenv('LIMITE_MEMORIA_MODELOS_MB', 0))
+
+# Micro-lotes: requisições simultâneas do mesmo modelo e algoritmo resolvidas juntas (multi-RHS)
+LOTES_ATIVOS = os.getenv('LOTES_ATIVOS', '0') == '1'
+LOTE_TAMANHO_MAXIMO = int(os.getenv('LOTE_TAMANHO_MAXIMO', 8))
+LOTE_ESPERA_MAXIMA_MS = float(os.getenv('LOTE_ESPERA_MAXIMA_MS', 5))
+# Envio em lote (/reconstruir_lote/): máximo de sinais por envio; os sinais são resolvidos em blocos
+# multi-RHS de LOTE_TAMANHO_MAXIMO e o resultado de cada bloco é enviado assim que fica pronto
+LOTE_ENVIO_MAXIMO_SINAIS = int(os.getenv('LOTE_ENVIO_MAXIMO_SINAIS', 256))
+# Envio em fluxo (/reconstruir_fluxo/): a cada FLUXO_LINHAS_POR_BLOCO valores recebidos, o trecho do
+# sinal recebe o ganho e sua parcela de Hᵀg é somada, usando o bloco de linhas correspondente de H
+FLUXO_LINHAS_POR_BLOCO = int(os.getenv('FLUXO_LINHAS_POR_BLOCO', 4096))
+# Envios em fluxo recebidos ao mesmo tempo: cada um mantém g e Hᵀg do modelo em memória até a tarefa
+# ser submetida; acima disso a requisição recebe 503 antes de o corpo ser lido
+FLUXO_MAXIMO_SIMULTANEOS = int(os.getenv('FLUXO_MAXIMO_SIMULTANEOS', 4))
+
+# Fila de tarefas: reconstruções simultâneas por modelo, tamanho máximo da fila de cada
+# modelo e de tarefas pendentes por usuário (acima disso a requisição recebe 503/429)
+CONCORRENCIA_TAREFAS = {
+    "30x30_modelo1": int(os.getenv('CONCORRENCIA_TAREFAS_30X30', 4)),
+    "60x60_modelo1": int(os.getenv('CONCORRENCIA_TAREFAS_60X60', 1)),
+}
+CONCORRENCIA_TAREFAS_PADRAO = 1
+CAPACIDADE_FILA_TAREFAS = int(os.getenv('CAPACIDADE_FILA_TAREFAS', 32))
+TAREFAS_MAXIMAS_POR_USUARIO = int(os.getenv('TAREFAS_MAXIMAS_POR_USUARIO', 8))
+TAREFAS_RETIDAS = int(os.getenv('TAREFAS_RETIDAS', 1000)) # tarefas finalizadas mantidas para consulta
+
+# Acompanhamento das reconstruções: intervalo entre eventos de progresso (SSE) e entre as
+# verificações de desconexão do cliente, que cancela a reconstrução abandonada
+INTERVALO_PROGRESSO_MS = float(os.getenv('INTERVALO_PROGRESSO_MS', 100))
+INTERVALO_VERIFICACAO_DESCONEXAO_MS = float(os.getenv('INTERVALO_VERIFICACAO_DESCONEXAO_MS', 250))
+
+# Intervalo entre as amostras de CPU e memória feitas em segundo plano (/metrics e /status_servidor/)
+INTERVALO_AMOSTRAGEM_CPU_S = float(os.getenv('INTERVALO_AMOSTRAGEM_CPU_S', 1.0))
+
+# Backend de execução dos algoritmos: 'thread' (pool padrão), 'processo' (pool de processos
+# com as matrizes H em memória compartilhada) ou 'inline' (no próprio event loop)
+BACKEND_EXECUCAO = os.getenv('BACKEND_EXECUCAO', 'thread')
+PROCESSOS_SOLVER = int(os.getenv('PROCESSOS_SOLVER', os.cpu_count() or 1))
+TAREFAS_POR_PROCESSO = int(os.getenv('TAREFAS_POR_PROCESSO', 100)) # reciclagem dos workers (0 = nunca)
+
+# Orçamento de threads do BLAS: as reconstruções em execução dividem ORCAMENTO_NUCLEOS_BLAS núcleos
+# e cada uma recebe seu próprio limite de threads do BLAS (requer threadpoolctl), em vez de todas
+# disputarem todos os núcleos. A parcela é o orçamento dividido pela demanda (reconstruções em
+# execução, aguardando núcleos e na fila com worker livre), dentro dos limites do modelo: o 30x30 roda em muitas
+# reconstruções de uma thread; o 60x60, em poucas e largas. Uma reconstrução só começa quando há
+# ao menos o mínimo do modelo livre. 0 = desativado (cada chamada usa o padrão do BLAS).
+# Vale apenas nos backends 'processo' e 'inline': no 'thread' o limite do BLAS é do processo inteiro
+# e é ignorado (com aviso na inicialização).
+ORCAMENTO_NUCLEOS_BLAS = int(os.getenv('ORCAMENTO_NUCLEOS_BLAS', 0))
+THREADS_BLAS_MINIMO = {
+    "30x30_modelo1": int(os.getenv('THREADS_BLAS_MINIMO_30X30', 1)),
+    "60x60_modelo1": int(os.getenv('THREADS_BLAS_MINIMO_60X60', 2)),
+}
+THREADS_BLAS_MAXIMO = { # 0 = todo o orçamento
+    "30x30_modelo1": int(os.getenv('THREADS_BLAS_MAXIMO_30X30', 1)),
+    "60x60_modelo1": int(os.getenv('THREADS_BLAS_MAXIMO_60X60', 0)),
+}
+THREADS_BLAS_MINIMO_PADRAO = 1
+THREADS_BLAS_MAXIMO_PADRAO = 0
+
+# Precisão das reconstruções: 'float64' ou 'float32' (H mantida e algoritmos executados em
+# precisão simples). Pode ser definida por modelo e sobrescrita em cada requisição.
+PRECISAO_PADRAO = os.getenv('PRECISAO_PADRAO', 'float64')
+PRECISAO_MODELOS = {
+    "30x30_modelo1": os.getenv('PRECISAO_30X30', PRECISAO_PADRAO),
+    "60x60_modelo1": os.getenv('PRECISAO_60X60', PRECISAO_PADRAO),
+}
+ACUMULAR_FLOAT64 = os.getenv('ACUMULAR_FLOAT64', '1') == '1' # produtos internos acumulados em float64 no modo float32
+COMPARAR_PRECISAO = os.getenv('COMPARAR_PRECISAO', '0') == '1' # reconstruções float32 também resolvidas em float64
+
+# Precondicionador dos algoritmos CGNE/CGNR, por modelo: '' (nenhum), 'jacobi' (normas das
+# colunas de H) ou 'bloco' / 'bloco:<tamanho>' (blocos diagonais de HᵀH invertidos)
+PRECONDICIONADOR_PADRAO = os.getenv('PRECONDICIONADOR', '')
+PRECONDICIONADOR_MODELOS = {
+    "30x30_modelo1": os.getenv('PRECONDICIONADOR_30X30', PRECONDICIONADOR_PADRAO),
+    "60x60_modelo1": os.getenv('PRECONDICIONADOR_60X60', PRECONDICIONADOR_PADRAO),
+}
+TAMANHO_BLOCO_PRECONDICIONADOR = int(os.getenv('TAMANHO_BLOCO_PRECONDICIONADOR', 64))
+
+# Reconstrução direta (algoritmo 'SVD'): número de valores singulares usados na solução de
+# Tikhonov, por modelo (0 = todos, solução idêntica à das equações normais regularizadas)
+POSTO_SVD_PADRAO = int(os.getenv('POSTO_SVD', 0))
+POSTO_SVD_MODELOS = {
+    "30x30_modelo1": int(os.getenv('POSTO_SVD_30X30', POSTO_SVD_PADRAO)),
+    "60x60_modelo1": int(os.getenv('POSTO_SVD_60X60', POSTO_SVD_PADRAO)),
+}
+
+# Cache de resultados: requisições idênticas (mesmo sinal, modelo e parâmetros) reaproveitam a
+# reconstrução já feita. Limites em MB para o nível em memória e para o nível em disco.
+CACHE_RESULTADOS_ATIVO = os.getenv('CACHE_RESULTADOS_ATIVO', '1') == '1'
+CACHE_LIMITE_MEMORIA_MB = float(os.getenv('CACHE_LIMITE_MEMORIA_MB', 64))
+CACHE_LIMITE_DISCO_MB = float(os.getenv('CACHE_LIMITE_DISCO_MB', 256))
+
+# Partida aquecida: requisições com 'sessao_id' (ou 'frame_anterior', o id de uma reconstrução
+# anterior) partem, no CGNE/CGNR, da última solução da sessão em vez de zeros. Quadros
+# consecutivos da mesma sonda são muito parecidos e atingem a tolerância em menos iterações.
+# Guarda até SESSOES_CAPACIDADE soluções (0 desativa), descartadas após SESSOES_TTL_S sem uso.
+SESSOES_CAPACIDADE = int(os.getenv('SESSOES_CAPACIDADE', 256))
+SESSOES_TTL_S = float(os.getenv('SESSOES_TTL_S', 300))
+
+# Persistência das reconstruções: 'sqlite' (imagens e metadados gravados em segundo plano, em
+# lotes, com índice consultável em /reconstrucoes) ou 'arquivos' (PNG + JSON gravados na requisição)
+PERSISTENCIA_RECONSTRUCOES = os.getenv('PERSISTENCIA_RECONSTRUCOES', 'sqlite')
+GRAVACAO_LOTE_MAXIMO = int(os.getenv('GRAVACAO_LOTE_MAXIMO', 256)) # registros por transação
+GRAVACAO_INTERVALO_MS = float(os.getenv('GRAVACAO_INTERVALO_MS', 200)) # espera máxima para completar um lote
 
 # Caminhos
 PASTA_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 PASTA_MODELOS_SERVIDOR = os.path.join(PASTA_PROJETO, 'servidor', 'modelos')
+ARQUIVO_MANIFESTO_MODELOS = os.getenv('ARQUIVO_MANIFESTO_MODELOS', os.path.join(PASTA_MODELOS_SERVIDOR, 'modelos.json'))
 PASTA_IMAGENS_RECONSTRUIDAS_SERVIDOR = os.path.join(PASTA_PROJETO, 'servidor', 'imagens_reconstruidas')
 PASTA_METADADOS_RECONSTRUCAO = os.path.join(PASTA_PROJETO, 'servidor', 'metadados_reconstrucao')
+PASTA_CACHE_RESULTADOS = os.path.join(PASTA_PROJETO, 'servidor', 'cache_resultados')
+ARQUIVO_BANCO_RECONSTRUCOES = os.getenv('ARQUIVO_BANCO_RECONSTRUCOES', os.path.join(PASTA_PROJETO, 'servidor', 'reconstrucoes.db'))
 PASTA_RELATORIOS_CLIENTE = os.path.join(PASTA_PROJETO, 'cliente', 'relatorios')
 PASTA_IMAGENS_CLIENTE = os.path.join(PASTA_RELATORIOS_CLIENTE, 'imagens_reconstruidas')
 PASTA_DESEMPENHO_CLIENTE = os.path.join(PASTA_RELATORIOS_CLIENTE, 'desempenho_servidor')
 PASTA_SINAIS_TESTE_CLIENTE = os.path.join(PASTA_PROJETO, 'cliente', 'sinais_teste')
+PASTA_BENCHMARKS = os.path.join(PASTA_PROJETO, 'servidor', 'benchmarks')
+
+# Benchmark dos algoritmos (python -m servidor.benchmark_solvers), sem servidor nem os modelos reais:
+# matrizes H sintéticas com a geometria de um modelo ('30x30', '60x60', '90x90' ou '<linhas>x<colunas>'),
+# fração de não nulos e número de condição aproximado configuráveis. BENCHMARK_THREADS limita as threads
+# do BLAS em cada rodada (ex.: '1,2,4'; vazio = padrão do BLAS). Com BENCHMARK_BASE (JSON de uma execução
+# anterior), medianas BENCHMARK_LIMIAR_REGRESSAO acima da base são apontadas como regressões.
+BENCHMARK_GEOMETRIAS = os.getenv('BENCHMARK_GEOMETRIAS', '30x30')
+BENCHMARK_ALGORITMOS = os.getenv('BENCHMARK_ALGORITMOS', 'CGNE,CGNR') # 'CGNE', 'CGNR', 'SVD' ou '<algoritmo>:<precondicionador>'
+BENCHMARK_DTYPES = os.getenv('BENCHMARK_DTYPES', 'float64,float32')
+BENCHMARK_THREADS = os.getenv('BENCHMARK_THREADS', '')
+BENCHMARK_DENSIDADE = float(os.getenv('BENCHMARK_DENSIDADE', 1.0))
+BENCHMARK_CONDICIONAMENTO = float(os.getenv('BENCHMARK_CONDICIONAMENTO', 1e3))
+BENCHMARK_ITERACOES = int(os.getenv('BENCHMARK_ITERACOES', 10)) # iterações fixas por reconstrução (sem parada por tolerância)
+BENCHMARK_REPETICOES = int(os.getenv('BENCHMARK_REPETICOES', 5))
+BENCHMARK_SEMENTE = int(os.getenv('BENCHMARK_SEMENTE', 0))
+BENCHMARK_BASE = os.getenv('BENCHMARK_BASE', '')
+BENCHMARK_LIMIAR_REGRESSAO = float(os.getenv('BENCHMARK_LIMIAR_REGRESSAO', 0.10))
 
 # Configurações do servidor
 PORTA_SERVIDOR = int(os.getenv('PORTA_SERVIDOR', 8000))
 HOST_SERVIDOR = os.getenv('HOST_SERVIDOR', '127.0.0.1')
 URL_BASE_SERVIDOR = f"http://{HOST_SERVIDOR}:{PORTA_SERVIDOR}"
 
+# Gateway (python -m servidor.gateway): expõe /reconstruir_imagem/ e /status_servidor/ e distribui as
+# requisições entre vários servidores de reconstrução. Cada modelo fica com os GATEWAY_NOS_POR_MODELO
+# primeiros nós do anel de hash consistente a partir do seu id, para que só eles carreguem sua H. Um nó
+# com GATEWAY_LIMITE_EM_ANDAMENTO requisições em andamento ou CPU acima de GATEWAY_LIMITE_CPU_PERCENT
+# está saturado e a requisição transborda para o próximo nó do anel. Nós que falham
+# GATEWAY_FALHAS_PARA_REMOVER verificações seguidas (ou não estão prontos) saem da rotação até voltarem.
+# Com GATEWAY_BACKENDS_LOCAIS > 0 o gateway sobe esse número de servidores neste host, em portas
+# consecutivas a partir de GATEWAY_PORTA_BACKENDS_LOCAIS, no lugar de GATEWAY_BACKENDS.
+GATEWAY_BACKENDS = [u.strip() for u in os.getenv('GATEWAY_BACKENDS', 'http://127.0.0.1:8001,http://127.0.0.1:8002').split(',') if u.strip()]
+GATEWAY_BACKENDS_LOCAIS = int(os.getenv('GATEWAY_BACKENDS_LOCAIS', 0))
+GATEWAY_PORTA_BACKENDS_LOCAIS = int(os.getenv('GATEWAY_PORTA_BACKENDS_LOCAIS', 8001))
+GATEWAY_HOST = os.getenv('GATEWAY_HOST', HOST_SERVIDOR)
+GATEWAY_PORTA = int(os.getenv('GATEWAY_PORTA', 8080))
+GATEWAY_NOS_POR_MODELO = int(os.getenv('GATEWAY_NOS_POR_MODELO', 2))
+GATEWAY_REPLICAS_VIRTUAIS = int(os.getenv('GATEWAY_REPLICAS_VIRTUAIS', 64)) # pontos de cada nó no anel
+GATEWAY_LIMITE_EM_ANDAMENTO = int(os.getenv('GATEWAY_LIMITE_EM_ANDAMENTO', 4))
+GATEWAY_LIMITE_CPU_PERCENT = float(os.getenv('GATEWAY_LIMITE_CPU_PERCENT', 90))
+GATEWAY_TENTATIVAS = int(os.getenv('GATEWAY_TENTATIVAS', 3)) # nós tentados por requisição (falha de conexão ou 503)
+GATEWAY_CONEXOES_POR_NO = int(os.getenv('GATEWAY_CONEXOES_POR_NO', 32)) # conexões mantidas abertas com cada nó
+GATEWAY_TIMEOUT_S = float(os.getenv('GATEWAY_TIMEOUT_S', 300))
+GATEWAY_INTERVALO_SAUDE_S = float(os.getenv('GATEWAY_INTERVALO_SAUDE_S', 5))
+GATEWAY_TIMEOUT_SAUDE_S = float(os.getenv('GATEWAY_TIMEOUT_SAUDE_S', 2))
+GATEWAY_FALHAS_PARA_REMOVER = int(os.getenv('GATEWAY_FALHAS_PARA_REMOVER', 2))
+
 
 # Configurações de simulação do cliente
 MIN_INTERVALO_ENVIO_SINAIS = 0.5 # segundos
 MAX_INTERVALO_ENVIO_SINAIS = 2.0 # segundos
-NUM_REQUISICOES_CLIENTE = 6 # Número de imagens a serem enviadas pelo cliente
\ No newline at end of file
+NUM_REQUISICOES_CLIENTE = 6 # Número de imagens a serem enviadas pelo cliente
+FORMATO_ENVIO_CLIENTE = os.getenv('FORMATO_ENVIO_CLIENTE', 'csv') # 'csv', 'npy', 'float32' ou 'float64'
+COMPRESSAO_ENVIO_CLIENTE = os.getenv('COMPRESSAO_ENVIO_CLIENTE') or None # None, 'gzip' ou 'zstd'
+
+# Teste de carga do cliente (MODO_CLIENTE='carga' ou python -m cliente.carga): chegadas em malha
+# aberta ('poisson' ou 'fixa') a CARGA_TAXA_RPS requisições/s durante CARGA_DURACAO_S segundos,
+# com no máximo CARGA_USUARIOS requisições simultâneas. Pesos no formato 'chave:peso,...'
+# (vazio = pesos iguais para os casos de teste; CGNE e CGNR para os algoritmos).
+MODO_CLIENTE = os.getenv('MODO_CLIENTE', 'simulacao') # 'simulacao' ou 'carga'
+CARGA_CHEGADAS = os.getenv('CARGA_CHEGADAS', 'poisson')
+CARGA_TAXA_RPS = float(os.getenv('CARGA_TAXA_RPS', 2.0))
+CARGA_DURACAO_S = float(os.getenv('CARGA_DURACAO_S', 30))
+CARGA_USUARIOS = int(os.getenv('CARGA_USUARIOS', 8))
+CARGA_TIMEOUT_S = float(os.getenv('CARGA_TIMEOUT_S', 120))
+CARGA_PESOS_CASOS = os.getenv('CARGA_PESOS_CASOS', '')
+CARGA_PESOS_ALGORITMOS = os.getenv('CARGA_PESOS_ALGORITMOS', 'CGNE:1,CGNR:1')
+CARGA_EVITAR_CACHE = os.getenv('CARGA_EVITAR_CACHE', '1') == '1' # sinais levemente perturbados a cada envio
\ No newline at end of file
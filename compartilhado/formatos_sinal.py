@@ -0,0 +1,231 @@
+import gzip
+import io
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+# Tipos de conteúdo aceitos para o arquivo do sinal g. Os binários podem vir comprimidos
+# (sufixo '+gzip'/'+zstd' no tipo, extensão .gz/.zst ou simplesmente pelos bytes mágicos).
+TIPO_CSV = "text/csv"
+TIPO_NPY = "application/x-npy"
+TIPO_FLOAT32 = "application/x-float32" # bruto little-endian; parâmetro opcional '; length=N'
+TIPO_FLOAT64 = "application/x-float64"
+
+FORMATOS_ENVIO = {
+    # formato -> (tipo de conteúdo, extensão)
+    "csv": (TIPO_CSV, ".csv"),
+    "npy": (TIPO_NPY, ".npy"),
+    "float32": (TIPO_FLOAT32, ".f32"),
+    "float64": (TIPO_FLOAT64, ".f64"),
+}
+
+_DTYPES_BRUTOS = {TIPO_FLOAT32: np.dtype("<f4"), TIPO_FLOAT64: np.dtype("<f8")}
+_EXTENSOES = {".npy": TIPO_NPY, ".f32": TIPO_FLOAT32, ".f64": TIPO_FLOAT64, ".csv": TIPO_CSV}
+_MAGICO_GZIP = b"\x1f\x8b"
+_MAGICO_ZSTD = b"\x28\xb5\x2f\xfd"
+_MAGICO_ZIP = b"PK\x03\x04"
+# Limite de bytes descomprimidos de um sinal de n valores nos lotes: n·_BYTES_POR_VALOR (um valor
+# em CSV ocupa até ~25 caracteres) mais _BYTES_CABECALHO (cabeçalho .npy, entrada do .zip)
+_BYTES_POR_VALOR = 32
+_BYTES_CABECALHO = 64 * 1024
+
+
+class LimiteExcedido(ValueError):
+    # Envio maior que o permitido (sinais demais ou conteúdo descomprimido grande demais)
+    pass
+
+
+def _modulo_zstd():
+    # zstandard é dependência opcional: só é necessária para sinais comprimidos com zstd
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("Sinais comprimidos com zstd requerem o pacote 'zstandard'.") from e
+    return zstandard
+
+
+def _descomprimir(conteudo: bytes, limite_bytes: int = None) -> bytes:
+    # Com limite_bytes, a descompressão para (LimiteExcedido) assim que o passa
+    if conteudo[:2] == _MAGICO_GZIP:
+        if limite_bytes is None:
+            return gzip.decompress(conteudo)
+        return _ler_limitado(gzip.GzipFile(fileobj=io.BytesIO(conteudo)), limite_bytes)
+    if conteudo[:4] == _MAGICO_ZSTD:
+        if limite_bytes is None:
+            return _modulo_zstd().ZstdDecompressor().decompress(conteudo, max_output_size=1 << 31)
+        return _ler_limitado(_modulo_zstd().ZstdDecompressor().stream_reader(io.BytesIO(conteudo)), limite_bytes)
+    return conteudo
+
+
+def _ler_limitado(leitor, limite_bytes: int) -> bytes:
+    partes, total = [], 0
+    while True:
+        parte = leitor.read(min(1 << 20, limite_bytes + 1 - total))
+        if not parte:
+            return b"".join(partes)
+        partes.append(parte)
+        total += len(parte)
+        if total > limite_bytes:
+            raise LimiteExcedido(f"Conteúdo descomprimido maior que o limite de {limite_bytes} bytes.")
+
+
+def _interpretar_tipo(tipo_conteudo: str, nome_arquivo: str) -> tuple[str, dict]:
+    # 'application/x-float32+gzip; length=27904' -> ('application/x-float32', {'length': '27904'})
+    partes = [p.strip() for p in (tipo_conteudo or "").split(";")]
+    tipo = partes[0].lower().split("+")[0]
+    parametros = dict(p.split("=", 1) for p in partes[1:] if "=" in p)
+
+    if tipo not in (TIPO_CSV, TIPO_NPY, TIPO_FLOAT32, TIPO_FLOAT64):
+        # Tipo genérico (ex.: application/octet-stream): decide pela extensão do arquivo
+        nome = (nome_arquivo or "").lower()
+        for sufixo in (".gz", ".zst"):
+            if nome.endswith(sufixo):
+                nome = nome[:-len(sufixo)]
+        tipo = next((t for ext, t in _EXTENSOES.items() if nome.endswith(ext)), TIPO_CSV)
+    return tipo, parametros
+
+
+def ler_sinal(conteudo: bytes, tipo_conteudo: str = None, nome_arquivo: str = None,
+              limite_bytes: int = None) -> np.ndarray:
+    # Converte o arquivo enviado no vetor g; formatos binários são lidos sem cópia (np.frombuffer).
+    # limite_bytes: máximo do conteúdo descomprimido
+    tipo, parametros = _interpretar_tipo(tipo_conteudo, nome_arquivo)
+    conteudo = _descomprimir(conteudo, limite_bytes)
+
+    if tipo == TIPO_CSV:
+        return pd.read_csv(io.StringIO(conteudo.decode('utf-8')), header=None).values.flatten()
+
+    if tipo == TIPO_NPY:
+        return _ler_npy(conteudo).ravel()
+
+    return _ler_bruto(conteudo, tipo, parametros)
+
+
+class LeitorSinalIncremental:
+    # Sinal recebido em partes (upload em fluxo), convertido parte a parte nos valores já completos:
+    # binário bruto (float32/float64) ou CSV com um valor por linha. O pedaço de um valor cortado no
+    # fim de uma parte fica guardado para a seguinte. Sem compressão nem .npy (cabeçalho antes dos dados).
+
+    def __init__(self, tipo_conteudo: str = None):
+        tipo, _ = _interpretar_tipo(tipo_conteudo, None)
+        if "+" in (tipo_conteudo or "").split(";")[0] or tipo not in (TIPO_CSV, TIPO_FLOAT32, TIPO_FLOAT64):
+            raise ValueError(f"Envio em fluxo aceita apenas {TIPO_CSV}, {TIPO_FLOAT32} ou {TIPO_FLOAT64}, sem compressão.")
+        self.tipo = tipo
+        self._resto = b""
+
+    def ler(self, parte: bytes) -> np.ndarray:
+        dados = self._resto + parte
+        if self.tipo == TIPO_CSV:
+            corte = dados.rfind(b"\n") + 1
+        else:
+            corte = len(dados) - len(dados) % _DTYPES_BRUTOS[self.tipo].itemsize
+        self._resto = dados[corte:]
+        return self._converter(dados[:corte])
+
+    def finalizar(self) -> np.ndarray:
+        resto, self._resto = self._resto, b""
+        if self.tipo != TIPO_CSV and resto:
+            raise ValueError(f"{len(resto)} bytes no fim do sinal não formam um valor {_DTYPES_BRUTOS[self.tipo]}.")
+        return self._converter(resto)
+
+    def _converter(self, dados: bytes) -> np.ndarray:
+        if self.tipo == TIPO_CSV:
+            return np.array(dados.decode('utf-8').replace(",", " ").split(), dtype=np.float64)
+        return np.frombuffer(dados, dtype=_DTYPES_BRUTOS[self.tipo])
+
+
+def ler_sinais_lote(conteudo: bytes, tipo_conteudo: str = None, nome_arquivo: str = None,
+                    tamanho_sinal: int = None, maximo_sinais: int = None) -> list[tuple[str, np.ndarray]]:
+    # Vários sinais em um único envio, devolvidos como [(nome do quadro, vetor g), ...] na ordem recebida:
+    #  - .npz ou .zip: um sinal por membro, em qualquer formato aceito por ler_sinal (ex.: CSVs);
+    #  - pilha: .npy 2D (um sinal por linha), CSV com um sinal por coluna ou binário bruto
+    #    com tamanho_sinal elementos por sinal.
+    # Com tamanho_sinal e maximo_sinais, os limites são verificados antes de descomprimir cada parte
+    # (número de membros e tamanho declarado de cada um no .zip): LimiteExcedido.
+    limite_sinal = tamanho_sinal * _BYTES_POR_VALOR + _BYTES_CABECALHO if tamanho_sinal else None
+    limite_total = maximo_sinais * limite_sinal if limite_sinal and maximo_sinais else None
+    conteudo = _descomprimir(conteudo, limite_total)
+    if conteudo[:4] == _MAGICO_ZIP:
+        with zipfile.ZipFile(io.BytesIO(conteudo)) as arquivo_zip:
+            membros = [m for m in arquivo_zip.infolist() if not m.is_dir()]
+            _verificar_quantidade(len(membros), maximo_sinais)
+            for membro in membros:
+                if limite_sinal and membro.file_size > limite_sinal:
+                    raise LimiteExcedido(
+                        f"Membro '{membro.filename}' com {membro.file_size} bytes descomprimidos; um sinal de "
+                        f"{tamanho_sinal} valores ocupa no máximo {limite_sinal} bytes."
+                    )
+            return [
+                (os.path.splitext(os.path.basename(m.filename))[0],
+                 ler_sinal(arquivo_zip.read(m), None, m.filename, limite_sinal))
+                for m in membros
+            ]
+
+    tipo, parametros = _interpretar_tipo(tipo_conteudo, nome_arquivo)
+    if tipo == TIPO_CSV:
+        sinais = pd.read_csv(io.StringIO(conteudo.decode('utf-8')), header=None).values.T
+    elif tipo == TIPO_NPY:
+        sinais = _ler_npy(conteudo)
+    else:
+        sinais = _ler_bruto(conteudo, tipo, parametros)
+
+    if sinais.ndim == 1:
+        if not tamanho_sinal or sinais.size % tamanho_sinal:
+            raise ValueError(f"{sinais.size} elementos não formam sinais de {tamanho_sinal} elementos.")
+        sinais = sinais.reshape(-1, tamanho_sinal)
+    elif sinais.ndim != 2:
+        raise ValueError(f"Pilha de sinais com {sinais.ndim} dimensões; use um sinal por linha.")
+    _verificar_quantidade(sinais.shape[0], maximo_sinais)
+    return [(f"quadro_{i}", sinal) for i, sinal in enumerate(sinais)]
+
+
+def _verificar_quantidade(quantidade: int, maximo_sinais: int) -> None:
+    if maximo_sinais is not None and quantidade > maximo_sinais:
+        raise LimiteExcedido(f"Lote com {quantidade} sinais; o máximo é {maximo_sinais}.")
+
+
+def _ler_npy(conteudo: bytes) -> np.ndarray:
+    buffer = io.BytesIO(conteudo)
+    versao = np.lib.format.read_magic(buffer)
+    ler_cabecalho = np.lib.format.read_array_header_1_0 if versao == (1, 0) else np.lib.format.read_array_header_2_0
+    shape, fortran, dtype = ler_cabecalho(buffer)
+    if dtype.hasobject:
+        raise ValueError("Arquivos .npy com objetos Python não são aceitos.")
+    vetor = np.frombuffer(conteudo, dtype=dtype, count=int(np.prod(shape)), offset=buffer.tell())
+    return vetor.reshape(shape, order='F' if fortran else 'C')
+
+
+def _ler_bruto(conteudo: bytes, tipo: str, parametros: dict) -> np.ndarray:
+    dtype = _DTYPES_BRUTOS[tipo]
+    if len(conteudo) % dtype.itemsize:
+        raise ValueError(f"Tamanho do conteúdo ({len(conteudo)} bytes) não é múltiplo de {dtype.itemsize} bytes ({dtype}).")
+    vetor = np.frombuffer(conteudo, dtype=dtype)
+    if "length" in parametros and int(parametros["length"]) != vetor.size:
+        raise ValueError(f"Comprimento declarado ({parametros['length']}) difere do recebido ({vetor.size} elementos).")
+    return vetor
+
+
+def serializar_sinal(vetor: np.ndarray, formato: str = "csv", compressao: str = None) -> tuple[bytes, str, str]:
+    # Retorna (conteúdo, tipo de conteúdo, extensão) para envio do sinal
+    tipo, extensao = FORMATOS_ENVIO[formato]
+    vetor = np.asarray(vetor).ravel()
+
+    if formato == "csv":
+        conteudo = pd.DataFrame(vetor).to_csv(index=False, header=False).encode('utf-8')
+    elif formato == "npy":
+        buffer = io.BytesIO()
+        np.save(buffer, vetor)
+        conteudo = buffer.getvalue()
+    else:
+        conteudo = vetor.astype(_DTYPES_BRUTOS[tipo]).tobytes()
+
+    if compressao == "gzip":
+        conteudo, tipo, extensao = gzip.compress(conteudo, compresslevel=1), tipo + "+gzip", extensao + ".gz"
+    elif compressao == "zstd":
+        conteudo, tipo, extensao = _modulo_zstd().ZstdCompressor().compress(conteudo), tipo + "+zstd", extensao + ".zst"
+
+    if formato in ("float32", "float64"):
+        tipo = f"{tipo}; length={vetor.size}"
+    return conteudo, tipo, extensao
@@ -1,4 +1,5 @@
 
+import functools
 import numpy as np
 import datetime
 import os
@@ -11,41 +12,72 @@ from compartilhado.constantes import (
     PASTA_IMAGENS_RECONSTRUIDAS_SERVIDOR, PASTA_METADADOS_RECONSTRUCAO,
 )
 
-def calculo_fator_reducao(H: np.ndarray) -> float:
+def calculo_fator_reducao(H) -> float:
     
+    # Operadores de modelo do servidor guardam ||HᵀH||₂ após o primeiro cálculo
+    # (identificados pelo atributo, sem que este pacote dependa do servidor)
+    norma_espectral = getattr(H, "norma_espectral", None)
+    if norma_espectral is not None:
+        return norma_espectral
     return np.linalg.norm(H.T @ H, 2)
 
-def calculo_coeficiente_regularizacao(H: np.ndarray, g: np.ndarray) -> float:
+def calculo_coeficiente_regularizacao(H, g: np.ndarray, Htg: np.ndarray = None) -> float:
     
-    return np.max(np.abs(H.T @ g)) * 0.05
+    # Htg: Hᵀg já calculado (ex.: acumulado durante o upload em fluxo)
+    if Htg is not None:
+        return np.max(np.abs(Htg), axis=0) * 0.05
+    # g na precisão de H: evita promover uma H float32 inteira para float64.
+    # g com um sinal por coluna (lotes) resulta em um lambda por coluna.
+    g = np.asarray(g, dtype=H.dtype)
+    Htg = H.aplicar_transposta(g) if hasattr(H, "aplicar_transposta") else H.T @ g
+    return np.max(np.abs(Htg), axis=0) * 0.05
 
-def aplicar_ganho_sinal(g_original_vector: np.ndarray, N_sensores: int, S_amostras: int) -> np.ndarray:
+@functools.lru_cache(maxsize=None)
+def obter_ganho_sinal(N_sensores: int, S_amostras: int) -> np.ndarray:
+    
+    # Ganho por amostra, igual para todos os sensores: calculado uma vez por geometria (N, S)
+    l_idx = np.arange(S_amostras, dtype=float)
+    ganho = 100 + (1/20) * l_idx * np.sqrt(l_idx)
+    ganho.flags.writeable = False
+    return ganho
+
+def _validar_tamanho_sinal(g_original_vector: np.ndarray, N_sensores: int, S_amostras: int) -> None:
     
     if g_original_vector.size != N_sensores * S_amostras:
         raise ValueError(f"Tamanho do vetor g ({g_original_vector.size}) não corresponde a N*S ({N_sensores * S_amostras}).")
-       
-    g_matrix_2d = g_original_vector.reshape((N_sensores, S_amostras), order='C') # Assumindo C-order (row-major) no flatten
-
-    ganho_matrix_2d = np.ones_like(g_matrix_2d, dtype=float)
-    for c_idx in range(N_sensores): # Loop sobre sensores (colunas da matriz H no contexto de Hf=g)
-        for l_idx in range(S_amostras): # Loop sobre amostras (linhas da matriz H no contexto de Hf=g)
-            
-            ganho_matrix_2d[c_idx, l_idx] = 100 + (1/20) * l_idx * np.sqrt(l_idx)
+
+def aplicar_ganho_sinal(g_original_vector: np.ndarray, N_sensores: int, S_amostras: int) -> np.ndarray:
+    
+    _validar_tamanho_sinal(g_original_vector, N_sensores, S_amostras)
     
-    g_mod_matrix_2d = g_matrix_2d * ganho_matrix_2d
+    # Assumindo C-order (row-major): linhas = sensores, colunas = amostras
+    g_matrix_2d = g_original_vector.reshape((N_sensores, S_amostras), order='C')
     
-    return g_mod_matrix_2d.flatten() # Retorna o vetor g modificado e achatado novamente
+    return (g_matrix_2d * obter_ganho_sinal(N_sensores, S_amostras)).ravel() # Retorna o vetor g modificado e achatado novamente
 
-def salvar_imagem_e_metadados(
-    f_reconstruido: np.ndarray,
-    identificacao_usuario: str,
-    algoritmo_utilizado: str,
-    data_hora_inicio: datetime.datetime,
-    data_hora_termino: datetime.datetime,
-    dimensoes_imagem: tuple,
-    num_iteracoes: int
-) -> str:
+def preprocessar_sinal(g_original_vector: np.ndarray, N_sensores: int, S_amostras: int, limite_normalizacao: float = 100,
+                       inplace: bool = False) -> np.ndarray:
     
+    # Normalização (sinais com |g| acima do limite são divididos pelo máximo) e ganho em uma única
+    # passagem, com uma única alocação. Com inplace=True o vetor recebido é sobrescrito quando é
+    # float64, gravável e contíguo (quem chama não usa mais o sinal original).
+    _validar_tamanho_sinal(g_original_vector, N_sensores, S_amostras)
+    
+    ganho = obter_ganho_sinal(N_sensores, S_amostras)
+    valor_max_abs = max(g_original_vector.max(), -g_original_vector.min())
+    if valor_max_abs > limite_normalizacao:
+        print(f"[AVISO] Sinal original possui valor máximo alto ({valor_max_abs:.2e}), normalizando...")
+        ganho = ganho / valor_max_abs
+    
+    if inplace and g_original_vector.dtype == np.float64 and g_original_vector.flags.writeable and g_original_vector.flags.c_contiguous:
+        saida = g_original_vector
+    else:
+        saida = np.empty(g_original_vector.size, dtype=np.float64)
+    
+    np.multiply(g_original_vector.reshape((N_sensores, S_amostras)), ganho, out=saida.reshape((N_sensores, S_amostras)))
+    return saida.ravel()
+
+def gerar_imagem_reconstruida(f_reconstruido: np.ndarray, dimensoes_imagem: tuple) -> Image.Image:
     # 1. Remodelar 'f' para as dimensões da imagem
     f_reshaped = f_reconstruido.reshape(dimensoes_imagem)
 
@@ -61,19 +93,20 @@ def salvar_imagem_e_metadados(
     else:
         f_normalized = ((f_ajustado - min_val) / (max_val - min_val) * 255).astype(np.uint8)
 
-    img = Image.fromarray(f_normalized, mode='L') # 'L' para escala de cinza
-
-    # Garantir que as pastas existam
-    os.makedirs(PASTA_IMAGENS_RECONSTRUIDAS_SERVIDOR, exist_ok=True)
-    os.makedirs(PASTA_METADADOS_RECONSTRUCAO, exist_ok=True)
+    return Image.fromarray(f_normalized, mode='L') # 'L' para escala de cinza
 
-    # Gerar nomes de arquivo únicos
-    id_reconstrucao = str(uuid.uuid4())
-    nome_arquivo_imagem = f"imagem_reconstruida_{id_reconstrucao}.png"
-    caminho_imagem = os.path.join(PASTA_IMAGENS_RECONSTRUIDAS_SERVIDOR, nome_arquivo_imagem)
-    img.save(caminho_imagem)
 
-    # 4. Salvar metadados
+def montar_metadados(
+    id_reconstrucao: str,
+    identificacao_usuario: str,
+    algoritmo_utilizado: str,
+    data_hora_inicio: datetime.datetime,
+    data_hora_termino: datetime.datetime,
+    dimensoes_imagem: tuple,
+    num_iteracoes: int,
+    caminho_imagem: str,
+    metadados_extras: dict = None
+) -> dict:
     metadados = {
         "id_reconstrucao": id_reconstrucao,
         "identificacao_usuario": identificacao_usuario,
@@ -85,10 +118,43 @@ def salvar_imagem_e_metadados(
         "numero_iteracoes": num_iteracoes,
         "caminho_imagem": caminho_imagem
     }
+    if metadados_extras:
+        metadados.update(metadados_extras)
+    return metadados
+
+
+def salvar_imagem_e_metadados(
+    f_reconstruido: np.ndarray,
+    identificacao_usuario: str,
+    algoritmo_utilizado: str,
+    data_hora_inicio: datetime.datetime,
+    data_hora_termino: datetime.datetime,
+    dimensoes_imagem: tuple,
+    num_iteracoes: int,
+    metadados_extras: dict = None
+) -> str:
+    # Gravação síncrona em arquivos (PERSISTENCIA_RECONSTRUCOES='arquivos')
+    img = gerar_imagem_reconstruida(f_reconstruido, dimensoes_imagem)
+
+    # Garantir que as pastas existam
+    os.makedirs(PASTA_IMAGENS_RECONSTRUIDAS_SERVIDOR, exist_ok=True)
+    os.makedirs(PASTA_METADADOS_RECONSTRUCAO, exist_ok=True)
+
+    # Gerar nomes de arquivo únicos
+    id_reconstrucao = str(uuid.uuid4())
+    nome_arquivo_imagem = f"imagem_reconstruida_{id_reconstrucao}.png"
+    caminho_imagem = os.path.join(PASTA_IMAGENS_RECONSTRUIDAS_SERVIDOR, nome_arquivo_imagem)
+    img.save(caminho_imagem)
+
+    # 4. Salvar metadados
+    metadados = montar_metadados(
+        id_reconstrucao, identificacao_usuario, algoritmo_utilizado, data_hora_inicio, data_hora_termino,
+        dimensoes_imagem, num_iteracoes, caminho_imagem, metadados_extras
+    )
     nome_arquivo_metadados = f"metadados_{id_reconstrucao}.json"
     caminho_metadados = os.path.join(PASTA_METADADOS_RECONSTRUCAO, nome_arquivo_metadados)
     with open(caminho_metadados, 'w') as f:
         json.dump(metadados, f, indent=4)
         
     print(f"Imagem e metadados salvos para reconstrução ID: {id_reconstrucao}")
-    return nome_arquivo_imagem, metadados
\ No newline at end of file
+    return nome_arquivo_imagem, metadados
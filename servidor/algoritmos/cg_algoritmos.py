@@ -1,78 +1,208 @@
 import numpy as np
 
+from servidor.algoritmos.operador_h import como_operador
+from servidor.algoritmos.precondicionadores import criar_precondicionador
+from servidor.algoritmos.parada import PoliticaParada
 
-def reconstruir_cgne(g_vec: np.ndarray, H: np.ndarray, lam: float, max_iter: int, tol: float) -> tuple[np.ndarray, int]:
-    print(f"Iniciando algoritmo CGNE (lambda={lam:.2e}, max_iter={max_iter}, tol={tol:.2e})...")
 
-    Ht = H.T
-    b = Ht @ g_vec
-    x = np.zeros(H.shape[1])
+def _produto_interno(a: np.ndarray, b: np.ndarray, acumular_float64: bool = False) -> float:
+    # Em float32, acumular as somas em float64 evita a perda de precisão dos produtos longos
+    if acumular_float64 and a.dtype != np.float64:
+        return float(np.einsum('i,i->', a, b, dtype=np.float64))
+    return float(a @ b)
 
-    r = b - (Ht @ (H @ x) + lam * x)
-    d = r.copy()
 
-    norma_b = np.linalg.norm(b)
-    MIN_ITER = 10 
+def _produto_colunas(A: np.ndarray, B: np.ndarray, acumular_float64: bool = False) -> np.ndarray:
+    # Produto interno de cada par de colunas (variantes em bloco)
+    if acumular_float64 and A.dtype != np.float64:
+        return np.einsum('ij,ij->j', A, B, dtype=np.float64)
+    return np.einsum('ij,ij->j', A, B)
+
+
+def _acompanhar(nome: str, iteracao: int, norma_residuo: float, ao_iterar, cancelamento) -> bool:
+    # Repassa o progresso da iteração e indica se a reconstrução deve parar no iterado atual
+    if ao_iterar is not None:
+        ao_iterar(iteracao, float(norma_residuo))
+    if cancelamento is not None and cancelamento.interromper():
+        print(f"{nome} interrompido na iteração {iteracao} (norma do resíduo: {norma_residuo:.2e}).")
+        return True
+    return False
+
+
+def _acompanhar_colunas(iteracao: int, normas_residuo: np.ndarray, ativos: np.ndarray,
+                        ao_iterar: list, cancelamentos: list, motivos: list) -> None:
+    # Versão por coluna para as variantes em bloco: uma coluna interrompida deixa de ser
+    # atualizada e mantém seu último iterado, sem afetar as demais
+    for j in np.flatnonzero(ativos):
+        if ao_iterar is not None and ao_iterar[j] is not None:
+            ao_iterar[j](iteracao, float(normas_residuo[j]))
+        if cancelamentos is not None and cancelamentos[j] is not None and cancelamentos[j].interromper():
+            ativos[j] = False
+            motivos[j] = "interrompida"
+
+
+def _encerrar_colunas(ativos: np.ndarray, parar: np.ndarray, motivos: list, motivo) -> None:
+    # Desativa as colunas ainda ativas em que parar é verdadeiro, registrando o motivo
+    # (um para todas ou um por coluna)
+    for j in np.flatnonzero(ativos & parar):
+        motivos[j] = motivo if isinstance(motivo, str) else motivo[j]
+    ativos &= ~parar
+
+
+def _residuo_dados_cgne(norma_g_quad, x: np.ndarray, b: np.ndarray, r: np.ndarray, lam,
+                        produto=_produto_interno):
+    # ||g - Hx|| sem novo produto com H, a partir de r = b - (HᵀH + lambda·I)x e b = Hᵀg:
+    # ||g - Hx||² = ||g||² - xᵀb - xᵀr - lambda·||x||² (produtos acumulados em float64)
+    quadrado = norma_g_quad - produto(x, b, True) - produto(x, r, True) - lam * produto(x, x, True)
+    return np.sqrt(np.maximum(quadrado, 0.0))
+
+
+def reconstruir_cgne(g_vec: np.ndarray, H, lam: float, max_iter: int, tol: float,
+                     acumular_float64: bool = False, ao_iterar=None, cancelamento=None,
+                     precondicionador=None, Htg: np.ndarray = None, x0: np.ndarray = None,
+                     parada: PoliticaParada = None) -> tuple[np.ndarray, int, str]:
+    # Retorna (imagem, iterações, motivo da parada). Os vetores seguem a precisão do operador (float64 ou float32).
+    # ao_iterar(iteração, norma do resíduo) é chamada ao fim de cada iteração; se
+    # cancelamento.interromper() for verdadeiro, retorna o iterado atual.
+    # precondicionador (nome ou Precondicionador) aproxima HᵀH + lambda·I: gradiente conjugado precondicionado.
+    # Htg: Hᵀg já calculado (ex.: acumulado durante o upload em fluxo), dispensa o primeiro produto com H.
+    # x0: ponto de partida (ex.: reconstrução do quadro anterior da sessão); padrão: zeros.
+    # parada: critérios além de max_iter e tol (discrepância, estagnação, tempo); padrão: só max_iter e tol.
+    op = como_operador(H)
+    lam = float(lam)
+    precond = criar_precondicionador(precondicionador, op, lam)
+    sufixo = f", precondicionador={precond.nome}" if precond is not None else ""
+    print(f"Iniciando algoritmo CGNE (lambda={lam:.2e}, max_iter={max_iter}, tol={tol:.2e}{sufixo})...")
+
+    b = op.aplicar_transposta(np.asarray(g_vec, dtype=op.dtype)) if Htg is None else np.asarray(Htg, dtype=op.dtype)
+    x = np.zeros(op.shape[1], dtype=op.dtype) if x0 is None else np.array(x0, dtype=op.dtype)
+
+    r = b.copy() if x0 is None else b - (op.aplicar_normal(x) + lam * x) # r_0 = b partindo de zeros
+    z = precond.aplicar(r) if precond is not None else r # z = M⁻¹r
+    d = z.copy()
+
+    rr = _produto_interno(r, r, acumular_float64)
+    rz = _produto_interno(r, z, acumular_float64) if precond is not None else rr
+    norma_b = np.sqrt(_produto_interno(b, b, acumular_float64))
+    norma_res_new = np.sqrt(rr)
+    # Com x0 o iterado inicial já vem de uma reconstrução e os critérios valem desde a primeira iteração
+    parada = parada if parada is not None else PoliticaParada()
+    criterio = parada.iniciar(tol, norma_b, g_vec, x0 is not None)
+    if parada.usa_residuo_dados:
+        g64 = np.asarray(g_vec, dtype=np.float64)
+        norma_g_quad = float(g64 @ g64)
 
     num_iteracoes = 0
+    motivo = "max_iteracoes"
 
     for i in range(max_iter):
         num_iteracoes = i + 1
 
-        q = Ht @ (H @ d) + lam * d
-        denom = d @ q
+        q = op.aplicar_normal(d) + lam * d
+        denom = _produto_interno(d, q, acumular_float64)
         if abs(denom) < 1e-20:
             print(f"CGNE Convergência: Denominador de alpha muito pequeno ({denom:.2e}) na iteração {num_iteracoes}.")
+            motivo = "denominador_nulo"
             break
 
-        alpha = (r @ r) / denom
+        alpha = rz / denom
         x += alpha * d
-        r_new = b - (Ht @ (H @ x) + lam * x)
+        r_new = r - alpha * q # atualização recursiva do resíduo, sem novo produto com H
 
-        norma_res_new = np.linalg.norm(r_new)
-        if norma_res_new / norma_b < tol and i >= MIN_ITER:
-            print(f"CGNE Convergência por tolerância relativa ({norma_res_new:.2e} / {norma_b:.2e} < {tol:.2e}) na iteração {num_iteracoes}.")
+        rr_new = _produto_interno(r_new, r_new, acumular_float64)
+        norma_res_new = np.sqrt(rr_new)
+        if _acompanhar("CGNE", num_iteracoes, norma_res_new, ao_iterar, cancelamento):
+            motivo = "interrompida"
+            break
+        norma_dados = _residuo_dados_cgne(norma_g_quad, x, b, r_new, lam) if parada.usa_residuo_dados else None
+        motivo_parada = criterio.avaliar(num_iteracoes, norma_res_new, norma_dados)[0]
+        if motivo_parada:
+            motivo = motivo_parada
+            print(f"CGNE parada por {motivo} na iteração {num_iteracoes} (resíduo relativo {norma_res_new / norma_b:.2e}, tol={tol:.2e}).")
             break
 
-        beta = (r_new @ r_new) / (r @ r)
-        d = r_new + beta * d
+        if precond is not None:
+            z_new = precond.aplicar(r_new)
+            rz_new = _produto_interno(r_new, z_new, acumular_float64)
+        else:
+            z_new, rz_new = r_new, rr_new
+        beta = rz_new / rz
+        d = z_new + beta * d
         r = r_new
+        rr = rr_new
+        rz = rz_new
 
-    if num_iteracoes >= max_iter:
+    if motivo == "max_iteracoes":
         print(f"CGNE Não convergiu em {max_iter} iterações. Norma do resíduo final: {norma_res_new:.2e}.")
 
-    return x, num_iteracoes
+    return x, num_iteracoes, motivo
 
 
-def reconstruir_cgnr(g_vec: np.ndarray, H: np.ndarray, lam: float, max_iter: int, tol: float) -> tuple[np.ndarray, int]:
-    
-    print(f"Iniciando algoritmo CGNR (lambda={lam:.2e}, max_iter={max_iter}, tol={tol:.2e})...")
-    
-    Ht = H.T
+def reconstruir_cgnr(g_vec: np.ndarray, H, lam: float, max_iter: int, tol: float,
+                     acumular_float64: bool = False, ao_iterar=None, cancelamento=None,
+                     precondicionador=None, Htg: np.ndarray = None, x0: np.ndarray = None,
+                     parada: PoliticaParada = None) -> tuple[np.ndarray, int, str]:
+    # Retorna (imagem, iterações, motivo da parada), como o CGNE.
+    # precondicionador (nome ou Precondicionador) aproxima HᵀH: y = M⁻¹z substitui z nas direções
+    # Htg: Hᵀg já calculado, usado em z_0 (com f_0 = 0, z_0 = Hᵀg; com x0, z_0 = Hᵀg - HᵀH x0)
+    # x0: ponto de partida f_0 (ex.: reconstrução do quadro anterior da sessão); padrão: zeros.
+    # parada: critérios além de max_iter e tol; a tolerância vale para ||z|| / ||Hᵀg||, o resíduo
+    # relativo das equações normais (o de Hf=g não chega a zero quando g tem ruído).
+    op = como_operador(H)
+    usa_gram = op.usa_gram
+    # Com HᵀH (ou HᵀHp e ||Hp||² em uma passagem, no operador em disco), z e ||r||² seguem por
+    # recorrência; senão r é atualizado e z = Hᵀr recalculado, uma segunda passagem por H
+    recorrencia = usa_gram or op.normal_em_uma_passagem
+    precond = criar_precondicionador(precondicionador, op, 0.0) # o CGNR não usa lambda
+    sufixo = f", precondicionador={precond.nome}" if precond is not None else ""
+    print(f"Iniciando algoritmo CGNR (lambda={lam:.2e}, max_iter={max_iter}, tol={tol:.2e}{sufixo})...")
     
-    f  = np.zeros(H.shape[1]) # f_0 = 0
+    f  = np.zeros(op.shape[1], dtype=op.dtype) if x0 is None else np.array(x0, dtype=op.dtype) # f_0 = 0 ou x0
     
-    r = g_vec - H @ f # r_0 para o sistema original Hf=g
-    z = Ht @ r        # z_0 = Ht @ r_0 para o sistema normal
-    p = z.copy()      # p_0 = z_0
+    # r_0 = g - H f_0 para o sistema original Hf=g (= g partindo de zeros, sem o produto por H)
+    r = np.array(g_vec, dtype=op.dtype) if x0 is None else np.asarray(g_vec, dtype=op.dtype) - op.aplicar(f)
+    if Htg is None:
+        z = op.aplicar_transposta(r) # z_0 = Ht @ r_0 para o sistema normal
+    elif x0 is None:
+        z = np.array(Htg, dtype=op.dtype)
+    else:
+        z = np.asarray(Htg, dtype=op.dtype) - op.aplicar_normal(f)
+    y = precond.aplicar(z) if precond is not None else z # y_0 = M⁻¹ z_0
+    p = y.copy()      # p_0 = y_0
     
     # Norma inicial do resíduo r (do sistema Hf=g)
-    norma_res_inicial_r = np.linalg.norm(r) 
+    norma_res_quad = _produto_interno(r, r, acumular_float64)
+    norma_res_new = np.sqrt(norma_res_quad)
+    # Referência do resíduo relativo: ||Hᵀg|| (= ||z_0|| partindo de zeros)
+    if Htg is not None:
+        norma_b = np.sqrt(_produto_interno(np.asarray(Htg), np.asarray(Htg), acumular_float64))
+    elif x0 is None:
+        norma_b = np.sqrt(_produto_interno(z, z, acumular_float64))
+    else:
+        b = op.aplicar_transposta(np.asarray(g_vec, dtype=op.dtype))
+        norma_b = np.sqrt(_produto_interno(b, b, acumular_float64))
+    criterio = (parada if parada is not None else PoliticaParada()).iniciar(tol, norma_b, g_vec, x0 is not None)
     num_iteracoes = 0
+    motivo = "max_iteracoes"
 
     for i in range(max_iter):
         num_iteracoes = i + 1
 
-        # w = H @ p
-        w = H @ p
-        
         # Calcular alpha
-        # Numerador: z @ z (norma quadrada de z)
-        # Denominador: w @ w (norma quadrada de w)
-        numerador_alpha = z @ z
-        denom_alpha = w @ w
+        # Numerador: z @ y (norma quadrada de z, na métrica M⁻¹ quando precondicionado)
+        # Denominador: ||H p||², via w = H @ p ou via pᵀ(HᵀH)p quando a Gram é mais barata
+        numerador_alpha = _produto_interno(z, y, acumular_float64)
+        if usa_gram:
+            q = op.aplicar_normal(p)
+            denom_alpha = _produto_interno(p, q, acumular_float64)
+        elif recorrencia:
+            q, denom_alpha = op.aplicar_normal_com_norma(p, acumular_float64)
+        else:
+            w = op.aplicar(p)
+            denom_alpha = _produto_interno(w, w, acumular_float64)
         if abs(denom_alpha) < 1e-20:
             print(f"CGNR Convergência: Denominador de alpha muito pequeno ({denom_alpha:.2e}) na iteração {num_iteracoes}.")
+            motivo = "denominador_nulo"
             break
 
         alpha = numerador_alpha / denom_alpha
@@ -81,20 +211,33 @@ def reconstruir_cgnr(g_vec: np.ndarray, H: np.ndarray, lam: float, max_iter: int
         f += alpha * p
 
         # Atualizar resíduo r e z_new
-        r_new = r - alpha * w # r_new = r_old - alpha * w
-        z_new = Ht @ r_new    # z_new = Ht @ r_new
+        if recorrencia:
+            z_new = z - alpha * q # z_new = Ht @ (r_old - alpha * H p)
+            # ||r_new||² = ||r_old||² - alpha * (z @ y), sem formar r explicitamente
+            norma_res_quad = max(norma_res_quad - alpha * numerador_alpha, 0.0)
+        else:
+            r = r - alpha * w              # r_new = r_old - alpha * w
+            z_new = op.aplicar_transposta(r) # z_new = Ht @ r_new
+            norma_res_quad = _produto_interno(r, r, acumular_float64)
 
-        # Critério de parada: norma do resíduo r_new (do sistema Hf=g)
-        norma_res_new = np.linalg.norm(r_new)
-        if norma_res_new < tol:
-            print(f"CGNR Convergência por tolerância ({norma_res_new:.2e} < {tol:.2e}) na iteração {num_iteracoes}.")
+        # Progresso: norma do resíduo r_new (do sistema Hf=g); parada: ||z_new|| relativo e ||r_new||
+        norma_res_new = np.sqrt(norma_res_quad)
+        if _acompanhar("CGNR", num_iteracoes, norma_res_new, ao_iterar, cancelamento):
+            motivo = "interrompida"
+            break
+        zz_new = _produto_interno(z_new, z_new, acumular_float64)
+        motivo_parada = criterio.avaliar(num_iteracoes, np.sqrt(zz_new), norma_res_new)[0]
+        if motivo_parada:
+            motivo = motivo_parada
+            print(f"CGNR parada por {motivo} na iteração {num_iteracoes} (resíduo relativo {np.sqrt(zz_new) / norma_b:.2e}, tol={tol:.2e}).")
             break
         
         # Calcular beta
-        # Numerador: z_new @ z_new (norma quadrada de z_new)
-        # Denominador: z @ z (norma quadrada de z)
-        numerador_beta = z_new @ z_new
-        denom_beta = z @ z
+        # Numerador: z_new @ y_new (norma quadrada de z_new)
+        # Denominador: z @ y (norma quadrada de z)
+        y_new = precond.aplicar(z_new) if precond is not None else z_new
+        numerador_beta = _produto_interno(z_new, y_new, acumular_float64) if precond is not None else zz_new
+        denom_beta = numerador_alpha # z @ y, já calculado nesta iteração
         if abs(denom_beta) < 1e-20:
             print(f"CGNR Convergência: Denominador de beta muito pequeno ({denom_beta:.2e}) na iteração {num_iteracoes}.")
             break
@@ -102,12 +245,142 @@ def reconstruir_cgnr(g_vec: np.ndarray, H: np.ndarray, lam: float, max_iter: int
         beta = numerador_beta / denom_beta
 
         # Atualizar direção de busca p
-        p = z_new + beta * p # p_new = z_new + beta * p_old
+        p = y_new + beta * p # p_new = y_new + beta * p_old
 
-        # Atualizar r e z para a próxima iteração
-        r = r_new
+        # Atualizar z para a próxima iteração
         z = z_new
+        y = y_new
 
-    if num_iteracoes >= max_iter:
+    if motivo == "max_iteracoes":
         print(f"CGNR Não convergiu em {max_iter} iterações. Norma do resíduo final: {norma_res_new:.2e}.")
-    return f, num_iteracoes
\ No newline at end of file
+    return f, num_iteracoes, motivo
+
+
+def _dividir_colunas(numerador: np.ndarray, denominador: np.ndarray, ativos: np.ndarray) -> np.ndarray:
+    # Divisão coluna a coluna que zera os passos das colunas já encerradas
+    return np.divide(numerador, denominador, out=np.zeros_like(numerador, dtype=np.result_type(numerador, denominador)), where=ativos)
+
+
+def reconstruir_cgne_bloco(G: np.ndarray, H, lams: np.ndarray, max_iter: int, tol: float,
+                           acumular_float64: bool = False, ao_iterar: list = None,
+                           cancelamentos: list = None, parada: PoliticaParada = None) -> tuple[np.ndarray, np.ndarray, list]:
+    # Variante multi-RHS do CGNE: cada coluna de G é um sinal independente, com seu próprio
+    # lambda e seu próprio critério de parada; os produtos com H viram GEMM em vez de GEMV.
+    # ao_iterar e cancelamentos são listas com um item (ou None) por coluna.
+    # Retorna (imagens, iterações por sinal, motivo da parada de cada sinal).
+    print(f"Iniciando algoritmo CGNE em bloco ({G.shape[1]} sinais, max_iter={max_iter}, tol={tol:.2e})...")
+
+    op = como_operador(H)
+    lams = np.asarray(lams, dtype=op.dtype)
+    B = op.aplicar_transposta(np.asarray(G, dtype=op.dtype))
+    X = np.zeros((op.shape[1], G.shape[1]), dtype=op.dtype)
+
+    R = B.copy() # R_0 = B - (HᵀH + lambda·I) X_0 com X_0 = 0
+    D = R.copy()
+    rr = _produto_colunas(R, R, acumular_float64)
+
+    normas_b = np.sqrt(_produto_colunas(B, B, acumular_float64))
+    parada = parada if parada is not None else PoliticaParada()
+    criterio = parada.iniciar(tol, normas_b, G)
+    if parada.usa_residuo_dados:
+        G64 = np.asarray(G, dtype=np.float64)
+        normas_g_quad = _produto_colunas(G64, G64)
+
+    ativos = np.ones(G.shape[1], dtype=bool)
+    num_iteracoes = np.zeros(G.shape[1], dtype=int)
+    motivos = ["max_iteracoes"] * G.shape[1]
+
+    for i in range(max_iter):
+        num_iteracoes[ativos] = i + 1
+
+        Q = op.aplicar_normal(D) + lams * D
+        denom = _produto_colunas(D, Q, acumular_float64)
+        _encerrar_colunas(ativos, np.abs(denom) < 1e-20, motivos, "denominador_nulo")
+
+        alpha = _dividir_colunas(rr, denom, ativos).astype(op.dtype, copy=False)
+        X += alpha * D
+        R -= alpha * Q
+
+        rr_new = _produto_colunas(R, R, acumular_float64)
+        if ao_iterar is not None or cancelamentos is not None:
+            _acompanhar_colunas(i + 1, np.sqrt(rr_new), ativos, ao_iterar, cancelamentos, motivos)
+        normas_dados = (
+            _residuo_dados_cgne(normas_g_quad, X, B, R, lams, _produto_colunas) if parada.usa_residuo_dados else None
+        )
+        motivos_parada = criterio.avaliar(i + 1, np.sqrt(rr_new), normas_dados)
+        _encerrar_colunas(ativos, motivos_parada != "", motivos, motivos_parada)
+        if not ativos.any():
+            break
+
+        beta = _dividir_colunas(rr_new, rr, ativos).astype(op.dtype, copy=False)
+        D = R + beta * D
+        rr = rr_new
+
+    print(f"CGNE em bloco finalizado. Iterações por sinal: {num_iteracoes.tolist()}.")
+    return X, num_iteracoes, motivos
+
+
+def reconstruir_cgnr_bloco(G: np.ndarray, H, lams: np.ndarray, max_iter: int, tol: float,
+                           acumular_float64: bool = False, ao_iterar: list = None,
+                           cancelamentos: list = None, parada: PoliticaParada = None) -> tuple[np.ndarray, np.ndarray, list]:
+    # Variante multi-RHS do CGNR, com as mesmas regras de parada por coluna da versão sequencial
+    print(f"Iniciando algoritmo CGNR em bloco ({G.shape[1]} sinais, max_iter={max_iter}, tol={tol:.2e})...")
+
+    op = como_operador(H)
+    usa_gram = op.usa_gram
+    recorrencia = usa_gram or op.normal_em_uma_passagem
+
+    F = np.zeros((op.shape[1], G.shape[1]), dtype=op.dtype)
+    R = np.array(G, dtype=op.dtype) # R_0 = G - H F_0 com F_0 = 0
+    Z = op.aplicar_transposta(R)
+    P = Z.copy()
+
+    zz = _produto_colunas(Z, Z, acumular_float64)
+    normas_res_quad = _produto_colunas(R, R, acumular_float64)
+    criterio = (parada if parada is not None else PoliticaParada()).iniciar(tol, np.sqrt(zz), G)
+
+    ativos = np.ones(G.shape[1], dtype=bool)
+    num_iteracoes = np.zeros(G.shape[1], dtype=int)
+    motivos = ["max_iteracoes"] * G.shape[1]
+
+    for i in range(max_iter):
+        num_iteracoes[ativos] = i + 1
+
+        if usa_gram:
+            Q = op.aplicar_normal(P)
+            denom_alpha = _produto_colunas(P, Q, acumular_float64)
+        elif recorrencia:
+            Q, denom_alpha = op.aplicar_normal_com_norma(P, acumular_float64)
+        else:
+            W = op.aplicar(P)
+            denom_alpha = _produto_colunas(W, W, acumular_float64)
+        _encerrar_colunas(ativos, np.abs(denom_alpha) < 1e-20, motivos, "denominador_nulo")
+
+        alpha_acumulado = _dividir_colunas(zz, denom_alpha, ativos)
+        alpha = alpha_acumulado.astype(op.dtype, copy=False)
+        F += alpha * P
+
+        if recorrencia:
+            Z_new = Z - alpha * Q
+            normas_res_quad = np.maximum(normas_res_quad - alpha_acumulado * zz, 0.0)
+        else:
+            R -= alpha * W
+            Z_new = op.aplicar_transposta(R)
+            normas_res_quad = _produto_colunas(R, R, acumular_float64)
+
+        if ao_iterar is not None or cancelamentos is not None:
+            _acompanhar_colunas(i + 1, np.sqrt(normas_res_quad), ativos, ao_iterar, cancelamentos, motivos)
+        zz_new = _produto_colunas(Z_new, Z_new, acumular_float64)
+        motivos_parada = criterio.avaliar(i + 1, np.sqrt(zz_new), np.sqrt(normas_res_quad))
+        _encerrar_colunas(ativos, motivos_parada != "", motivos, motivos_parada)
+        _encerrar_colunas(ativos, np.abs(zz) < 1e-20, motivos, "denominador_nulo")
+        if not ativos.any():
+            break
+
+        beta = _dividir_colunas(zz_new, zz, ativos).astype(op.dtype, copy=False)
+        P = Z_new + beta * P
+        Z = Z_new
+        zz = zz_new
+
+    print(f"CGNR em bloco finalizado. Iterações por sinal: {num_iteracoes.tolist()}.")
+    return F, num_iteracoes, motivos
@@ -0,0 +1,494 @@
+import collections
+import contextlib
+import json
+import mmap
+import os
+import shutil
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Índice de uma pasta de blocos de linhas de H (ver salvar_blocos)
+ARQUIVO_INDICE_BLOCOS = "blocos.json"
+
+
+class OperadorH:
+    # Operador de um modelo H com as estruturas das equações normais pré-computadas.
+    # Hᵀ (cópia contígua), HᵀH (matriz de Gram) e ||HᵀH||₂ são calculados uma única vez,
+    # no primeiro uso, e reaproveitados por todas as reconstruções do mesmo modelo.
+    # Com arquivo_origem definido (modo compartilhado), Hᵀ e HᵀH são persistidas ao lado
+    # do .npy de H e abertas com mmap, para que todos os processos usem as mesmas páginas.
+    # A fatoração SVD (usada pela reconstrução direta) é persistida ao lado de arquivo_modelo.
+
+    formato = "densa"
+    # aplicar_normal_com_norma percorre H uma única vez (operador em disco); nos demais, faz os dois produtos
+    normal_em_uma_passagem = False
+
+    def __init__(self, H, pre_computar: bool = True, arquivo_origem: str = None, arquivo_modelo: str = None):
+        self.H = H
+        self.shape = H.shape
+        self.dtype = H.dtype
+        self.pre_computar = pre_computar
+        self.arquivo_origem = arquivo_origem
+        self.arquivo_modelo = arquivo_modelo or arquivo_origem
+        self._Ht = None
+        self._HtH = None
+        self._fatoracao_svd = None
+        self._norma_espectral = None
+        self._densidade = None
+        self._lock = threading.RLock()
+
+    @property
+    def Ht(self):
+        if not self.pre_computar:
+            return self.H.T
+        if self._Ht is None:
+            with self._lock:
+                if self._Ht is None:
+                    self._Ht = self._estrutura_persistida("ht", self._transpor)
+        return self._Ht
+
+    @property
+    def HtH(self) -> np.ndarray:
+        if self._HtH is None:
+            with self._lock:
+                if self._HtH is None:
+                    self._HtH = self._estrutura_persistida("gram", self._calcular_gram)
+        return self._HtH
+
+    @property
+    def fatoracao_svd(self) -> tuple[np.ndarray, np.ndarray]:
+        # (σ, V) da SVD fina H = U diag(σ) Vᵀ, com σ decrescente. Vem da decomposição espectral
+        # HᵀH = V diag(σ²) Vᵀ (n×n), sem formar U (m×n, do tamanho de H): Uᵀg = diag(1/σ) Vᵀ Hᵀg.
+        if self._fatoracao_svd is None:
+            with self._lock:
+                if self._fatoracao_svd is None:
+                    self._fatoracao_svd = self._fatoracao_persistida()
+        return self._fatoracao_svd
+
+    @property
+    def tem_fatoracao_svd(self) -> bool:
+        return self._fatoracao_svd is not None
+
+    @property
+    def norma_espectral(self) -> float:
+        # ||HᵀH||₂: HᵀH é simétrica semidefinida positiva, então a norma é o maior autovalor
+        if self._norma_espectral is None:
+            self._norma_espectral = float(np.linalg.eigvalsh(self.HtH)[-1])
+        return self._norma_espectral
+
+    @property
+    def densidade(self) -> float:
+        # Fração de elementos não nulos de H
+        if self._densidade is None:
+            self._densidade = self._contar_nao_nulos() / (self.shape[0] * self.shape[1])
+        return self._densidade
+
+    @property
+    def usa_gram(self) -> bool:
+        # Produto normal via HᵀH (densa) custa n² multiplicações; via Hᵀ(Hx), duas passagens por H
+        n = self.shape[1]
+        return self.pre_computar and n * n < self._custo_normal_direto()
+
+    @property
+    def nbytes(self) -> int:
+        # Memória do processo; estruturas mapeadas de arquivos ficam em nbytes_mapeados
+        return sum(_bytes_estrutura(e) for e in self._estruturas() if not _mapeada(e))
+
+    @property
+    def nbytes_mapeados(self) -> int:
+        # Estruturas abertas com mmap (modo compartilhado): páginas do cache do SO, compartilhadas
+        # entre processos, que o kernel pode descartar e reler do arquivo
+        return sum(_bytes_estrutura(e) for e in self._estruturas() if _mapeada(e))
+
+    def _estruturas(self) -> list:
+        estruturas = (self.H, self._Ht, self._HtH) + (self._fatoracao_svd or ())
+        return [e for e in estruturas if e is not None]
+
+    def aplicar(self, x: np.ndarray) -> np.ndarray:
+        return self.H @ x
+
+    def aplicar_transposta(self, y: np.ndarray) -> np.ndarray:
+        return self.Ht @ y
+
+    def aplicar_transposta_linhas(self, y: np.ndarray, inicio: int) -> np.ndarray:
+        # Parcela de Hᵀg de um trecho g[inicio:inicio+len(y)] do sinal: só as linhas correspondentes de H
+        return self.H[inicio:inicio + y.shape[0]].T @ y
+
+    def aplicar_normal(self, x: np.ndarray) -> np.ndarray:
+        # HᵀH @ x pelo caminho mais barato
+        if self.usa_gram:
+            return self.HtH @ x
+        return self.Ht @ (self.H @ x)
+
+    def aplicar_normal_com_norma(self, x: np.ndarray, acumular_float64: bool = False) -> tuple:
+        # (HᵀHx, ||Hx||²), com ||Hx||² por coluna quando x é uma matriz
+        w = self.aplicar(x)
+        return self.aplicar_transposta(w), _quadrado_norma(w, acumular_float64)
+
+    def definir_estruturas(self, Ht=None, HtH=None, fatoracao_svd=None) -> None:
+        # Usado por processos que recebem Hᵀ/HᵀH/SVD já prontas (ex.: memória compartilhada)
+        if Ht is not None:
+            self._Ht = Ht
+        if HtH is not None:
+            self._HtH = HtH
+        if fatoracao_svd is not None:
+            self._fatoracao_svd = fatoracao_svd
+
+    def aquecer(self) -> None:
+        # Monta as estruturas usadas pelos algoritmos e traz todas as páginas para a memória
+        estruturas = [self.H, self.Ht]
+        if self.usa_gram:
+            estruturas.append(self.HtH)
+        for estrutura in estruturas:
+            _tocar_paginas(estrutura)
+
+    def residuo_relativo(self, g: np.ndarray, x: np.ndarray) -> float:
+        # ||g - Hx|| / ||g||: Hx sai na precisão do operador (float32 não promove H inteira);
+        # a subtração e as normas são feitas em float64
+        residuo = np.asarray(g, dtype=np.float64) - self.aplicar(np.asarray(x, dtype=self.dtype))
+        return float(np.linalg.norm(residuo) / np.linalg.norm(g))
+
+    def residuos_relativos(self, G: np.ndarray, X: np.ndarray) -> list[float]:
+        # residuo_relativo de cada coluna de G (um sinal por coluna), com H @ X em um único produto matricial
+        residuo = np.asarray(G, dtype=np.float64) - self.aplicar(np.asarray(X, dtype=self.dtype))
+        return (np.linalg.norm(residuo, axis=0) / np.linalg.norm(G, axis=0)).tolist()
+
+    def _estrutura_persistida(self, sufixo: str, calcular):
+        if self.arquivo_origem is None:
+            return calcular()
+        caminho = f"{os.path.splitext(self.arquivo_origem)[0]}_{sufixo}.npy"
+        return carregar_derivado(caminho, self.arquivo_origem, calcular)
+
+    def _fatoracao_persistida(self) -> tuple[np.ndarray, np.ndarray]:
+        if self.arquivo_modelo is None:
+            return self._calcular_fatoracao()
+        base = f"{os.path.splitext(self.arquivo_modelo)[0]}_svd"
+        calculada = []
+        def calcular(indice):
+            if not calculada:
+                calculada.extend(self._calcular_fatoracao())
+            return calculada[indice]
+        # Um arquivo por parte, na precisão do operador; ambos gerados pela mesma decomposição
+        return (
+            carregar_derivado(f"{base}_valores_{self.dtype}.npy", self.arquivo_modelo, lambda: calcular(0)),
+            carregar_derivado(f"{base}_vetores_{self.dtype}.npy", self.arquivo_modelo, lambda: calcular(1)),
+        )
+
+    def _calcular_fatoracao(self) -> tuple[np.ndarray, np.ndarray]:
+        n = self.shape[1]
+        print(f"Calculando fatoração SVD de H ({n} valores singulares)...")
+        autovalores, V = np.linalg.eigh(np.asarray(self.HtH, dtype=np.float64))
+        ordem = np.argsort(autovalores)[::-1]
+        sigma = np.sqrt(np.clip(autovalores[ordem], 0.0, None)) # HᵀH é semidefinida: negativos são arredondamento
+        return sigma.astype(self.dtype), np.ascontiguousarray(V[:, ordem], dtype=self.dtype)
+
+    def _transpor(self):
+        return np.ascontiguousarray(self.H.T)
+
+    def _calcular_gram(self) -> np.ndarray:
+        print(f"Calculando matriz de Gram HᵀH {self.shape[1]}x{self.shape[1]}...")
+        return self.H.T @ self.H
+
+    def _contar_nao_nulos(self) -> int:
+        return int(np.count_nonzero(self.H))
+
+    def _custo_normal_direto(self) -> int:
+        m, n = self.shape
+        return 2 * m * n
+
+
+class OperadorHEsparso(OperadorH):
+    # H armazenada em CSR; Hᵀ é guardada como CSR da transposta (o CSC de H), de modo que
+    # memória e produtos matriz-vetor escalam com nnz em vez de m·n.
+
+    formato = "esparsa"
+
+    def __init__(self, H, pre_computar: bool = True, arquivo_modelo: str = None):
+        super().__init__(H.tocsr(), pre_computar, arquivo_modelo=arquivo_modelo)
+
+    def _transpor(self):
+        return self.H.T.tocsr()
+
+    def _calcular_gram(self) -> np.ndarray:
+        # HᵀH de matrizes de sistema costuma ser praticamente cheia: guardada densa
+        print(f"Calculando matriz de Gram HᵀH {self.shape[1]}x{self.shape[1]}...")
+        return (self.Ht @ self.H).toarray()
+
+    def _contar_nao_nulos(self) -> int:
+        return int(self.H.nnz)
+
+    def _custo_normal_direto(self) -> int:
+        return 2 * int(self.H.nnz)
+
+
+class MatrizBlocos:
+    # H em disco, dividida em blocos de linhas por salvar_blocos: um .npy por bloco (aberto com
+    # mmap) ou um .npz comprimido (descomprimido a cada leitura). Nada fica residente além dos
+    # blocos em uso.
+
+    def __init__(self, pasta: str):
+        self.pasta = pasta
+        self.caminho_indice = os.path.join(pasta, ARQUIVO_INDICE_BLOCOS)
+        with open(self.caminho_indice) as f:
+            indice = json.load(f)
+        self.shape = tuple(indice["shape"])
+        self.dtype = np.dtype(indice["dtype"])
+        self.compressao = indice["compressao"] or None
+        self.limites = [tuple(limite) for limite in indice["limites"]] # (linha inicial, linha final) de cada bloco
+        self.nbytes = 0
+
+    def _caminho(self, i: int) -> str:
+        return os.path.join(self.pasta, f"bloco_{i:05d}.{'npz' if self.compressao else 'npy'}")
+
+    def carregar(self, i: int) -> np.ndarray:
+        if self.compressao:
+            with np.load(self._caminho(i)) as arquivo:
+                return arquivo["H"]
+        return np.load(self._caminho(i), mmap_mode="r")
+
+    def antecipar(self, i: int) -> None:
+        # Pede ao SO a leitura do bloco em segundo plano, enquanto os anteriores são processados
+        if i < len(self.limites) and hasattr(os, "posix_fadvise"):
+            fd = os.open(self._caminho(i), os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+
+
+class TranspostaBlocos:
+    # Hᵀ de um OperadorHBlocos sem materializá-la: Ht @ y percorre os blocos (aplicar_transposta)
+
+    def __init__(self, operador: "OperadorHBlocos"):
+        self.operador = operador
+        self.shape = operador.shape[::-1]
+        self.dtype = operador.dtype
+
+    def __matmul__(self, y: np.ndarray) -> np.ndarray:
+        return self.operador.aplicar_transposta(y)
+
+
+class OperadorHBlocos(OperadorH):
+    # Operador de um modelo maior que a memória: H fica em disco em blocos de linhas
+    # (MatrizBlocos) e os produtos percorrem os blocos em `threads` threads, com os próximos
+    # `antecipados` blocos já pedidos ao disco, somando as parcelas. Hᵀ nunca é materializada
+    # (Ht é uma TranspostaBlocos): Hᵀy soma Hᵢᵀyᵢ por bloco e HᵀHx = Σ Hᵢᵀ(Hᵢx) é feito em uma
+    # única passagem. HᵀH só é usada (montada em uma passagem e persistida na pasta dos blocos)
+    # se couber em limite_gram_bytes.
+
+    formato = "blocos"
+    normal_em_uma_passagem = True
+
+    def __init__(self, H: MatrizBlocos, threads: int = 1, antecipados: int = 1, limite_gram_bytes: int = 0,
+                 pre_computar: bool = True):
+        super().__init__(H, pre_computar, arquivo_modelo=H.caminho_indice)
+        self.threads = max(1, threads)
+        self.antecipados = antecipados
+        self.limite_gram_bytes = limite_gram_bytes
+        self.paralelos = self.threads # blocos processados ao mesmo tempo (limitar_threads)
+        self._pool = None
+
+    @property
+    def Ht(self) -> TranspostaBlocos:
+        return TranspostaBlocos(self)
+
+    @property
+    def usa_gram(self) -> bool:
+        n = self.shape[1]
+        return super().usa_gram and n * n * self.dtype.itemsize <= self.limite_gram_bytes
+
+    def parametros(self) -> tuple:
+        # Argumentos para recriar o operador sobre a mesma pasta (ex.: em outro processo)
+        return self.threads, self.antecipados, self.limite_gram_bytes, self.pre_computar
+
+    @contextlib.contextmanager
+    def limitar_threads(self, threads: int):
+        # Divide `threads` threads entre os blocos em paralelo e o BLAS de cada bloco, que usaria
+        # sozinho o limite inteiro; gera as threads do BLAS por bloco. O ajuste vale para o operador
+        # todo: só é exato com uma execução por vez (workers do backend 'processo', 'inline')
+        anterior = self.paralelos
+        self.paralelos = max(1, min(self.threads, threads))
+        try:
+            yield max(1, threads // self.paralelos)
+        finally:
+            self.paralelos = anterior
+
+    def percorrer(self, funcao):
+        # funcao(bloco, inicio, fim) para cada bloco; gera os resultados na ordem dos blocos,
+        # com no máximo `paralelos` blocos em processamento
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="blocos-h")
+                    weakref.finalize(self, self._pool.shutdown, wait=False)
+        processar = lambda i: funcao(self.H.carregar(i), *self.H.limites[i])
+        pendentes = collections.deque()
+        for i in range(self.antecipados):
+            self.H.antecipar(i)
+        for i in range(len(self.H.limites)):
+            self.H.antecipar(i + self.antecipados)
+            pendentes.append(self._pool.submit(processar, i))
+            if len(pendentes) >= self.paralelos:
+                yield pendentes.popleft().result()
+        while pendentes:
+            yield pendentes.popleft().result()
+
+    def somar_blocos(self, funcao):
+        total = None
+        for parcela in self.percorrer(funcao):
+            total = parcela if total is None else total + parcela
+        return total
+
+    def aplicar(self, x: np.ndarray) -> np.ndarray:
+        y = np.empty((self.shape[0],) + x.shape[1:], dtype=np.result_type(self.dtype, x.dtype))
+        def calcular(bloco, inicio, fim):
+            y[inicio:fim] = bloco @ x
+        for _ in self.percorrer(calcular):
+            pass
+        return y
+
+    def aplicar_transposta(self, y: np.ndarray) -> np.ndarray:
+        return self.somar_blocos(lambda bloco, inicio, fim: bloco.T @ y[inicio:fim])
+
+    def aplicar_transposta_linhas(self, y: np.ndarray, inicio: int) -> np.ndarray:
+        fim = inicio + y.shape[0]
+        total = np.zeros((self.shape[1],) + y.shape[1:], dtype=np.result_type(self.dtype, y.dtype))
+        for i, (inicio_bloco, fim_bloco) in enumerate(self.H.limites):
+            if inicio_bloco < fim and inicio < fim_bloco:
+                a, b = max(inicio, inicio_bloco), min(fim, fim_bloco)
+                total += self.H.carregar(i)[a - inicio_bloco:b - inicio_bloco].T @ y[a - inicio:b - inicio]
+        return total
+
+    def aplicar_normal(self, x: np.ndarray) -> np.ndarray:
+        if self.usa_gram:
+            return self.HtH @ x
+        return self.somar_blocos(lambda bloco, inicio, fim: bloco.T @ (bloco @ x))
+
+    def aplicar_normal_com_norma(self, x: np.ndarray, acumular_float64: bool = False) -> tuple:
+        # Σ Hᵢᵀ(Hᵢx) e Σ ||Hᵢx||² na mesma passagem pelos blocos
+        def calcular(bloco, inicio, fim):
+            w = bloco @ x
+            return bloco.T @ w, _quadrado_norma(w, acumular_float64)
+        normal, quadrado = None, 0.0
+        for parcela_normal, parcela_quadrado in self.percorrer(calcular):
+            normal = parcela_normal if normal is None else normal + parcela_normal
+            quadrado = quadrado + parcela_quadrado
+        return normal, quadrado
+
+    def aquecer(self) -> None:
+        # A pasta não cabe na memória: só a Gram (se usada) é trazida
+        if self.usa_gram:
+            _tocar_paginas(self.HtH)
+
+    def _estrutura_persistida(self, sufixo: str, calcular):
+        # Estruturas derivadas (HᵀH) ficam na pasta dos blocos
+        return carregar_derivado(os.path.join(self.H.pasta, f"{sufixo}.npy"), self.H.caminho_indice, calcular)
+
+    def _calcular_gram(self) -> np.ndarray:
+        print(f"Calculando matriz de Gram HᵀH {self.shape[1]}x{self.shape[1]} a partir de {len(self.H.limites)} blocos...")
+        return self.somar_blocos(lambda bloco, inicio, fim: bloco.T @ bloco)
+
+    def _contar_nao_nulos(self) -> int:
+        return int(self.somar_blocos(lambda bloco, inicio, fim: np.count_nonzero(bloco)))
+
+
+def salvar_blocos(pasta: str, H: np.ndarray, linhas_por_bloco: int, dtype=None, compressao: str = None) -> None:
+    # Grava H (tipicamente um .npy mapeado) em blocos de linhas, um bloco por vez: a matriz
+    # inteira nunca fica na memória. A pasta é montada ao lado e trocada de uma vez no fim.
+    if compressao not in (None, "zlib"):
+        raise ValueError(f"Compressão de blocos '{compressao}' desconhecida. Use '' ou 'zlib'.")
+    dtype = np.dtype(dtype or H.dtype)
+    pasta_temporaria = f"{pasta}.{os.getpid()}.tmp"
+    shutil.rmtree(pasta_temporaria, ignore_errors=True)
+    os.makedirs(pasta_temporaria)
+    limites = [(inicio, min(inicio + linhas_por_bloco, H.shape[0])) for inicio in range(0, H.shape[0], linhas_por_bloco)]
+    for i, (inicio, fim) in enumerate(limites):
+        bloco = np.ascontiguousarray(H[inicio:fim], dtype=dtype)
+        if compressao:
+            np.savez_compressed(os.path.join(pasta_temporaria, f"bloco_{i:05d}.npz"), H=bloco)
+        else:
+            np.save(os.path.join(pasta_temporaria, f"bloco_{i:05d}.npy"), bloco)
+    with open(os.path.join(pasta_temporaria, ARQUIVO_INDICE_BLOCOS), "w") as f:
+        json.dump({"shape": list(H.shape), "dtype": str(dtype), "compressao": compressao or "", "limites": limites}, f)
+    shutil.rmtree(pasta, ignore_errors=True)
+    os.replace(pasta_temporaria, pasta)
+
+
+def _quadrado_norma(w: np.ndarray, acumular_float64: bool = False):
+    # ||w||² (escalar) ou de cada coluna; em float32, acumular em float64 como nos algoritmos
+    dtype = np.float64 if acumular_float64 and w.dtype != np.float64 else None
+    if w.ndim == 1:
+        return float(np.einsum('i,i->', w, w, dtype=dtype))
+    return np.einsum('ij,ij->j', w, w, dtype=dtype)
+
+
+def _bytes_estrutura(estrutura) -> int:
+    if hasattr(estrutura, "nnz"):
+        return estrutura.data.nbytes + estrutura.indices.nbytes + estrutura.indptr.nbytes
+    return estrutura.nbytes
+
+
+def _mapeada(estrutura) -> bool:
+    if hasattr(estrutura, "nnz"):
+        return _mapeada(estrutura.data)
+    while estrutura is not None:
+        if isinstance(estrutura, (np.memmap, mmap.mmap)):
+            return True
+        estrutura = getattr(estrutura, "base", None)
+    return False
+
+
+def _tocar_paginas(estrutura) -> None:
+    # Lê um valor por página para que o SO carregue a estrutura inteira antes do primeiro uso
+    if hasattr(estrutura, "nnz"):
+        for parte in (estrutura.data, estrutura.indices, estrutura.indptr):
+            _tocar_paginas(parte)
+        return
+    plano = np.ravel(estrutura, order="K")
+    passo = max(mmap.PAGESIZE // plano.itemsize, 1)
+    plano[::passo].sum()
+
+
+def _modulo_sparse():
+    # scipy é dependência opcional: só é necessária quando o armazenamento esparso é usado
+    try:
+        from scipy import sparse
+    except ImportError as e:
+        raise ImportError("O armazenamento esparso das matrizes H requer o pacote 'scipy'.") from e
+    return sparse
+
+
+def converter_para_esparsa(H: np.ndarray):
+    return _modulo_sparse().csr_matrix(H)
+
+
+def salvar_esparsa(caminho: str, H) -> None:
+    _modulo_sparse().save_npz(caminho, H, compressed=False)
+
+
+def carregar_esparsa(caminho: str):
+    return _modulo_sparse().load_npz(caminho)
+
+
+def carregar_derivado(caminho: str, caminho_origem: str, calcular) -> np.ndarray:
+    # .npy derivado de caminho_origem: gerado se ausente ou mais antigo que a origem, aberto com mmap
+    if not os.path.exists(caminho) or os.path.getmtime(caminho) < os.path.getmtime(caminho_origem):
+        # Escrita atômica: outros workers podem estar gerando o mesmo arquivo
+        caminho_temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(caminho_temporario, "wb") as f:
+            np.save(f, calcular())
+        os.replace(caminho_temporario, caminho)
+    return np.load(caminho, mmap_mode="r")
+
+
+def como_operador(H) -> OperadorH:
+    # Matrizes soltas viram operadores efêmeros, sem cópias nem Gram: o custo m·n² de
+    # montar HᵀH só compensa quando o operador é reaproveitado entre reconstruções.
+    if isinstance(H, OperadorH):
+        return H
+    if hasattr(H, "tocsr"):
+        return OperadorHEsparso(H, pre_computar=False)
+    return OperadorH(np.asarray(H), pre_computar=False)
@@ -0,0 +1,115 @@
+import collections
+import time
+
+import numpy as np
+
+
+def estimar_ruido(g: np.ndarray) -> np.ndarray:
+    # Desvio padrão do ruído por amostra de g (ou de cada coluna de G), pela mediana dos desvios
+    # absolutos das segundas diferenças entre amostras consecutivas: o sinal amostrado varia de forma
+    # suave e a segunda diferença é dominada pelo ruído (σ dela = √6·σ; MAD / 0.6745 ≈ σ gaussiano)
+    diferencas = np.diff(np.asarray(g, dtype=np.float64), n=2, axis=0)
+    mad = np.median(np.abs(diferencas - np.median(diferencas, axis=0)), axis=0)
+    return mad / (0.6745 * np.sqrt(6))
+
+
+class PoliticaParada:
+    # Critérios de parada do CGNE e do CGNR, além do limite de iterações (max_iter) e da tolerância
+    # (tol) recebidos pelos algoritmos. A tolerância vale para o resíduo relativo das equações
+    # normais nos dois algoritmos: ||Hᵀg - (HᵀH + lambda·I)f|| / ||Hᵀg|| (lambda = 0 no CGNR).
+    #   min_iteracoes: iterações antes de a tolerância e a estagnação serem avaliadas (partindo de zeros);
+    #   tau_discrepancia: princípio da discrepância, para quando ||g - Hf|| <= tau·σ·√m, com σ o ruído
+    #       por amostra de g (ruido_sinal; 'auto' estima do próprio sinal); 0 desativa;
+    #   janela_estagnacao: para quando ||g - Hf|| caiu menos que a fração reducao_estagnacao nas
+    #       últimas janela_estagnacao iterações; 0 desativa;
+    #   tempo_maximo_s: orçamento de tempo do algoritmo; 0 desativa.
+    # PoliticaParada() aplica apenas max_iter e tol.
+
+    def __init__(self, min_iteracoes: int = 0, tau_discrepancia: float = 0.0, ruido_sinal="auto",
+                 janela_estagnacao: int = 0, reducao_estagnacao: float = 1e-4, tempo_maximo_s: float = 0.0):
+        self.min_iteracoes = int(min_iteracoes)
+        self.tau_discrepancia = float(tau_discrepancia)
+        self.ruido_sinal = ruido_sinal if ruido_sinal == "auto" else float(ruido_sinal)
+        self.janela_estagnacao = int(janela_estagnacao)
+        self.reducao_estagnacao = float(reducao_estagnacao)
+        self.tempo_maximo_s = float(tempo_maximo_s)
+
+    @property
+    def usa_residuo_dados(self) -> bool:
+        # Discrepância e estagnação acompanham ||g - Hf||, que o CGNE não calcula por padrão
+        return self.tau_discrepancia > 0 or self.janela_estagnacao > 0
+
+    def para_sinal(self, g: np.ndarray) -> "PoliticaParada":
+        # Cópia com o ruído de g já estimado (ruido_sinal='auto' com discrepância ativa), para os metadados
+        if self.ruido_sinal != "auto" or self.tau_discrepancia <= 0:
+            return self
+        return PoliticaParada(
+            self.min_iteracoes, self.tau_discrepancia, float(estimar_ruido(g)),
+            self.janela_estagnacao, self.reducao_estagnacao, self.tempo_maximo_s
+        )
+
+    def chave(self) -> tuple:
+        # Parâmetros que alteram o resultado (cache de resultados e agrupamento em lotes)
+        return (self.min_iteracoes, self.tau_discrepancia, self.ruido_sinal,
+                self.janela_estagnacao, self.reducao_estagnacao, self.tempo_maximo_s)
+
+    def descrever(self) -> dict:
+        return {
+            "min_iteracoes": self.min_iteracoes,
+            "tau_discrepancia": self.tau_discrepancia,
+            "ruido_sinal": self.ruido_sinal,
+            "janela_estagnacao": self.janela_estagnacao,
+            "reducao_estagnacao": self.reducao_estagnacao,
+            "tempo_maximo_s": self.tempo_maximo_s,
+        }
+
+    def iniciar(self, tol: float, normas_b, g: np.ndarray, partida_aquecida: bool = False) -> "CriterioParada":
+        # Estado da parada de uma execução; normas_b = ||Hᵀg|| por sinal (escalar ou uma por coluna de g)
+        limiares = None
+        if self.tau_discrepancia > 0:
+            ruido = estimar_ruido(g) if self.ruido_sinal == "auto" else self.ruido_sinal
+            limiares = np.atleast_1d(self.tau_discrepancia * ruido * np.sqrt(g.shape[0]))
+        return CriterioParada(self, tol, normas_b, limiares, 0 if partida_aquecida else self.min_iteracoes)
+
+
+class CriterioParada:
+    # Avaliado a cada iteração, com uma entrada por sinal (um nos algoritmos sequenciais,
+    # uma por coluna nas variantes em bloco)
+
+    def __init__(self, politica: PoliticaParada, tol: float, normas_b, limiares_discrepancia: np.ndarray,
+                 min_iteracoes: int):
+        self.politica = politica
+        self.tol = tol
+        self.normas_b = np.atleast_1d(np.asarray(normas_b, dtype=np.float64))
+        self.limiares_discrepancia = limiares_discrepancia
+        self.min_iteracoes = min_iteracoes
+        self.inicio = time.perf_counter()
+        self._historico = collections.deque(maxlen=politica.janela_estagnacao) # ||g - Hf|| das últimas iterações
+
+    def avaliar(self, iteracao: int, normas_residuo, normas_dados=None) -> np.ndarray:
+        # Motivo de parada de cada sinal nesta iteração ('' = continua).
+        # normas_residuo: resíduo das equações normais; normas_dados: ||g - Hf|| (se usa_residuo_dados)
+        politica = self.politica
+        relativos = np.divide(
+            np.atleast_1d(normas_residuo), self.normas_b,
+            out=np.zeros(self.normas_b.shape), where=self.normas_b > 0
+        )
+        motivos = np.full(relativos.shape, "", dtype=object)
+
+        def marcar(condicao, motivo):
+            motivos[(motivos == "") & condicao] = motivo
+
+        if iteracao >= self.min_iteracoes:
+            marcar(relativos < self.tol, "tolerancia")
+        if normas_dados is not None:
+            dados = np.atleast_1d(np.asarray(normas_dados, dtype=np.float64))
+            if self.limiares_discrepancia is not None:
+                marcar(dados <= self.limiares_discrepancia, "discrepancia")
+            if politica.janela_estagnacao > 0:
+                if iteracao >= self.min_iteracoes and len(self._historico) == politica.janela_estagnacao:
+                    anterior = self._historico[0]
+                    marcar(anterior - dados <= politica.reducao_estagnacao * anterior, "estagnacao")
+                self._historico.append(dados)
+        if politica.tempo_maximo_s > 0 and time.perf_counter() - self.inicio >= politica.tempo_maximo_s:
+            marcar(True, "tempo")
+        return motivos
@@ -0,0 +1,140 @@
+import threading
+import weakref
+
+import numpy as np
+
+from compartilhado.constantes import TAMANHO_BLOCO_PRECONDICIONADOR
+
+# Estruturas que dependem só do modelo (normas das colunas, blocos diagonais de HᵀH),
+# calculadas uma vez por operador e descartadas junto com ele
+_ESTRUTURAS_POR_OPERADOR = weakref.WeakKeyDictionary()
+_LOCK_ESTRUTURAS = threading.Lock()
+
+
+class Precondicionador:
+    # Aproximação M de HᵀH + lambda·I com inversa barata: aplicar(r) devolve M⁻¹r.
+    # Os algoritmos precondicionados só dependem desta interface.
+
+    nome = "nenhum"
+    aceita_tamanho = False # especificação '<nome>:<tamanho>'
+
+    def aplicar(self, r: np.ndarray) -> np.ndarray:
+        return r
+
+
+class PrecondicionadorJacobi(Precondicionador):
+    # M = diag(HᵀH) + lambda·I; a diagonal de HᵀH são as normas² das colunas de H
+
+    nome = "jacobi"
+
+    def __init__(self, op, lam: float):
+        diagonal = _estrutura(op, ("jacobi",), lambda: _normas_colunas_quadradas(op)) + lam
+        diagonal[diagonal <= 0] = 1.0 # colunas nulas de H: sem escala
+        self._inversa = (1.0 / diagonal).astype(op.dtype)
+
+    def aplicar(self, r: np.ndarray) -> np.ndarray:
+        # r pode ser um vetor ou um bloco de colunas (variantes multi-RHS)
+        return r * (self._inversa if r.ndim == 1 else self._inversa[:, None])
+
+
+class PrecondicionadorBlocoDiagonal(Precondicionador):
+    # M = blocos diagonais tamanho×tamanho de HᵀH + lambda·I (pixels vizinhos acoplados),
+    # invertidos de uma vez; o último bloco é completado com a identidade
+
+    nome = "bloco"
+    aceita_tamanho = True
+
+    def __init__(self, op, lam: float, tamanho: int = TAMANHO_BLOCO_PRECONDICIONADOR):
+        self.n = op.shape[1]
+        self.tamanho = min(tamanho, self.n)
+        blocos = _estrutura(op, ("bloco", self.tamanho), lambda: _blocos_gram(op, self.tamanho))
+        blocos = blocos + lam * np.eye(self.tamanho)
+        self._inversas = np.linalg.inv(blocos).astype(op.dtype)
+        self.nome = f"bloco:{self.tamanho}"
+
+    def aplicar(self, r: np.ndarray) -> np.ndarray:
+        num_blocos = self._inversas.shape[0]
+        preenchimento = num_blocos * self.tamanho - self.n
+        if r.ndim == 1:
+            blocos = np.pad(r, (0, preenchimento)).reshape(num_blocos, self.tamanho)
+            return np.einsum('bij,bj->bi', self._inversas, blocos).reshape(-1)[:self.n]
+        blocos = np.pad(r, ((0, preenchimento), (0, 0))).reshape(num_blocos, self.tamanho, r.shape[1])
+        return np.einsum('bij,bjk->bik', self._inversas, blocos).reshape(-1, r.shape[1])[:self.n]
+
+
+PRECONDICIONADORES = {
+    "jacobi": PrecondicionadorJacobi,
+    "bloco": PrecondicionadorBlocoDiagonal,
+}
+
+
+def validar_precondicionador(especificacao: str) -> str:
+    # Nome ('jacobi', 'bloco' ou 'bloco:<tamanho>', com tamanho inteiro positivo) já validado;
+    # vazio ou None = sem precondicionador
+    if not especificacao:
+        return None
+    nome, separador, parametro = especificacao.strip().partition(":")
+    if nome not in PRECONDICIONADORES:
+        raise ValueError(f"Precondicionador '{especificacao}' desconhecido. Use {', '.join(PRECONDICIONADORES)}.")
+    if separador:
+        if not PRECONDICIONADORES[nome].aceita_tamanho:
+            raise ValueError(f"Precondicionador '{nome}' não aceita tamanho ('{especificacao}').")
+        if not parametro.isdigit() or int(parametro) <= 0:
+            raise ValueError(f"Tamanho do precondicionador '{especificacao}' inválido: use '{nome}:<inteiro positivo>'.")
+        return f"{nome}:{int(parametro)}"
+    return nome
+
+
+def criar_precondicionador(especificacao, op, lam: float) -> Precondicionador:
+    # especificacao: None, um Precondicionador pronto ou o nome ('jacobi', 'bloco' ou 'bloco:<tamanho>')
+    if especificacao is None or isinstance(especificacao, Precondicionador):
+        return especificacao
+    nome, _, parametro = validar_precondicionador(especificacao).partition(":")
+    if parametro:
+        return PRECONDICIONADORES[nome](op, lam, int(parametro))
+    return PRECONDICIONADORES[nome](op, lam)
+
+
+def _estrutura(op, chave: tuple, calcular) -> np.ndarray:
+    with _LOCK_ESTRUTURAS:
+        estruturas = _ESTRUTURAS_POR_OPERADOR.setdefault(op, {})
+    if chave not in estruturas:
+        estruturas[chave] = calcular()
+    return estruturas[chave]
+
+
+def _normas_colunas_quadradas(op) -> np.ndarray:
+    if op.formato == "esparsa":
+        return np.asarray(op.H.multiply(op.H).sum(axis=0), dtype=np.float64).ravel()
+    if op.usa_gram:
+        return np.diagonal(op.HtH).astype(np.float64)
+    if op.formato == "blocos":
+        return op.somar_blocos(lambda bloco, inicio, fim: np.einsum('ij,ij->j', bloco, bloco, dtype=np.float64))
+    return np.einsum('ij,ij->j', op.H, op.H, dtype=np.float64)
+
+
+def _blocos_gram(op, tamanho: int) -> np.ndarray:
+    # Blocos diagonais de HᵀH em float64; com a Gram pronta são apenas recortes dela
+    n = op.shape[1]
+    num_blocos = -(-n // tamanho)
+    blocos = np.tile(np.eye(tamanho), (num_blocos, 1, 1))
+    if op.formato == "blocos" and not op.usa_gram:
+        # H em disco: todos os blocos diagonais somados em uma única passagem pelos blocos de linhas
+        def parcela(linhas, inicio, fim):
+            colunas = np.pad(linhas, ((0, 0), (0, num_blocos * tamanho - n))).reshape(linhas.shape[0], num_blocos, tamanho)
+            return np.einsum('mbi,mbj->bij', colunas, colunas, dtype=np.float64)
+        soma = op.somar_blocos(parcela)
+        ultimo = n - (num_blocos - 1) * tamanho
+        soma[-1, ultimo:, ultimo:] = np.eye(tamanho - ultimo) # preenchimento: identidade
+        return soma
+    for b in range(num_blocos):
+        inicio, fim = b * tamanho, min((b + 1) * tamanho, n)
+        if op.usa_gram:
+            bloco = op.HtH[inicio:fim, inicio:fim]
+        else:
+            colunas = op.H[:, inicio:fim]
+            bloco = colunas.T @ colunas
+            if hasattr(bloco, "toarray"):
+                bloco = bloco.toarray()
+        blocos[b, :fim - inicio, :fim - inicio] = bloco
+    return blocos
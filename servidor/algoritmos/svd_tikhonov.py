@@ -0,0 +1,46 @@
+import numpy as np
+
+from servidor.algoritmos.operador_h import como_operador
+
+
+def reconstruir_svd(g_vec: np.ndarray, H, lam: float, max_iter: int, tol: float,
+                    acumular_float64: bool = False, ao_iterar=None, cancelamento=None,
+                    posto: int = None, Htg: np.ndarray = None) -> tuple[np.ndarray, int, str]:
+    # Solução direta de Tikhonov, min ||g - Hf||² + lambda·||f||², pela SVD de H pré-computada:
+    #   f = V diag(σ / (σ² + lambda)) Uᵀg = V diag(1 / (σ² + lambda)) Vᵀ Hᵀg
+    # (é a solução exata do sistema (HᵀH + lambda·I) f = Hᵀg que o CGNE/CGNR aproximam).
+    # Custo por sinal: uma passagem por H e dois produtos n×n, sem iterações.
+    # posto limita a solução aos maiores valores singulares (SVD truncada); Htg, se informado, dispensa Hᵀg.
+    # max_iter, tol, ao_iterar e cancelamento mantêm a assinatura (e o retorno) dos algoritmos iterativos.
+    op = como_operador(H)
+    sigma, V = _fatoracao_truncada(op, posto)
+    print(f"Iniciando reconstrução SVD/Tikhonov (lambda={lam:.2e}, posto={sigma.shape[0]})...")
+
+    b = op.aplicar_transposta(np.asarray(g_vec, dtype=op.dtype)) if Htg is None else np.asarray(Htg, dtype=op.dtype)
+    coeficientes = V.T @ b
+    # Filtro de Tikhonov em float64: σ² + lambda perde dígitos em float32 quando lambda << σ²
+    filtro = 1.0 / (np.square(sigma, dtype=np.float64) + float(lam))
+    coeficientes = (coeficientes * filtro).astype(op.dtype, copy=False)
+    return V @ coeficientes, 0, "solucao_direta"
+
+
+def reconstruir_svd_bloco(G: np.ndarray, H, lams: np.ndarray, max_iter: int, tol: float,
+                          acumular_float64: bool = False, ao_iterar: list = None,
+                          cancelamentos: list = None, posto: int = None) -> tuple[np.ndarray, np.ndarray, list]:
+    # Variante multi-RHS: cada coluna de G com seu lambda; Hᵀ G e os produtos com V viram GEMM
+    op = como_operador(H)
+    sigma, V = _fatoracao_truncada(op, posto)
+    print(f"Iniciando reconstrução SVD/Tikhonov em bloco ({G.shape[1]} sinais, posto={sigma.shape[0]})...")
+
+    B = op.aplicar_transposta(np.asarray(G, dtype=op.dtype))
+    coeficientes = V.T @ B
+    filtros = 1.0 / (np.square(sigma, dtype=np.float64)[:, None] + np.asarray(lams, dtype=np.float64))
+    coeficientes = (coeficientes * filtros).astype(op.dtype, copy=False)
+    return V @ coeficientes, np.zeros(G.shape[1], dtype=int), ["solucao_direta"] * G.shape[1]
+
+
+def _fatoracao_truncada(op, posto: int) -> tuple[np.ndarray, np.ndarray]:
+    sigma, V = op.fatoracao_svd
+    if posto is not None and 0 < posto < sigma.shape[0]:
+        sigma, V = sigma[:posto], V[:, :posto]
+    return sigma, V
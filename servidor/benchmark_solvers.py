@@ -0,0 +1,356 @@
+import contextlib
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from compartilhado import util
+from compartilhado.constantes import (
+    DIMENSOES_H_30X30, N_PARA_GANHO_30X30, S_PARA_GANHO_30X30,
+    DIMENSOES_H_60X60, N_PARA_GANHO_60X60, S_PARA_GANHO_60X60,
+    N_SENSORES_PADRAO, LIMIAR_DENSIDADE_ESPARSA, PASTA_BENCHMARKS,
+    BENCHMARK_GEOMETRIAS, BENCHMARK_ALGORITMOS, BENCHMARK_DTYPES, BENCHMARK_THREADS,
+    BENCHMARK_DENSIDADE, BENCHMARK_CONDICIONAMENTO, BENCHMARK_ITERACOES, BENCHMARK_REPETICOES,
+    BENCHMARK_SEMENTE, BENCHMARK_BASE, BENCHMARK_LIMIAR_REGRESSAO
+)
+from servidor.algoritmos.cg_algoritmos import reconstruir_cgne, reconstruir_cgnr
+from servidor.algoritmos.operador_h import OperadorH, OperadorHEsparso
+from servidor.algoritmos.svd_tikhonov import reconstruir_svd
+
+# Geometrias dos modelos: (linhas, colunas) de H e (sensores, amostras) do ganho.
+# '90x90' extrapola as anteriores (amostras proporcionais ao lado da imagem) para medir modelos maiores.
+GEOMETRIAS = {
+    "30x30": (DIMENSOES_H_30X30, (N_PARA_GANHO_30X30, S_PARA_GANHO_30X30)),
+    "60x60": (DIMENSOES_H_60X60, (N_PARA_GANHO_60X60, S_PARA_GANHO_60X60)),
+    "90x90": ((64 * 1152, 8100), (64, 1152)),
+}
+
+ALGORITMOS = {
+    "CGNE": reconstruir_cgne,
+    "CGNR": reconstruir_cgnr,
+    "SVD": reconstruir_svd,
+}
+
+# Campos que identificam um caso medido; a comparação com a base casa resultados por eles
+CHAVE_RESULTADO = ("geometria", "formato", "dtype", "threads", "densidade", "condicionamento", "caso")
+
+
+def _modulo_threadpoolctl():
+    # threadpoolctl é dependência opcional: só é necessária para limitar as threads do BLAS
+    try:
+        import threadpoolctl
+    except ImportError as e:
+        raise ImportError("Limitar as threads do BLAS no benchmark (BENCHMARK_THREADS) requer o pacote 'threadpoolctl'.") from e
+    return threadpoolctl
+
+
+def _modulo_scipy_sparse():
+    # scipy é dependência opcional: só é necessária para medir o formato esparso
+    try:
+        from scipy import sparse
+    except ImportError as e:
+        raise ImportError("Medir matrizes H esparsas no benchmark requer o pacote 'scipy'.") from e
+    return sparse
+
+
+def interpretar_geometria(nome: str) -> tuple[tuple, tuple]:
+    # '30x30' -> geometria do modelo; '<linhas>x<colunas>' -> H com essas dimensões e N_SENSORES_PADRAO sensores
+    if nome in GEOMETRIAS:
+        return GEOMETRIAS[nome]
+    linhas, _, colunas = nome.partition("x")
+    if not (linhas.isdigit() and colunas.isdigit()):
+        raise ValueError(f"Geometria '{nome}' inválida. Use {', '.join(GEOMETRIAS)} ou '<linhas>x<colunas>'.")
+    linhas, colunas = int(linhas), int(colunas)
+    if linhas % N_SENSORES_PADRAO:
+        raise ValueError(f"O número de linhas de H ({linhas}) deve ser múltiplo de {N_SENSORES_PADRAO} sensores.")
+    return (linhas, colunas), (N_SENSORES_PADRAO, linhas // N_SENSORES_PADRAO)
+
+
+def _lista(texto: str) -> list[str]:
+    return [item.strip() for item in texto.split(",") if item.strip()]
+
+
+def gerar_matriz_sintetica(forma: tuple, densidade: float, condicionamento: float, dtype, rng,
+                           linhas_por_bloco: int = 4096):
+    # Gaussiana com as colunas escaladas de 1 a 1/condicionamento (em ordem aleatória): HᵀH fica com
+    # número de condição próximo de condicionamento². Gerada em blocos de linhas para não criar uma
+    # cópia float64 inteira; com densidade < LIMIAR_DENSIDADE_ESPARSA é devolvida em CSR.
+    m, n = forma
+    escalas = np.geomspace(1.0, 1.0 / condicionamento, n)[rng.permutation(n)].astype(dtype)
+    esparsa = densidade < LIMIAR_DENSIDADE_ESPARSA
+    blocos = []
+    H = None if esparsa else np.empty(forma, dtype=dtype)
+    for inicio in range(0, m, linhas_por_bloco):
+        fim = min(inicio + linhas_por_bloco, m)
+        bloco = rng.standard_normal((fim - inicio, n), dtype=np.float32).astype(dtype, copy=False)
+        bloco *= escalas
+        if densidade < 1.0:
+            bloco[rng.random((fim - inicio, n), dtype=np.float32) >= densidade] = 0
+        if esparsa:
+            blocos.append(_modulo_scipy_sparse().csr_matrix(bloco))
+        else:
+            H[inicio:fim] = bloco
+    return _modulo_scipy_sparse().vstack(blocos, format="csr") if esparsa else H
+
+
+def gerar_imagem_sintetica(lado: int, rng) -> np.ndarray:
+    # Algumas manchas gaussianas: objeto suave, com erro de reconstrução comparável entre execuções
+    eixo = np.linspace(-1.0, 1.0, lado)
+    x, y = np.meshgrid(eixo, eixo)
+    imagem = np.zeros((lado, lado))
+    for cx, cy, raio in rng.uniform((-0.6, -0.6, 0.1), (0.6, 0.6, 0.3), size=(3, 3)):
+        imagem += np.exp(-((x - cx) ** 2 + (y - cy) ** 2) / (2 * raio ** 2))
+    return imagem.ravel()
+
+
+def _estatisticas(tempos: list) -> dict:
+    tempos_ms = [t * 1000 for t in tempos]
+    return {
+        "repeticoes": len(tempos_ms),
+        "min_ms": min(tempos_ms),
+        "mediana_ms": statistics.median(tempos_ms),
+        "media_ms": statistics.fmean(tempos_ms),
+        "desvio_ms": statistics.stdev(tempos_ms) if len(tempos_ms) > 1 else 0.0,
+    }
+
+
+def _cronometrar(funcao, repeticoes: int, aquecimento: int = 1):
+    # Uma execução de aquecimento (estruturas preguiçosas, caches do BLAS) fora das medidas;
+    # a saída impressa pelos algoritmos é descartada
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        for _ in range(aquecimento):
+            retorno = funcao()
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            retorno = funcao()
+            tempos.append(time.perf_counter() - inicio)
+    return tempos, retorno
+
+
+class BenchmarkSolvers:
+    # Mede o caminho de uma reconstrução no servidor (ganho, lambda, algoritmo, imagem e metadados)
+    # com matrizes H sintéticas, para cada geometria, precisão e número de threads do BLAS.
+
+    def __init__(self, geometrias=None, algoritmos=None, dtypes=None, threads=None,
+                 densidade: float = BENCHMARK_DENSIDADE, condicionamento: float = BENCHMARK_CONDICIONAMENTO,
+                 iteracoes: int = BENCHMARK_ITERACOES, repeticoes: int = BENCHMARK_REPETICOES,
+                 semente: int = BENCHMARK_SEMENTE):
+        self.geometrias = geometrias or _lista(BENCHMARK_GEOMETRIAS)
+        self.algoritmos = algoritmos or _lista(BENCHMARK_ALGORITMOS)
+        self.dtypes = dtypes or _lista(BENCHMARK_DTYPES)
+        self.threads = threads if threads is not None else [int(t) for t in _lista(BENCHMARK_THREADS)]
+        self.densidade = densidade
+        self.condicionamento = condicionamento
+        self.iteracoes = iteracoes
+        self.repeticoes = repeticoes
+        self.semente = semente
+        for geometria in self.geometrias:
+            interpretar_geometria(geometria)
+        for especificacao in self.algoritmos:
+            nome, _, _ = especificacao.partition(":")
+            if nome not in ALGORITMOS:
+                raise ValueError(f"Algoritmo '{nome}' desconhecido. Use {', '.join(ALGORITMOS)}.")
+        if self.threads:
+            _modulo_threadpoolctl()
+        self.resultados = []
+
+    def configuracao(self) -> dict:
+        return {
+            "geometrias": self.geometrias,
+            "algoritmos": self.algoritmos,
+            "dtypes": self.dtypes,
+            "threads": self.threads or ["padrao"],
+            "densidade": self.densidade,
+            "condicionamento": self.condicionamento,
+            "iteracoes": self.iteracoes,
+            "repeticoes": self.repeticoes,
+            "semente": self.semente,
+        }
+
+    def executar(self) -> list[dict]:
+        for geometria in self.geometrias:
+            (m, n), (N, S) = interpretar_geometria(geometria)
+            rng = np.random.default_rng(self.semente)
+            f_real = gerar_imagem_sintetica(int(round(np.sqrt(n))), rng) if round(np.sqrt(n)) ** 2 == n else rng.random(n)
+            for dtype in self.dtypes:
+                print(f"Gerando H sintética {m}x{n} ({dtype}, densidade={self.densidade:g}, condicionamento={self.condicionamento:g})...")
+                H = gerar_matriz_sintetica((m, n), self.densidade, self.condicionamento, np.dtype(dtype),
+                                           np.random.default_rng(self.semente))
+                # Sinal com 1% de ruído, em float64 como chega do cliente
+                g = np.asarray(H @ f_real.astype(dtype), dtype=np.float64)
+                g += 0.01 * np.std(g) * np.random.default_rng(self.semente + 1).standard_normal(g.shape[0])
+                for threads in self.threads or [None]:
+                    with self._limitar_threads(threads):
+                        self._medir_combinacao(geometria, H, g, f_real, (N, S), dtype, threads)
+                del H
+        return self.resultados
+
+    @contextlib.contextmanager
+    def _limitar_threads(self, threads):
+        if threads is None:
+            yield
+            return
+        with _modulo_threadpoolctl().threadpool_limits(limits=threads, user_api="blas"):
+            yield
+
+    def _medir_combinacao(self, geometria: str, H, g: np.ndarray, f_real: np.ndarray, ganho: tuple,
+                          dtype: str, threads) -> None:
+        formato = "esparsa" if hasattr(H, "tocsr") else "densa"
+        base = {
+            "geometria": geometria, "formato": formato, "dtype": dtype, "threads": threads or "padrao",
+            "densidade": self.densidade, "condicionamento": self.condicionamento,
+        }
+        print(f"Medindo {geometria} {formato} {dtype} (threads do BLAS: {base['threads']})...")
+
+        # Preparação do operador (Hᵀ, HᵀH e ||HᵀH||₂), feita uma vez por modelo no servidor
+        def preparar():
+            op = OperadorHEsparso(H) if formato == "esparsa" else OperadorH(H)
+            op.aquecer()
+            op.norma_espectral
+            return op
+        tempos, op = _cronometrar(preparar, 1, aquecimento=0)
+        self._registrar(base, "preparacao_operador", tempos)
+
+        # Pré-processamento do servidor (normalização e ganho) sobre o sinal bruto que, com o ganho,
+        # volta a ser g; a normalização só muda a escala, que passa também para a imagem esperada
+        N, S = ganho
+        g_bruto = (g.reshape(N, S) / util.obter_ganho_sinal(N, S)).ravel()
+        tempos, g_preprocessado = _cronometrar(lambda: util.preprocessar_sinal(g_bruto, N, S), self.repeticoes)
+        self._registrar(base, "preprocessar_sinal", tempos)
+        escala = float(np.linalg.norm(g_preprocessado) / np.linalg.norm(g))
+        g = g_preprocessado
+        tempos, lam = _cronometrar(lambda: util.calculo_coeficiente_regularizacao(op, g), self.repeticoes)
+        self._registrar(base, "calculo_coeficiente_regularizacao", tempos)
+
+        f_real = f_real * escala
+        norma_real = np.linalg.norm(f_real)
+        f = None
+        for especificacao in self.algoritmos:
+            nome, _, precondicionador = especificacao.partition(":")
+            extras = {"precondicionador": precondicionador} if precondicionador else {}
+            # tol = 0: sempre BENCHMARK_ITERACOES iterações, para que os tempos sejam comparáveis
+            tempos, (f, num_iteracoes, _) = _cronometrar(
+                lambda: ALGORITMOS[nome](g, op, lam, self.iteracoes, 0.0, **extras), self.repeticoes
+            )
+            self._registrar(base, especificacao, tempos, {
+                "iteracoes": num_iteracoes,
+                "ms_por_iteracao": statistics.median(tempos) * 1000 / max(num_iteracoes, 1),
+                "erro_relativo": float(np.linalg.norm(np.asarray(f, dtype=np.float64) - f_real) / norma_real),
+                "residuo_relativo": op.residuo_relativo(g, f),
+            })
+
+        if f is not None:
+            lado = int(round(np.sqrt(op.shape[1])))
+            if lado * lado == op.shape[1]:
+                tempos = self._medir_gravacao(f, (lado, lado))
+                self._registrar(base, "salvar_imagem_e_metadados", tempos)
+
+    def _medir_gravacao(self, f: np.ndarray, dimensoes: tuple) -> list:
+        # Gravação síncrona em arquivos (modo 'arquivos'), redirecionada para uma pasta temporária
+        pastas_originais = util.PASTA_IMAGENS_RECONSTRUIDAS_SERVIDOR, util.PASTA_METADADOS_RECONSTRUCAO
+        with tempfile.TemporaryDirectory(prefix="benchmark_") as pasta:
+            util.PASTA_IMAGENS_RECONSTRUIDAS_SERVIDOR = os.path.join(pasta, "imagens")
+            util.PASTA_METADADOS_RECONSTRUCAO = os.path.join(pasta, "metadados")
+            try:
+                agora = datetime.datetime.now()
+                tempos, _ = _cronometrar(
+                    lambda: util.salvar_imagem_e_metadados(f, "benchmark", "CGNE", agora, agora, dimensoes, self.iteracoes),
+                    self.repeticoes
+                )
+            finally:
+                util.PASTA_IMAGENS_RECONSTRUIDAS_SERVIDOR, util.PASTA_METADADOS_RECONSTRUCAO = pastas_originais
+        return tempos
+
+    def _registrar(self, base: dict, caso: str, tempos: list, extras: dict = None) -> None:
+        resultado = {**base, "caso": caso, **_estatisticas(tempos), **(extras or {})}
+        self.resultados.append(resultado)
+        print(f"  {caso:<36}{resultado['mediana_ms']:>12.3f} ms (mediana de {resultado['repeticoes']})")
+
+    def salvar(self, caminho: str = None) -> str:
+        if caminho is None:
+            os.makedirs(PASTA_BENCHMARKS, exist_ok=True)
+            carimbo = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            caminho = os.path.join(PASTA_BENCHMARKS, f"benchmark_solvers_{carimbo}.json")
+        with open(caminho, "w") as f:
+            json.dump({
+                "data_hora": datetime.datetime.now().isoformat(),
+                "ambiente": descrever_ambiente(),
+                "configuracao": self.configuracao(),
+                "resultados": self.resultados,
+            }, f, indent=4, default=float)
+        return caminho
+
+
+def descrever_ambiente() -> dict:
+    # Informações que explicam diferenças entre máquinas ao comparar com uma base
+    ambiente = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "processador": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+    try:
+        configuracao = np.show_config(mode="dicts")
+        ambiente["blas"] = configuracao["Build Dependencies"]["blas"].get("name")
+    except (TypeError, KeyError):
+        pass # numpy < 1.25 não descreve a configuração como dicionário
+    return ambiente
+
+
+def comparar_com_base(resultados: list, caminho_base: str, limiar: float = BENCHMARK_LIMIAR_REGRESSAO) -> list[dict]:
+    # Compara as medianas com as de uma execução salva; casos sem correspondência na base são 'novo'
+    with open(caminho_base) as f:
+        base = {tuple(r[c] for c in CHAVE_RESULTADO): r for r in json.load(f)["resultados"]}
+    comparacao = []
+    for resultado in resultados:
+        chave = tuple(resultado[c] for c in CHAVE_RESULTADO)
+        anterior = base.get(chave)
+        item = {c: resultado[c] for c in CHAVE_RESULTADO}
+        item["atual_ms"] = resultado["mediana_ms"]
+        if anterior is None:
+            item.update(base_ms=None, variacao=None, situacao="novo")
+        else:
+            variacao = resultado["mediana_ms"] / anterior["mediana_ms"] - 1 if anterior["mediana_ms"] > 0 else 0.0
+            situacao = "regressao" if variacao > limiar else "melhoria" if variacao < -limiar else "estavel"
+            item.update(base_ms=anterior["mediana_ms"], variacao=variacao, situacao=situacao)
+        comparacao.append(item)
+    return comparacao
+
+
+def imprimir_comparacao(comparacao: list) -> None:
+    print(f"{'geometria':<10}{'formato':<9}{'dtype':<9}{'threads':>8}  {'caso':<36}{'base ms':>12}{'atual ms':>12}{'variação':>10}  situação")
+    for item in comparacao:
+        base_ms = f"{item['base_ms']:12.3f}" if item["base_ms"] is not None else f"{'-':>12}"
+        variacao = f"{item['variacao']:+10.1%}" if item["variacao"] is not None else f"{'-':>10}"
+        print(f"{item['geometria']:<10}{item['formato']:<9}{item['dtype']:<9}{str(item['threads']):>8}  {item['caso']:<36}"
+              f"{base_ms}{item['atual_ms']:12.3f}{variacao}  {item['situacao']}")
+
+
+def executar_benchmark(caminho_base: str = BENCHMARK_BASE, limiar: float = BENCHMARK_LIMIAR_REGRESSAO, **parametros) -> int:
+    # Retorna o número de regressões em relação à base (0 sem base)
+    benchmark = BenchmarkSolvers(**parametros)
+    benchmark.executar()
+    caminho = benchmark.salvar()
+    print(f"\nResultados salvos em: {caminho}")
+    if not caminho_base:
+        return 0
+    comparacao = comparar_com_base(benchmark.resultados, caminho_base, limiar)
+    print(f"\n--- Comparação com {caminho_base} (limiar de regressão: {limiar:.0%}) ---")
+    imprimir_comparacao(comparacao)
+    regressoes = sum(item["situacao"] == "regressao" for item in comparacao)
+    if regressoes:
+        print(f"[AVISO] {regressoes} caso(s) com regressão de desempenho.")
+    return regressoes
+
+
+if __name__ == "__main__":
+    # Código de saída 1 quando há regressões: pode ser usado como verificação antes de integrar mudanças
+    sys.exit(1 if executar_benchmark() else 0)
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+
+def calcular_chave(conteudo_sinal: bytes, *parametros) -> str:
+    # Endereço do resultado: SHA-256 dos bytes do sinal e de tudo que altera a reconstrução
+    h = hashlib.sha256(conteudo_sinal)
+    h.update(json.dumps([str(p) for p in parametros]).encode("utf-8"))
+    return h.hexdigest()
+
+
+class CacheResultados:
+    # Cache LRU de resultados de reconstrução (dicionários serializáveis em JSON), endereçada pelo
+    # conteúdo da requisição. Nível 1 em memória e nível 2 em disco (um .json por chave,
+    # compartilhado entre os workers do uvicorn), cada um com seu limite em bytes. Um acerto no
+    # disco promove a entrada para a memória.
+
+    def __init__(self, limite_bytes_memoria: int, limite_bytes_disco: int, pasta: str):
+        self.limite_bytes_memoria = limite_bytes_memoria
+        self.limite_bytes_disco = limite_bytes_disco
+        self.pasta = pasta
+        self._memoria = OrderedDict() # chave -> (resultado, tamanho em bytes)
+        self._bytes_memoria = 0
+        self._disco = OrderedDict() # chave -> tamanho em bytes, do menos para o mais recente
+        self._bytes_disco = 0
+        self.contadores = {"acertos_memoria": 0, "acertos_disco": 0, "falhas": 0, "remocoes": 0}
+        if self.limite_bytes_disco > 0:
+            os.makedirs(self.pasta, exist_ok=True)
+            self._indexar_disco()
+
+    def obter(self, chave: str) -> dict:
+        if chave in self._memoria:
+            resultado, _ = self._memoria[chave]
+            self._memoria.move_to_end(chave)
+            self.contadores["acertos_memoria"] += 1
+            return resultado
+
+        resultado = self._ler_disco(chave)
+        if resultado is not None:
+            self.contadores["acertos_disco"] += 1
+            self._guardar_memoria(chave, resultado)
+            return resultado
+
+        self.contadores["falhas"] += 1
+        return None
+
+    def guardar(self, chave: str, resultado: dict) -> None:
+        self._guardar_memoria(chave, resultado)
+        self._guardar_disco(chave, resultado)
+
+    def estatisticas(self) -> dict:
+        acertos = self.contadores["acertos_memoria"] + self.contadores["acertos_disco"]
+        consultas = acertos + self.contadores["falhas"]
+        return {
+            **self.contadores,
+            "taxa_acerto": acertos / consultas if consultas else 0.0,
+            "entradas_memoria": len(self._memoria),
+            "bytes_memoria": self._bytes_memoria,
+            "limite_bytes_memoria": self.limite_bytes_memoria,
+            "entradas_disco": len(self._disco),
+            "bytes_disco": self._bytes_disco,
+            "limite_bytes_disco": self.limite_bytes_disco,
+        }
+
+    def _guardar_memoria(self, chave: str, resultado: dict) -> None:
+        tamanho = len(json.dumps(resultado))
+        if tamanho > self.limite_bytes_memoria:
+            return
+        if chave in self._memoria:
+            self._bytes_memoria -= self._memoria.pop(chave)[1]
+        self._memoria[chave] = (resultado, tamanho)
+        self._bytes_memoria += tamanho
+        while self._bytes_memoria > self.limite_bytes_memoria:
+            _, (_, tamanho_antigo) = self._memoria.popitem(last=False)
+            self._bytes_memoria -= tamanho_antigo
+            self.contadores["remocoes"] += 1
+
+    def _caminho(self, chave: str) -> str:
+        return os.path.join(self.pasta, f"{chave}.json")
+
+    def _indexar_disco(self) -> None:
+        # Entradas deixadas por execuções anteriores (ou outros workers), das mais antigas às mais recentes
+        entradas = []
+        for nome in os.listdir(self.pasta):
+            if nome.endswith(".json"):
+                info = os.stat(os.path.join(self.pasta, nome))
+                entradas.append((info.st_mtime, nome[:-len(".json")], info.st_size))
+        for _, chave, tamanho in sorted(entradas):
+            self._disco[chave] = tamanho
+            self._bytes_disco += tamanho
+        self._limitar_disco()
+
+    def _ler_disco(self, chave: str) -> dict:
+        if self.limite_bytes_disco <= 0:
+            return None
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho) as f:
+                resultado = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(caminho) # a data de modificação marca o último uso (ordem LRU entre reinícios)
+        if chave not in self._disco:
+            # Gravada por outro worker
+            self._disco[chave] = os.path.getsize(caminho)
+            self._bytes_disco += self._disco[chave]
+        self._disco.move_to_end(chave)
+        return resultado
+
+    def _guardar_disco(self, chave: str, resultado: dict) -> None:
+        if self.limite_bytes_disco <= 0:
+            return
+        conteudo = json.dumps(resultado).encode("utf-8")
+        if len(conteudo) > self.limite_bytes_disco:
+            return
+        caminho = self._caminho(chave)
+        caminho_temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(caminho_temporario, "wb") as f:
+            f.write(conteudo)
+        os.replace(caminho_temporario, caminho)
+        self._bytes_disco += len(conteudo) - self._disco.pop(chave, 0)
+        self._disco[chave] = len(conteudo)
+        self._limitar_disco()
+
+    def _limitar_disco(self) -> None:
+        while self._bytes_disco > self.limite_bytes_disco and self._disco:
+            chave, tamanho = self._disco.popitem(last=False)
+            self._bytes_disco -= tamanho
+            self.contadores["remocoes"] += 1
+            try:
+                os.remove(self._caminho(chave))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,68 @@
+import struct
+import time
+from multiprocessing import shared_memory
+
+# Layout do estado: cancelado, iteração, norma do resíduo (float64 cada)
+_FORMATO_ESTADO = "ddd"
+_TAMANHO_ESTADO = struct.calcsize(_FORMATO_ESTADO)
+
+
+class ControleReconstrucao:
+    # Canal entre uma reconstrução em andamento e quem a acompanha: progresso por iteração
+    # (registrar_iteracao, usado como callback dos algoritmos), cancelamento e prazo
+    # (interromper, consultado pelos algoritmos a cada iteração).
+    # Com compartilhado=True o estado fica em memória compartilhada, para que cancelamento e
+    # progresso atravessem o backend de processos; o objeto pode ser serializado para o worker.
+
+    def __init__(self, prazo: float = None, compartilhado: bool = False):
+        self.prazo = prazo # instante absoluto (time.time()) a partir do qual a reconstrução para
+        self._dono = True
+        if compartilhado:
+            self._bloco = shared_memory.SharedMemory(create=True, size=_TAMANHO_ESTADO)
+            self._buffer = self._bloco.buf
+        else:
+            self._bloco = None
+            self._buffer = bytearray(_TAMANHO_ESTADO)
+        struct.pack_into(_FORMATO_ESTADO, self._buffer, 0, 0.0, 0.0, 0.0)
+
+    def __getstate__(self):
+        if self._bloco is None:
+            raise TypeError("ControleReconstrucao só pode ser enviado a outro processo com compartilhado=True.")
+        return {"prazo": self.prazo, "nome_bloco": self._bloco.name}
+
+    def __setstate__(self, estado: dict):
+        self.prazo = estado["prazo"]
+        self._dono = False
+        self._bloco = shared_memory.SharedMemory(name=estado["nome_bloco"])
+        self._buffer = self._bloco.buf
+
+    def registrar_iteracao(self, iteracao: int, norma_residuo: float) -> None:
+        struct.pack_into("dd", self._buffer, 8, iteracao, norma_residuo)
+
+    def cancelar(self) -> None:
+        struct.pack_into("d", self._buffer, 0, 1.0)
+
+    def interromper(self) -> bool:
+        return self.motivo_interrupcao is not None
+
+    @property
+    def motivo_interrupcao(self) -> str:
+        if struct.unpack_from("d", self._buffer, 0)[0]:
+            return "cancelada"
+        if self.prazo is not None and time.time() >= self.prazo:
+            return "prazo"
+        return None
+
+    @property
+    def progresso(self) -> tuple[int, float]:
+        # (última iteração concluída, norma do resíduo nessa iteração)
+        iteracao, norma_residuo = struct.unpack_from("dd", self._buffer, 8)
+        return int(iteracao), norma_residuo
+
+    def fechar(self) -> None:
+        if self._bloco is not None:
+            self._buffer = bytearray(self._buffer) # preserva o último estado para consultas
+            self._bloco.close()
+            if self._dono:
+                self._bloco.unlink()
+            self._bloco = None
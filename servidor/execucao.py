@@ -0,0 +1,248 @@
+import asyncio
+import multiprocessing
+import threading
+import uuid
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from servidor.algoritmos.operador_h import OperadorH, OperadorHEsparso, OperadorHBlocos, MatrizBlocos
+
+
+class ExecutorSolver:
+    # Backend de execução dos algoritmos de reconstrução. executar(funcao, *args) roda
+    # funcao(*args) fora (ou dentro) do event loop, conforme a implementação; modelo_id
+    # identifica o modelo da chamada para quem envolve o backend (orçamento de threads).
+
+    nome = None
+    entre_processos = False # objetos de controle precisam de memória compartilhada
+
+    async def executar(self, funcao, *args, modelo_id: str = None):
+        raise NotImplementedError
+
+    def encerrar(self) -> None:
+        pass
+
+
+class ExecutorInline(ExecutorSolver):
+    # Executa no próprio event loop; útil para depuração e medições sem concorrência
+    nome = "inline"
+
+    async def executar(self, funcao, *args, modelo_id: str = None):
+        return funcao(*args)
+
+
+class ExecutorThreads(ExecutorSolver):
+    # Pool de threads padrão do asyncio: apenas o BLAS roda fora do GIL
+    nome = "thread"
+
+    async def executar(self, funcao, *args, modelo_id: str = None):
+        return await asyncio.get_running_loop().run_in_executor(None, funcao, *args)
+
+
+class _BlocoMapeado:
+    # Bloco de memória compartilhada exposto como arranjo pelo endereço (__array_interface__), sem
+    # exportar o buffer: as vistas mantêm o bloco vivo e o mapeamento é fechado (SharedMemory.__del__)
+    # quando a última delas é coletada, mesmo que o nome já tenha sido removido
+
+    def __init__(self, bloco: shared_memory.SharedMemory, shape: tuple, dtype: np.dtype, ordem: str):
+        self.bloco = bloco
+        modelo = np.ndarray(shape, dtype=dtype, buffer=bloco.buf, order=ordem)
+        self.__array_interface__ = {
+            "version": 3, "shape": shape, "typestr": dtype.str,
+            "data": (modelo.ctypes.data, False), "strides": modelo.strides,
+        }
+        del modelo
+
+
+class _DescritorArranjo:
+    # Referência serializável a um arranjo que o worker abre sem cópia:
+    # um arquivo .npy mapeado (modo compartilhado) ou um bloco de memória compartilhada POSIX.
+    # vista: o bloco no processo principal (None para arquivos), que substitui a cópia privada
+    # do arranjo; não é serializada.
+
+    def __init__(self, arranjo: np.ndarray, blocos: list):
+        self.shape = arranjo.shape
+        self.dtype = arranjo.dtype
+        self.ordem = "F" if arranjo.flags.f_contiguous and not arranjo.flags.c_contiguous else "C"
+        self.vista = None
+        if isinstance(arranjo, np.memmap) and arranjo.filename is not None:
+            self.arquivo = arranjo.filename
+            self.offset = arranjo.offset
+            self.nome_shm = None
+        else:
+            bloco = shared_memory.SharedMemory(create=True, size=max(arranjo.nbytes, 1))
+            self.vista = np.asarray(_BlocoMapeado(bloco, arranjo.shape, arranjo.dtype, self.ordem))
+            self.vista[...] = arranjo
+            self.vista.flags.writeable = False
+            blocos.append(bloco)
+            self.arquivo = None
+            self.nome_shm = bloco.name
+
+    def __getstate__(self) -> dict:
+        return {**self.__dict__, "vista": None}
+
+    def abrir(self, blocos_abertos: list) -> np.ndarray:
+        if self.arquivo is not None:
+            return np.memmap(self.arquivo, dtype=self.dtype, mode="r", offset=self.offset,
+                             shape=self.shape, order=self.ordem)
+        bloco = shared_memory.SharedMemory(name=self.nome_shm)
+        blocos_abertos.append(bloco)
+        arranjo = np.ndarray(self.shape, dtype=self.dtype, buffer=bloco.buf, order=self.ordem)
+        arranjo.flags.writeable = False
+        return arranjo
+
+
+class _DescritorOperador:
+    # Versão serializável de um OperadorH: H (e HᵀH/Hᵀ/SVD, se prontas) via _DescritorArranjo
+
+    def __init__(self, operador: OperadorH, blocos: list):
+        self.chave = str(uuid.uuid4())
+        self.formato = operador.formato
+        self.shape = operador.shape
+        if operador.formato == "blocos":
+            # H já está em disco: o worker abre a mesma pasta de blocos
+            self.partes_h = []
+            self.pasta_blocos = operador.H.pasta
+            self.parametros_blocos = operador.parametros()
+        elif operador.formato == "esparsa":
+            self.partes_h = [_DescritorArranjo(p, blocos) for p in (operador.H.data, operador.H.indices, operador.H.indptr)]
+        else:
+            self.partes_h = [_DescritorArranjo(operador.H, blocos)]
+        # A Gram é montada uma única vez no processo principal e compartilhada com os workers
+        self.HtH = _DescritorArranjo(operador.HtH, blocos) if operador.usa_gram else None
+        # Hᵀ só é compartilhada no modo de modelos mapeados, em que ela já existe em arquivo;
+        # nos demais casos o worker usa a view H.T em vez de duplicar H
+        self.Ht = _DescritorArranjo(operador.Ht, blocos) if operador.arquivo_origem else None
+        self.fatoracao_svd = None
+        self.incluir_fatoracao(operador, blocos)
+        # O processo principal passa a usar os blocos compartilhados no lugar das próprias cópias,
+        # que são liberadas: H (e HᵀH) ficam uma única vez na memória, como no modo compartilhado
+        vistas_h = [p.vista for p in self.partes_h]
+        if vistas_h and all(v is not None for v in vistas_h):
+            if operador.formato == "esparsa":
+                from scipy import sparse
+                operador.H = sparse.csr_matrix(tuple(vistas_h), shape=operador.shape, copy=False)
+            else:
+                operador.H = vistas_h[0]
+        if self.HtH is not None and self.HtH.vista is not None:
+            operador.definir_estruturas(HtH=self.HtH.vista)
+
+    def incluir_fatoracao(self, operador: OperadorH, blocos: list) -> None:
+        # A SVD é montada sob demanda, possivelmente depois da primeira publicação do operador;
+        # a nova chave faz os workers se anexarem de novo (H continua nos mesmos blocos)
+        if self.fatoracao_svd is None and operador.tem_fatoracao_svd:
+            self.fatoracao_svd = [_DescritorArranjo(p, blocos) for p in operador.fatoracao_svd]
+            self.chave = str(uuid.uuid4())
+            if all(p.vista is not None for p in self.fatoracao_svd):
+                operador.definir_estruturas(fatoracao_svd=tuple(p.vista for p in self.fatoracao_svd))
+
+
+# Estado de cada processo worker: operadores já anexados, por chave do descritor
+_OPERADORES_ANEXADOS = {}
+_BLOCOS_ANEXADOS = []
+
+
+def _anexar_operador(descritor: _DescritorOperador) -> OperadorH:
+    if descritor.chave not in _OPERADORES_ANEXADOS:
+        partes = [p.abrir(_BLOCOS_ANEXADOS) for p in descritor.partes_h]
+        if descritor.formato == "blocos":
+            operador = OperadorHBlocos(MatrizBlocos(descritor.pasta_blocos), *descritor.parametros_blocos)
+        elif descritor.formato == "esparsa":
+            from scipy import sparse
+            operador = OperadorHEsparso(sparse.csr_matrix(tuple(partes), shape=descritor.shape, copy=False))
+        else:
+            operador = OperadorH(partes[0])
+        operador.definir_estruturas(
+            Ht=descritor.Ht.abrir(_BLOCOS_ANEXADOS) if descritor.Ht else (operador.H.T if descritor.formato != "blocos" else None),
+            HtH=descritor.HtH.abrir(_BLOCOS_ANEXADOS) if descritor.HtH else None,
+            fatoracao_svd=tuple(p.abrir(_BLOCOS_ANEXADOS) for p in descritor.fatoracao_svd) if descritor.fatoracao_svd else None,
+        )
+        _OPERADORES_ANEXADOS[descritor.chave] = operador
+    return _OPERADORES_ANEXADOS[descritor.chave]
+
+
+def _executar_no_worker(funcao, args: tuple):
+    args = [_anexar_operador(a) if isinstance(a, _DescritorOperador) else a for a in args]
+    return funcao(*args)
+
+
+class ExecutorProcessos(ExecutorSolver):
+    # Pool persistente de processos. As matrizes dos modelos não são serializadas a cada
+    # chamada: cada OperadorH é publicado uma vez em memória compartilhada (ou reaproveita o
+    # arquivo mapeado do modo compartilhado) e os workers apenas se anexam a ele.
+    # Workers são reciclados após tarefas_por_processo chamadas; se um worker morrer, o pool
+    # é recriado e somente as chamadas em andamento falham.
+
+    nome = "processo"
+    entre_processos = True
+
+    def __init__(self, num_processos: int, tarefas_por_processo: int):
+        self.num_processos = num_processos
+        self.tarefas_por_processo = tarefas_por_processo
+        self._pool = None
+        self._descritores = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _obter_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # max_tasks_per_child exige um contexto sem fork
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.num_processos,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=self.tarefas_por_processo or None,
+            )
+        return self._pool
+
+    def _descrever(self, operador: OperadorH) -> _DescritorOperador:
+        with self._lock:
+            if operador not in self._descritores:
+                blocos = []
+                self._descritores[operador] = (_DescritorOperador(operador, blocos), blocos)
+                # Remove a memória compartilhada quando o operador sair do cache de modelos; cada
+                # bloco é desmapeado quando a última vista dele no processo principal é coletada
+                weakref.finalize(operador, _liberar_blocos, blocos)
+            descritor, blocos = self._descritores[operador]
+            descritor.incluir_fatoracao(operador, blocos)
+            return descritor
+
+    async def executar(self, funcao, *args, modelo_id: str = None):
+        loop = asyncio.get_running_loop()
+        # A primeira publicação de um operador pode montar HᵀH: fora do event loop
+        args = tuple([
+            await loop.run_in_executor(None, self._descrever, a) if isinstance(a, OperadorH) else a
+            for a in args
+        ])
+        pool = self._obter_pool()
+        try:
+            return await loop.run_in_executor(pool, _executar_no_worker, funcao, args)
+        except BrokenProcessPool:
+            print("[AVISO] Processo de reconstrução encerrado inesperadamente; recriando o pool.")
+            if self._pool is pool:
+                self._pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def encerrar(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def _liberar_blocos(blocos: list) -> None:
+    for bloco in blocos:
+        bloco.unlink()
+    blocos.clear()
+
+
+def criar_executor(backend: str, num_processos: int, tarefas_por_processo: int) -> ExecutorSolver:
+    if backend == "inline":
+        return ExecutorInline()
+    if backend == "thread":
+        return ExecutorThreads()
+    if backend == "processo":
+        return ExecutorProcessos(num_processos, tarefas_por_processo)
+    raise ValueError(f"Backend de execução '{backend}' desconhecido. Use 'inline', 'thread' ou 'processo'.")
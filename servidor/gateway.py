@@ -0,0 +1,377 @@
+import asyncio
+import bisect
+import datetime
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request
+from fastapi.responses import JSONResponse, Response
+
+from compartilhado.constantes import (
+    PASTA_PROJETO, GATEWAY_BACKENDS, GATEWAY_BACKENDS_LOCAIS, GATEWAY_PORTA_BACKENDS_LOCAIS, GATEWAY_HOST, GATEWAY_PORTA,
+    GATEWAY_NOS_POR_MODELO, GATEWAY_REPLICAS_VIRTUAIS, GATEWAY_LIMITE_EM_ANDAMENTO, GATEWAY_LIMITE_CPU_PERCENT,
+    GATEWAY_TENTATIVAS, GATEWAY_CONEXOES_POR_NO, GATEWAY_TIMEOUT_S, GATEWAY_INTERVALO_SAUDE_S,
+    GATEWAY_TIMEOUT_SAUDE_S, GATEWAY_FALHAS_PARA_REMOVER, INTERVALO_VERIFICACAO_DESCONEXAO_MS
+)
+
+# Estados do registro de modelos em que a H do modelo já está na memória do nó
+ESTADOS_MODELO_CARREGADO = ("carregado", "aquecendo", "pronto")
+
+
+def _modulo_httpx():
+    # httpx é dependência opcional: só é necessária para o gateway
+    try:
+        import httpx
+    except ImportError as e:
+        raise ImportError("O gateway de reconstrução requer o pacote 'httpx'.") from e
+    return httpx
+
+
+def _hash(texto: str) -> int:
+    return int.from_bytes(hashlib.sha1(texto.encode()).digest()[:8], "big")
+
+
+class AnelConsistente:
+    # Hash consistente com réplicas virtuais: cada nó ocupa `replicas` pontos do anel e uma chave
+    # pertence aos nós encontrados a partir do seu hash, em ordem. Incluir ou retirar um nó só
+    # muda os modelos que caíam nos pontos dele; os demais continuam nos mesmos nós.
+
+    def __init__(self, nos: list, replicas: int):
+        self.nos = list(nos)
+        self._pontos = sorted((_hash(f"{no}#{i}"), no) for no in self.nos for i in range(replicas))
+        self._hashes = [h for h, _ in self._pontos]
+
+    def preferencias(self, chave: str) -> list:
+        # Todos os nós, na ordem em que a chave os encontra no anel
+        ordem = []
+        inicio = bisect.bisect(self._hashes, _hash(chave))
+        for k in range(len(self._pontos)):
+            no = self._pontos[(inicio + k) % len(self._pontos)][1]
+            if no not in ordem:
+                ordem.append(no)
+                if len(ordem) == len(self.nos):
+                    break
+        return ordem
+
+
+class NoBackend:
+    # Servidor de reconstrução atendido pelo gateway, com o estado da última verificação de saúde
+
+    def __init__(self, url: str, cliente):
+        self.url = url
+        self.cliente = cliente # conexões reaproveitadas entre as requisições encaminhadas
+        self.saudavel = True # até a primeira verificação
+        self.falhas_consecutivas = 0
+        self.em_andamento = 0
+        self.cpu_percent = None
+        self.memoria_percent = None
+        self.modelos_carregados = set()
+        self.requisicoes = 0
+        self.erros = 0
+        self.ultima_verificacao = None
+        self.ultimo_erro = None
+
+    def saturado(self, limite_em_andamento: int, limite_cpu_percent: float) -> bool:
+        return (self.em_andamento >= limite_em_andamento
+                or (self.cpu_percent is not None and self.cpu_percent >= limite_cpu_percent))
+
+    def para_dict(self) -> dict:
+        return {
+            "url": self.url,
+            "saudavel": self.saudavel,
+            "em_andamento": self.em_andamento,
+            "cpu_percent": self.cpu_percent,
+            "memoria_percent": self.memoria_percent,
+            "modelos_carregados": sorted(self.modelos_carregados),
+            "requisicoes": self.requisicoes,
+            "erros": self.erros,
+            "falhas_consecutivas": self.falhas_consecutivas,
+            "ultima_verificacao": self.ultima_verificacao,
+            "ultimo_erro": self.ultimo_erro,
+        }
+
+
+class GatewayReconstrucao:
+    # Escolha do nó de cada requisição e verificação periódica dos nós. A ordem de tentativa de
+    # um modelo é: nós de afinidade (os primeiros do anel) não saturados, do menos ocupado; os
+    # demais nós não saturados (transbordo), primeiro os que já têm o modelo carregado e depois
+    # na ordem do anel; por fim os saturados, do menos ocupado. Falhas de conexão e 503 (fila
+    # cheia, modelos aquecendo) passam ao próximo candidato.
+    # As soluções de partida aquecida ficam na memória de cada nó: requisições com sessao_id são
+    # posicionadas no anel por (usuário, sessão) e têm um único nó de afinidade, para que os quadros
+    # da sessão cheguem ao nó que guardou o anterior. frame_anterior sem sessao_id não é roteado:
+    # só parte da solução anterior se cair no mesmo nó.
+
+    def __init__(self, urls: list, nos_por_modelo: int, replicas_virtuais: int, limite_em_andamento: int,
+                 limite_cpu_percent: float, tentativas: int, conexoes_por_no: int, timeout_s: float,
+                 intervalo_saude_s: float, timeout_saude_s: float, falhas_para_remover: int,
+                 intervalo_desconexao_s: float):
+        self.urls = [url.rstrip("/") for url in urls]
+        self.anel = AnelConsistente(self.urls, replicas_virtuais)
+        self.nos_por_modelo = nos_por_modelo
+        self.limite_em_andamento = limite_em_andamento
+        self.limite_cpu_percent = limite_cpu_percent
+        self.tentativas = tentativas
+        self.conexoes_por_no = conexoes_por_no
+        self.timeout_s = timeout_s
+        self.intervalo_saude_s = intervalo_saude_s
+        self.timeout_saude_s = timeout_saude_s
+        self.falhas_para_remover = falhas_para_remover
+        self.intervalo_desconexao_s = intervalo_desconexao_s
+        self.nos = {}
+        self.transbordos = 0
+        self._cliente_saude = None
+        self._monitor = None
+
+    def iniciar(self) -> None:
+        httpx = _modulo_httpx()
+        for url in self.urls:
+            self.nos[url] = NoBackend(url, httpx.AsyncClient(
+                base_url=url,
+                limits=httpx.Limits(max_connections=self.conexoes_por_no, max_keepalive_connections=self.conexoes_por_no),
+                # O prazo da resposta (timeout_s) é controlado por _enviar, que fecha a conexão ao expirar
+                timeout=httpx.Timeout(self.timeout_s, connect=self.timeout_saude_s, read=None),
+            ))
+        # Verificações em um pool próprio: não esperam conexões ocupadas por reconstruções longas
+        self._cliente_saude = httpx.AsyncClient(timeout=self.timeout_saude_s)
+        self._monitor = asyncio.ensure_future(self._monitorar())
+
+    async def encerrar(self) -> None:
+        if self._monitor is not None:
+            self._monitor.cancel()
+        for no in self.nos.values():
+            await no.cliente.aclose()
+        if self._cliente_saude is not None:
+            await self._cliente_saude.aclose()
+
+    def candidatos(self, modelo_id: str, sessao: str = None) -> tuple[list, list]:
+        # (nós na ordem de tentativa, nós de afinidade do modelo ou da sessão)
+        chave, nos_afinidade = (sessao, 1) if sessao is not None else (modelo_id, self.nos_por_modelo)
+        ordem = [self.nos[url] for url in self.anel.preferencias(chave) if self.nos[url].saudavel]
+        afinidade = ordem[:nos_afinidade]
+        saturado = lambda no: no.saturado(self.limite_em_andamento, self.limite_cpu_percent)
+        livres = sorted([no for no in afinidade if not saturado(no)], key=lambda no: no.em_andamento)
+        transbordo = sorted([no for no in ordem[nos_afinidade:] if not saturado(no)],
+                            key=lambda no: modelo_id not in no.modelos_carregados) # ordenação estável: mantém o anel
+        saturados = sorted([no for no in ordem if saturado(no)], key=lambda no: no.em_andamento)
+        return livres + transbordo + saturados, afinidade
+
+    async def encaminhar(self, modelo_id: str, caminho: str, dados: dict, arquivos: dict,
+                         desconectado=None, sessao: str = None) -> tuple:
+        # Retorna (nó, resposta) do primeiro nó que atendeu a requisição.
+        # desconectado(): corrotina que indica se o cliente do gateway desistiu (Request.is_disconnected);
+        # sessao: chave da sessão de partida aquecida (ver chave_sessao), que fixa o nó
+        httpx = _modulo_httpx()
+        candidatos, afinidade = self.candidatos(modelo_id, sessao)
+        if not candidatos:
+            raise HTTPException(status_code=503, detail="Nenhum servidor de reconstrução disponível.",
+                                headers={"Retry-After": str(max(1, round(self.intervalo_saude_s)))})
+        if candidatos[0] not in afinidade:
+            self.transbordos += 1
+
+        ultima_resposta, ultimo_erro = None, None
+        for no in candidatos[:self.tentativas]:
+            no.em_andamento += 1
+            no.requisicoes += 1
+            try:
+                resposta = await self._enviar(no, caminho, dados, arquivos, desconectado)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                no.erros += 1
+                self._registrar_falha(no, e)
+                ultimo_erro = e
+                continue
+            except httpx.TimeoutException:
+                # A reconstrução pode estar em andamento no nó: repetir em outro só duplicaria o trabalho
+                no.erros += 1
+                raise HTTPException(status_code=504, detail=f"O servidor de reconstrução {no.url} não respondeu a tempo.")
+            except httpx.TransportError as e:
+                no.erros += 1
+                self._registrar_falha(no, e)
+                ultimo_erro = e
+                continue
+            finally:
+                no.em_andamento -= 1
+            if resposta.status_code == 503:
+                ultima_resposta = (no, resposta)
+                continue
+            return no, resposta
+
+        if ultima_resposta is not None:
+            return ultima_resposta
+        raise HTTPException(status_code=502, detail=f"Falha ao contatar os servidores de reconstrução: {ultimo_erro}")
+
+    async def _enviar(self, no: NoBackend, caminho: str, dados: dict, arquivos: dict, desconectado):
+        # Envia ao nó e aguarda a resposta verificando o cliente a cada intervalo_desconexao_s. Se o
+        # cliente desconectar ou o prazo timeout_s expirar, o envio é cancelado: a conexão com o nó
+        # é fechada e ele desiste da reconstrução, em vez de resolvê-la para ninguém
+        httpx = _modulo_httpx()
+        envio = asyncio.ensure_future(no.cliente.post(caminho, data=dados, files=arquivos))
+        prazo = time.monotonic() + self.timeout_s
+        try:
+            while True:
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    raise httpx.ReadTimeout(f"Sem resposta de {no.url} em {self.timeout_s} s.")
+                await asyncio.wait({envio}, timeout=min(self.intervalo_desconexao_s, restante))
+                if envio.done():
+                    return envio.result()
+                if desconectado is not None and await desconectado():
+                    print(f"Cliente desconectado; cancelando a requisição encaminhada a {no.url}.")
+                    raise HTTPException(status_code=499, detail="Cliente desconectado.")
+        finally:
+            if not envio.done():
+                envio.cancel()
+                await asyncio.gather(envio, return_exceptions=True)
+
+    def _registrar_falha(self, no: NoBackend, erro) -> None:
+        no.falhas_consecutivas += 1
+        no.ultimo_erro = str(erro) or type(erro).__name__
+        if no.falhas_consecutivas >= self.falhas_para_remover:
+            no.saudavel = False
+
+    async def verificar(self, no: NoBackend) -> None:
+        # Saudável = /prontidao/ respondeu 200 (modelos pré-carregados prontos); CPU de /status_servidor/
+        httpx = _modulo_httpx()
+        try:
+            prontidao = await self._cliente_saude.get(f"{no.url}/prontidao/")
+            status = await self._cliente_saude.get(f"{no.url}/status_servidor/")
+            status.raise_for_status()
+            estado_modelos = prontidao.json()["modelos"]
+            estado = status.json()
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            self._registrar_falha(no, e)
+            return
+        no.ultima_verificacao = datetime.datetime.now().isoformat()
+        no.falhas_consecutivas = 0
+        no.saudavel = prontidao.status_code == 200
+        no.ultimo_erro = None if no.saudavel else "modelos pré-carregados ainda não estão prontos"
+        no.modelos_carregados = {m for m, e in estado_modelos.items() if e in ESTADOS_MODELO_CARREGADO}
+        no.cpu_percent = estado.get("cpu_percent")
+        no.memoria_percent = estado.get("memory_percent")
+
+    async def _monitorar(self) -> None:
+        while True:
+            await asyncio.gather(*(self.verificar(no) for no in self.nos.values()))
+            await asyncio.sleep(self.intervalo_saude_s)
+
+    def estado(self) -> dict:
+        return {
+            "nos_por_modelo": self.nos_por_modelo,
+            "transbordos": self.transbordos,
+            "nos": [no.para_dict() for no in self.nos.values()],
+        }
+
+
+def chave_sessao(dados: dict) -> str:
+    # Sessão de partida aquecida da requisição, por usuário (como no ArmazemSolucoes dos nós); None sem sessao_id
+    if dados.get("sessao_id") is None:
+        return None
+    return json.dumps([dados.get("identificacao_usuario"), dados["sessao_id"], dados.get("modelo_imagem_id")])
+
+
+def criar_gateway(urls: list) -> GatewayReconstrucao:
+    return GatewayReconstrucao(
+        urls, GATEWAY_NOS_POR_MODELO, GATEWAY_REPLICAS_VIRTUAIS, GATEWAY_LIMITE_EM_ANDAMENTO, GATEWAY_LIMITE_CPU_PERCENT,
+        GATEWAY_TENTATIVAS, GATEWAY_CONEXOES_POR_NO, GATEWAY_TIMEOUT_S, GATEWAY_INTERVALO_SAUDE_S,
+        GATEWAY_TIMEOUT_SAUDE_S, GATEWAY_FALHAS_PARA_REMOVER, INTERVALO_VERIFICACAO_DESCONEXAO_MS / 1000
+    )
+
+
+app = FastAPI(
+    title="Gateway de Reconstrução de Imagens",
+    description="Distribui as reconstruções entre servidores de reconstrução, com afinidade por modelo."
+)
+
+GATEWAY = criar_gateway(GATEWAY_BACKENDS)
+
+
+@app.on_event("startup")
+async def iniciar_gateway():
+    GATEWAY.iniciar()
+
+
+@app.on_event("shutdown")
+async def encerrar_gateway():
+    await GATEWAY.encerrar()
+
+
+@app.post("/reconstruir_imagem/")
+async def rota_reconstruir_imagem(
+    request: Request,
+    dados_json: str = Form(...),
+    arquivo_sinal: UploadFile = File(...)
+):
+    # Mesma interface do servidor; a resposta do nó é repassada sem alterações
+    try:
+        dados = json.loads(dados_json)
+        modelo_id = str(dados["modelo_imagem_id"])
+        sessao = chave_sessao(dados)
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=f"Erro de validação dos dados JSON: {e}. Recebido: {dados_json}")
+    conteudo = await arquivo_sinal.read()
+    no, resposta = await GATEWAY.encaminhar(
+        modelo_id, "/reconstruir_imagem/", {"dados_json": dados_json},
+        {"arquivo_sinal": (arquivo_sinal.filename, conteudo, arquivo_sinal.content_type)},
+        request.is_disconnected, sessao
+    )
+    cabecalhos = {"X-Servidor-Reconstrucao": no.url}
+    if "retry-after" in resposta.headers:
+        cabecalhos["Retry-After"] = resposta.headers["retry-after"]
+    return Response(content=resposta.content, status_code=resposta.status_code,
+                    media_type=resposta.headers.get("content-type"), headers=cabecalhos)
+
+
+@app.get("/prontidao/")
+async def rota_prontidao():
+    pronto = any(no.saudavel for no in GATEWAY.nos.values())
+    return JSONResponse(status_code=200 if pronto else 503, content={"pronto": pronto})
+
+
+@app.get("/status_servidor/")
+async def rota_status_servidor():
+    # Médias dos nós saudáveis, no formato do servidor, e o estado de cada nó
+    saudaveis = [no for no in GATEWAY.nos.values() if no.saudavel and no.cpu_percent is not None]
+    media = lambda valores: sum(valores) / len(valores) if valores else None
+    return JSONResponse(content={
+        "cpu_percent": media([no.cpu_percent for no in saudaveis]),
+        "memory_percent": media([no.memoria_percent for no in saudaveis]),
+        "timestamp": datetime.datetime.now().isoformat(),
+        **GATEWAY.estado(),
+    })
+
+
+def iniciar_backends_locais(quantidade: int, porta_inicial: int) -> tuple[list, list]:
+    # Servidores de reconstrução neste host, para testar o gateway sem um cluster: um processo
+    # uvicorn por porta, cada um com seu próprio banco de reconstruções
+    processos, urls = [], []
+    for porta in range(porta_inicial, porta_inicial + quantidade):
+        ambiente = dict(os.environ, ARQUIVO_BANCO_RECONSTRUCOES=os.path.join(PASTA_PROJETO, "servidor", f"reconstrucoes_{porta}.db"))
+        processos.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "servidor.main_servidor:app", "--host", "127.0.0.1", "--port", str(porta)],
+            cwd=PASTA_PROJETO, env=ambiente
+        ))
+        urls.append(f"http://127.0.0.1:{porta}")
+    return processos, urls
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    processos = []
+    if GATEWAY_BACKENDS_LOCAIS > 0:
+        processos, urls = iniciar_backends_locais(GATEWAY_BACKENDS_LOCAIS, GATEWAY_PORTA_BACKENDS_LOCAIS)
+        GATEWAY = criar_gateway(urls)
+        print(f"Servidores de reconstrução locais: {', '.join(urls)}")
+    try:
+        uvicorn.run(app, host=GATEWAY_HOST, port=GATEWAY_PORTA)
+    finally:
+        for processo in processos:
+            processo.terminate()
+        for processo in processos:
+            processo.wait()
+
+# Para rodar o gateway: python -m servidor.gateway (ou python -m uvicorn servidor.gateway:app --port 8080)
@@ -0,0 +1,74 @@
+import numpy as np
+
+from compartilhado.formatos_sinal import LeitorSinalIncremental
+from compartilhado.util import obter_ganho_sinal
+
+
+def parcela_transposta(operador, trecho: np.ndarray, inicio: int) -> np.ndarray:
+    # H[trecho]ᵀ g[trecho], executada pelo backend dos algoritmos (ExecutorSolver)
+    return operador.aplicar_transposta_linhas(trecho, inicio)
+
+
+class AcumuladorSinal:
+    # Sinal g recebido em partes, na ordem do vetor (sensor a sensor, amostras contíguas).
+    # A cada linhas_por_bloco valores, o trecho recebe o ganho e fica pronto para sua parcela
+    # H[trecho]ᵀ g[trecho] (parcela_transposta), somada a Hᵀg com somar: ao fim do envio, Hᵀg
+    # (primeiro passo dos algoritmos e base do lambda) já está pronto e a reconstrução começa sem
+    # outra passagem por H. adicionar e encerrar devolvem os trechos prontos [(trecho, início), ...].
+    # A normalização de preprocessar_sinal depende do máximo do sinal inteiro; como é uma escala,
+    # é aplicada no fim a g e a Hᵀg de uma vez.
+
+    def __init__(self, operador, N_sensores: int, S_amostras: int, tipo_conteudo: str = None,
+                 linhas_por_bloco: int = 4096, limite_normalizacao: float = 100):
+        self.operador = operador
+        self.leitor = LeitorSinalIncremental(tipo_conteudo)
+        self.S_amostras = S_amostras
+        self.linhas_por_bloco = linhas_por_bloco
+        self.limite_normalizacao = limite_normalizacao
+        self.ganho = obter_ganho_sinal(N_sensores, S_amostras)
+        self.g = np.empty(operador.shape[0], dtype=np.float64)
+        self.Htg = np.zeros(operador.shape[1], dtype=np.float64) # soma das parcelas em float64
+        self.recebidos = 0
+        self.acumulados = 0
+        self.valor_max_abs = 0.0
+
+    def adicionar(self, parte: bytes) -> list[tuple[np.ndarray, int]]:
+        return self._guardar(self.leitor.ler(parte))
+
+    def encerrar(self) -> list[tuple[np.ndarray, int]]:
+        # Fim do envio: o restante do sinal, incluindo o último trecho incompleto
+        trechos = self._guardar(self.leitor.finalizar())
+        if self.recebidos != self.g.size:
+            raise ValueError(f"Sinal com {self.recebidos} elementos; o modelo espera {self.g.size}.")
+        if self.acumulados < self.recebidos:
+            trechos.append(self._preparar(self.recebidos))
+        return trechos
+
+    def somar(self, parcela: np.ndarray) -> None:
+        self.Htg += parcela
+
+    def finalizar(self) -> tuple[np.ndarray, np.ndarray]:
+        # Retorna (g com ganho, Hᵀg na precisão do operador), depois de encerrar e somar as parcelas
+        if self.valor_max_abs > self.limite_normalizacao:
+            print(f"[AVISO] Sinal original possui valor máximo alto ({self.valor_max_abs:.2e}), normalizando...")
+            self.g /= self.valor_max_abs
+            self.Htg /= self.valor_max_abs
+        return self.g, self.Htg.astype(self.operador.dtype)
+
+    def _guardar(self, valores: np.ndarray) -> list[tuple[np.ndarray, int]]:
+        if self.recebidos + valores.size > self.g.size:
+            raise ValueError(f"Sinal maior que as {self.g.size} linhas de H do modelo.")
+        self.g[self.recebidos:self.recebidos + valores.size] = valores
+        self.recebidos += valores.size
+        trechos = []
+        while self.recebidos - self.acumulados >= self.linhas_por_bloco:
+            trechos.append(self._preparar(self.acumulados + self.linhas_por_bloco))
+        return trechos
+
+    def _preparar(self, fim: int) -> tuple[np.ndarray, int]:
+        inicio = self.acumulados
+        trecho = self.g[inicio:fim]
+        self.valor_max_abs = max(self.valor_max_abs, float(np.abs(trecho).max()))
+        trecho *= self.ganho[np.arange(inicio, fim) % self.S_amostras] # elemento i: amostra i % S
+        self.acumulados = fim
+        return trecho.astype(self.operador.dtype, copy=False), inicio
@@ -0,0 +1,82 @@
+import asyncio
+
+import numpy as np
+
+from servidor.algoritmos.cg_algoritmos import reconstruir_cgne_bloco, reconstruir_cgnr_bloco
+
+ALGORITMOS_BLOCO = {
+    "CGNE": reconstruir_cgne_bloco,
+    "CGNR": reconstruir_cgnr_bloco,
+}
+
+
+class AgendadorLotes:
+    # Agrupa requisições simultâneas do mesmo modelo e algoritmo em micro-lotes.
+    # Um lote é disparado ao atingir tamanho_maximo sinais ou após espera_maxima_s segundos
+    # desde o primeiro sinal; os sinais são empilhados como colunas de G e resolvidos juntos.
+
+    def __init__(self, tamanho_maximo: int, espera_maxima_s: float, executor):
+        self.tamanho_maximo = tamanho_maximo
+        self.executor = executor
+        self.espera_maxima_s = espera_maxima_s
+        self._pendentes = {}
+        self._temporizadores = {}
+        self._execucoes = set() # lotes em execução: referência forte até terminarem
+
+    async def resolver(self, modelo_id: str, algoritmo: str, operador, g: np.ndarray,
+                       lam: float, max_iter: int, tol: float,
+                       acumular_float64: bool = False, controle=None, parada=None) -> tuple[np.ndarray, int, int, str]:
+        # Retorna (imagem, número de iterações, tamanho do lote em que o sinal foi resolvido, motivo da parada).
+        # controle (opcional) recebe o progresso da coluna do sinal e pode interrompê-la.
+        # parada: PoliticaParada do modelo; sinais com políticas diferentes não entram no mesmo lote.
+        loop = asyncio.get_running_loop()
+        # Modelos em precisões diferentes são operadores distintos e não entram no mesmo lote
+        chave = (modelo_id, str(operador.dtype), algoritmo, max_iter, tol, acumular_float64,
+                 parada.chave() if parada is not None else None)
+        futuro = loop.create_future()
+
+        _, _, sinais = self._pendentes.setdefault(chave, (operador, parada, []))
+        sinais.append((g, lam, controle, futuro))
+
+        if len(sinais) >= self.tamanho_maximo:
+            self._disparar(chave)
+        elif chave not in self._temporizadores:
+            self._temporizadores[chave] = loop.call_later(self.espera_maxima_s, self._disparar, chave)
+
+        return await futuro
+
+    def _disparar(self, chave: tuple) -> None:
+        temporizador = self._temporizadores.pop(chave, None)
+        if temporizador is not None:
+            temporizador.cancel()
+        operador, parada, sinais = self._pendentes.pop(chave, (None, None, []))
+        if sinais:
+            execucao = asyncio.ensure_future(self._executar(chave, operador, parada, sinais))
+            self._execucoes.add(execucao)
+            execucao.add_done_callback(self._execucoes.discard)
+
+    async def _executar(self, chave: tuple, operador, parada, sinais: list) -> None:
+        modelo_id, _, algoritmo, max_iter, tol, acumular_float64, _ = chave
+        controles = [controle for _, _, controle, _ in sinais]
+        ao_iterar = [c.registrar_iteracao if c is not None else None for c in controles]
+        if all(c is None for c in controles):
+            controles = ao_iterar = None
+
+        # Qualquer falha, inclusive ao montar o bloco, é repassada a todas as requisições do lote
+        try:
+            G = np.column_stack([g for g, _, _, _ in sinais])
+            lams = np.array([lam for _, lam, _, _ in sinais])
+            X, num_iteracoes, motivos = await self.executor.executar(
+                ALGORITMOS_BLOCO[algoritmo], G, operador, lams, max_iter, tol, acumular_float64, ao_iterar, controles,
+                parada, modelo_id=modelo_id
+            )
+        except Exception as e:
+            for _, _, _, futuro in sinais:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+
+        for k, (_, _, _, futuro) in enumerate(sinais):
+            # Requisições canceladas (cliente desconectado) apenas descartam sua coluna
+            if not futuro.done():
+                futuro.set_result((X[:, k].copy(), int(num_iteracoes[k]), len(sinais), motivos[k]))
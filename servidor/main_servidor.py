@@ -1,28 +1,53 @@
 import os
+import base64
 import datetime
-import psutil
-import pandas as pd
 import numpy as np
-import io
 import json
 import asyncio
+import contextlib
+import time
+import uuid
+from typing import Literal, Optional
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Form
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Form, Request
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
 
 from compartilhado.constantes import (
     PORTA_SERVIDOR, HOST_SERVIDOR, PASTA_MODELOS_SERVIDOR, DIMENSOES_IMAGEM_PADRAO,
-    PASTA_IMAGENS_RECONSTRUIDAS_SERVIDOR,
-    DIMENSOES_H_30X30, S_PARA_GANHO_30X30, N_PARA_GANHO_30X30, MAX_ITERACOES_30X30, TOLERANCIA_30X30,
-    DIMENSOES_H_60X60, S_PARA_GANHO_60X60, N_PARA_GANHO_60X60, MAX_ITERACOES_60X60, TOLERANCIA_60X60,
-    DIMENSOES_IMAGEM_30X30, DIMENSOES_IMAGEM_60X60
+    PASTA_IMAGENS_RECONSTRUIDAS_SERVIDOR, ARQUIVO_MANIFESTO_MODELOS,
+    MODELOS_PRE_CARREGADOS, LIMITE_MEMORIA_MODELOS_MB,
+    LOTES_ATIVOS, LOTE_TAMANHO_MAXIMO, LOTE_ESPERA_MAXIMA_MS, LOTE_ENVIO_MAXIMO_SINAIS, FLUXO_LINHAS_POR_BLOCO,
+    FLUXO_MAXIMO_SIMULTANEOS,
+    CAPACIDADE_FILA_TAREFAS, TAREFAS_MAXIMAS_POR_USUARIO,
+    CONCORRENCIA_TAREFAS_PADRAO, TAREFAS_RETIDAS,
+    BACKEND_EXECUCAO, PROCESSOS_SOLVER, TAREFAS_POR_PROCESSO, ORCAMENTO_NUCLEOS_BLAS,
+    ACUMULAR_FLOAT64, COMPARAR_PRECISAO,
+    CACHE_RESULTADOS_ATIVO, CACHE_LIMITE_MEMORIA_MB, CACHE_LIMITE_DISCO_MB, PASTA_CACHE_RESULTADOS,
+    SESSOES_CAPACIDADE, SESSOES_TTL_S,
+    INTERVALO_PROGRESSO_MS, INTERVALO_VERIFICACAO_DESCONEXAO_MS,
+    PERSISTENCIA_RECONSTRUCOES, ARQUIVO_BANCO_RECONSTRUCOES, GRAVACAO_LOTE_MAXIMO, GRAVACAO_INTERVALO_MS,
+    INTERVALO_AMOSTRAGEM_CPU_S
 )
+from compartilhado.formatos_sinal import LimiteExcedido, ler_sinal, ler_sinais_lote
 from compartilhado.util import (
-    aplicar_ganho_sinal, salvar_imagem_e_metadados,
+    preprocessar_sinal, salvar_imagem_e_metadados, montar_metadados,
     calculo_fator_reducao, calculo_coeficiente_regularizacao 
 )
 from servidor.algoritmos.cg_algoritmos import reconstruir_cgne, reconstruir_cgnr
+from servidor.algoritmos.svd_tikhonov import reconstruir_svd, reconstruir_svd_bloco
+from servidor.execucao import criar_executor
+from servidor.orcamento_threads import OrcamentoThreads, ExecutorComOrcamento
+from servidor.tarefas import FilaTarefas, FilaCheia, Tarefa, TarefaCancelada
+from servidor.controle_reconstrucao import ControleReconstrucao
+from servidor.lotes import AgendadorLotes, ALGORITMOS_BLOCO
+from servidor.cache_resultados import CacheResultados, calcular_chave
+from servidor.registro_modelos import RegistroModelos
+from servidor.persistencia import GravadorReconstrucoes
+from servidor.ingestao_fluxo import AcumuladorSinal, parcela_transposta
+from servidor.sessoes import ArmazemSolucoes, SolucaoAnterior
+from servidor.metricas import RegistroMetricas, AmostradorCPU, LIMITES_SEGUNDOS, LIMITES_ITERACOES, LIMITES_THREADS
+from servidor.algoritmos.operador_h import OperadorH
 
 # Crie as pastas se não existirem
 os.makedirs(PASTA_IMAGENS_RECONSTRUIDAS_SERVIDOR, exist_ok=True)
@@ -31,7 +56,7 @@ os.makedirs(PASTA_MODELOS_SERVIDOR, exist_ok=True)
 
 app = FastAPI(
     title="Servidor de Reconstrução de Imagens",
-    description="API para reconstrução de imagens usando CGNE/CGNR."
+    description="API para reconstrução de imagens usando CGNE/CGNR ou SVD/Tikhonov."
 )
 
 class DadosReconstrucao(BaseModel):
@@ -39,88 +64,192 @@ class DadosReconstrucao(BaseModel):
     algoritmo_selecionado: str
     modelo_imagem_id: str
     dimensoes_imagem: tuple[int, int]
+    precisao: Optional[Literal["float64", "float32"]] = None # padrão: precisão configurada para o modelo
+    prazo_ms: Optional[float] = None # tempo máximo desde a submissão; ao expirar, retorna o iterado atual
+    sessao_id: Optional[str] = None # CGNE/CGNR partem da última solução da sessão (quadros consecutivos)
+    frame_anterior: Optional[str] = None # id_reconstrucao de uma reconstrução recente usada como ponto de partida
 
-# Dicionário para armazenar as matrizes H carregadas em memória
-MATRIZES_H_CARREGADAS = {}
+# Modelos servidos (embutidos, manifesto e arquivos da pasta de modelos) e operadores H carregados
+# em memória por (modelo, precisão), com Hᵀ, HᵀH e norma espectral pré-computados no primeiro uso
+REGISTRO_MODELOS = RegistroModelos(
+    PASTA_MODELOS_SERVIDOR, ARQUIVO_MANIFESTO_MODELOS,
+    int(LIMITE_MEMORIA_MODELOS_MB * 1024 * 1024), MODELOS_PRE_CARREGADOS
+)
+REGISTRO_MODELOS.descobrir()
 
-def carregar_matriz_h(modelo_id: str) -> np.ndarray:
-    
-    if modelo_id in MATRIZES_H_CARREGADAS:
-        print(f"Usando matriz H em cache para modelo {modelo_id}.")
-        return MATRIZES_H_CARREGADAS[modelo_id]
+# Fila limitada de reconstruções, com concorrência por modelo e rejeição imediata quando cheia
+FILA_TAREFAS = FilaTarefas(
+    CAPACIDADE_FILA_TAREFAS, TAREFAS_MAXIMAS_POR_USUARIO,
+    {modelo_id: config.concorrencia for modelo_id, config in REGISTRO_MODELOS.configs.items()},
+    CONCORRENCIA_TAREFAS_PADRAO, TAREFAS_RETIDAS, LOTE_TAMANHO_MAXIMO if LOTES_ATIVOS else 1
+)
 
-    caminho_npy = os.path.join(PASTA_MODELOS_SERVIDOR, f"matriz_h_{modelo_id}.npy")
-    
-    if not os.path.exists(caminho_npy):
-        
-        raise FileNotFoundError(
-            f"Arquivo da matriz H não encontrado para o modelo '{modelo_id}' em {caminho_npy}. "
-            "Por favor, coloque os arquivos .npy das matrizes H na pasta 'servidor/modelos/'."
-        )
-    
-    print(f"Carregando matriz H para modelo {modelo_id} de {caminho_npy}...")
-    matriz_h = np.load(caminho_npy)
-    MATRIZES_H_CARREGADAS[modelo_id] = matriz_h
-    return matriz_h
+# Métricas exportadas em /metrics: tempo de cada etapa da reconstrução e iterações por modelo e algoritmo
+METRICAS = RegistroMetricas()
+HISTOGRAMA_ETAPAS = METRICAS.histograma(
+    "reconstrucao_etapa_segundos", "Tempo de cada etapa da reconstrução.", ("etapa", "modelo", "algoritmo"), LIMITES_SEGUNDOS
+)
+HISTOGRAMA_ITERACOES = METRICAS.histograma(
+    "reconstrucao_iteracoes", "Iterações executadas pelo algoritmo.", ("modelo", "algoritmo"), LIMITES_ITERACOES
+)
+CONTADOR_RECONSTRUCOES = METRICAS.contador(
+    "reconstrucoes_total", "Reconstruções executadas, por resultado.", ("modelo", "algoritmo", "resultado")
+)
+CONTADOR_PARADAS = METRICAS.contador(
+    "reconstrucao_paradas_total", "Critério que encerrou cada reconstrução.", ("modelo", "algoritmo", "motivo")
+)
+# Threads do BLAS concedidas a cada execução de algoritmo e espera por núcleos livres (ORCAMENTO_NUCLEOS_BLAS)
+HISTOGRAMA_THREADS_BLAS = METRICAS.histograma(
+    "orcamento_threads_blas_concedidas", "Threads do BLAS concedidas a cada execução.", ("modelo",), LIMITES_THREADS
+)
+HISTOGRAMA_ESPERA_NUCLEOS = METRICAS.histograma(
+    "orcamento_espera_segundos", "Espera por núcleos livres antes de cada execução.", ("modelo",), LIMITES_SEGUNDOS
+)
 
 
-@app.post("/reconstruir_imagem/")
-async def rota_reconstruir_imagem(
-    dados_json: str = Form(...),
-    arquivo_sinal: UploadFile = File(...)
-):
-    #Endpoint para receber os dados do sinal
+def registrar_concessao_threads(modelo_id: str, threads: int, espera_s: float) -> None:
+    modelo = modelo_id if REGISTRO_MODELOS.obter_config(modelo_id) is not None else "desconhecido"
+    HISTOGRAMA_THREADS_BLAS.observar(threads, modelo)
+    HISTOGRAMA_ESPERA_NUCLEOS.observar(espera_s, modelo)
 
-    data_hora_inicio_reconstrucao = datetime.datetime.now()
-    
-    # 1. Validar e carregar o vetor de sinal 'g' do CSV
+# Backend que executa os algoritmos: 'thread', 'processo' ou 'inline' (BACKEND_EXECUCAO), com os
+# núcleos do BLAS divididos entre as execuções simultâneas quando há orçamento (ORCAMENTO_NUCLEOS_BLAS)
+EXECUTOR_SOLVER = criar_executor(BACKEND_EXECUCAO, PROCESSOS_SOLVER, TAREFAS_POR_PROCESSO)
+ORCAMENTO_THREADS = None
+if ORCAMENTO_NUCLEOS_BLAS > 0 and ExecutorComOrcamento.suporta(EXECUTOR_SOLVER):
+    ORCAMENTO_THREADS = OrcamentoThreads(
+        ORCAMENTO_NUCLEOS_BLAS, REGISTRO_MODELOS.limites_threads_blas, FILA_TAREFAS.iniciaveis, registrar_concessao_threads
+    )
+elif ORCAMENTO_NUCLEOS_BLAS > 0:
+    print(f"[AVISO] ORCAMENTO_NUCLEOS_BLAS ignorado: o backend '{EXECUTOR_SOLVER.nome}' não isola o limite de "
+          "threads do BLAS de cada execução (use 'processo').")
+if ORCAMENTO_THREADS is not None:
+    EXECUTOR_SOLVER = ExecutorComOrcamento(EXECUTOR_SOLVER, ORCAMENTO_THREADS)
+
+# Agrupa requisições simultâneas em resoluções multi-RHS (ativado por LOTES_ATIVOS)
+AGENDADOR_LOTES = AgendadorLotes(LOTE_TAMANHO_MAXIMO, LOTE_ESPERA_MAXIMA_MS / 1000, EXECUTOR_SOLVER)
+
+# Envios em fluxo acumulando sinal ao mesmo tempo (FLUXO_MAXIMO_SIMULTANEOS)
+FLUXOS_SIMULTANEOS = asyncio.Semaphore(FLUXO_MAXIMO_SIMULTANEOS)
+
+# CPU e memória amostradas em segundo plano (lidas por /metrics e /status_servidor/)
+AMOSTRADOR_CPU = AmostradorCPU(INTERVALO_AMOSTRAGEM_CPU_S)
+ALGORITMOS_SUPORTADOS = ("CGNE", "CGNR", "SVD")
+
+
+def rotulos_metricas(modelo_id: str, algoritmo: str) -> tuple:
+    # Rótulos limitados aos valores conhecidos: ids arbitrários das requisições não criam séries novas
+    return (
+        modelo_id if REGISTRO_MODELOS.obter_config(modelo_id) is not None else "desconhecido",
+        algoritmo.upper() if algoritmo.upper() in ALGORITMOS_SUPORTADOS else "desconhecido",
+    )
+
+
+@contextlib.contextmanager
+def medir_etapa(etapa: str, dados: "DadosReconstrucao"):
+    inicio = time.perf_counter()
     try:
-        conteudo_csv = await arquivo_sinal.read()
-        df_g = pd.read_csv(io.StringIO(conteudo_csv.decode('utf-8')), header=None)
-        vetor_g_original = df_g.values.flatten()
-        valor_max_abs = np.max(np.abs(vetor_g_original))
-        if valor_max_abs > 100:  # Limite arbitrário ajustável
-            print(f"[AVISO] Sinal original possui valor máximo alto ({valor_max_abs:.2e}), normalizando...")
-            vetor_g_original = vetor_g_original / valor_max_abs
-        g_max = np.max(np.abs(vetor_g_original))
-        if g_max > 1e3:  # threshold ajustável 
-            print(f"[AVISO] Sinal original possui valor máximo alto ({g_max:.2e}), normalizando...")
-            vetor_g_original = vetor_g_original / g_max
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Erro ao processar arquivo CSV do sinal: {e}")
+        yield
+    finally:
+        HISTOGRAMA_ETAPAS.observar(
+            time.perf_counter() - inicio, etapa, *rotulos_metricas(dados.modelo_imagem_id, dados.algoritmo_selecionado)
+        )
 
-    # Desserializar a string JSON para o modelo Pydantic
+
+def medir_gravacao(etapa: str, segundos: float, metadados: dict) -> None:
+    HISTOGRAMA_ETAPAS.observar(
+        segundos, etapa, *rotulos_metricas(metadados["modelo_imagem_id"], metadados["algoritmo_utilizado"])
+    )
+
+# Gravação das imagens e metadados fora do caminho da requisição, com índice SQLite (PERSISTENCIA_RECONSTRUCOES)
+GRAVADOR_RECONSTRUCOES = GravadorReconstrucoes(
+    ARQUIVO_BANCO_RECONSTRUCOES, PASTA_IMAGENS_RECONSTRUIDAS_SERVIDOR,
+    GRAVACAO_LOTE_MAXIMO, GRAVACAO_INTERVALO_MS / 1000, medir_gravacao
+) if PERSISTENCIA_RECONSTRUCOES == "sqlite" else None
+
+# Respostas de reconstruções já feitas, endereçadas pelo conteúdo da requisição (CACHE_RESULTADOS_ATIVO)
+# (a resolução: imagem, iterações e metadados do algoritmo; cada acerto é persistido como uma nova reconstrução)
+CACHE_RESULTADOS = CacheResultados(
+    int(CACHE_LIMITE_MEMORIA_MB * 1024 * 1024), int(CACHE_LIMITE_DISCO_MB * 1024 * 1024), PASTA_CACHE_RESULTADOS
+) if CACHE_RESULTADOS_ATIVO else None
+# Versão do conteúdo das entradas, parte da chave: entradas de outro formato deixadas no disco não são lidas
+FORMATO_CACHE_RESULTADOS = 2
+
+# Últimas soluções por sessão e por id de reconstrução, ponto de partida dos quadros seguintes
+ARMAZEM_SOLUCOES = ArmazemSolucoes(SESSOES_CAPACIDADE, SESSOES_TTL_S)
+
+# Regra do coeficiente de regularização: lambda = min(0.05 * max|Hᵀg|, LIMITE_LAMBDA)
+LIMITE_LAMBDA = 1e2
+POLITICA_LAMBDA = f"0.05*max|Hᵀg|;limite={LIMITE_LAMBDA}"
+
+def carregar_matriz_h(modelo_id: str, precisao: str = None) -> OperadorH:
+    # Operador do modelo na precisão pedida (padrão: a do modelo), carregado sob demanda pelo registro
+    return REGISTRO_MODELOS.obter_operador(modelo_id, precisao)
+
+
+async def aquecer_modelo(modelo_id: str) -> None:
+    # Carga, leitura de todas as páginas e uma reconstrução curta com sinal sintético, que
+    # inicializa o BLAS e o backend de execução (ex.: processos e memória compartilhada)
+    loop = asyncio.get_running_loop()
+    inicio = time.perf_counter()
     try:
-        dados = DadosReconstrucao.model_validate_json(dados_json)
+        operador = await loop.run_in_executor(None, REGISTRO_MODELOS.aquecer, modelo_id)
+        g_teste = np.random.default_rng(0).standard_normal(operador.shape[0])
+        await EXECUTOR_SOLVER.executar(reconstruir_cgne, g_teste, operador, 1.0, 2, 0.0, ACUMULAR_FLOAT64, modelo_id=modelo_id)
     except Exception as e:
-        raise HTTPException(status_code=422, detail=f"Erro de validação dos dados JSON: {e}. Recebido: {dados_json}")
+        print(f"[AVISO] Falha ao aquecer o modelo {modelo_id}: {e}")
+        REGISTRO_MODELOS.registrar_erro(modelo_id, str(e))
+        return
+    REGISTRO_MODELOS.registrar_pronto(modelo_id, time.perf_counter() - inicio)
+    print(f"Modelo {modelo_id} pronto em {time.perf_counter() - inicio:.2f} s.")
+
+
+@app.on_event("startup")
+async def pre_carregar_modelos():
+    # Aquece os modelos configurados em segundo plano; /prontidao/ indica quando terminaram
+    async def aquecer_todos():
+        for modelo_id in MODELOS_PRE_CARREGADOS:
+            if REGISTRO_MODELOS.obter_config(modelo_id) is None:
+                print(f"[AVISO] Modelo pré-carregado '{modelo_id}' não está registrado.")
+                REGISTRO_MODELOS.registrar_erro(modelo_id, "modelo não registrado")
+                continue
+            print(f"Pré-carregando modelo {modelo_id}...")
+            await aquecer_modelo(modelo_id)
+    AMOSTRADOR_CPU.iniciar()
+    asyncio.ensure_future(aquecer_todos())
+
+
+@app.on_event("shutdown")
+def encerrar_executor():
+    EXECUTOR_SOLVER.encerrar()
+    AMOSTRADOR_CPU.parar()
+    if GRAVADOR_RECONSTRUCOES is not None:
+        GRAVADOR_RECONSTRUCOES.encerrar() # grava o que ainda estiver na fila
 
-    # 2. Carregar a matriz H e obter os parâmetros específicos do modelo
+
+async def carregar_modelo_validado(dados: DadosReconstrucao, tamanho_sinal: int = None) -> tuple:
+    # (config, precisão, operador H) do modelo da requisição, com as dimensões de H, da imagem e,
+    # se informado, do sinal conferidas com as do modelo
+    config = REGISTRO_MODELOS.obter_config(dados.modelo_imagem_id)
+    if config is None:
+        raise HTTPException(status_code=400, detail=f"Modelo de imagem '{dados.modelo_imagem_id}' não reconhecido. Verifique os IDs de modelo disponíveis.")
+    precisao = precisao_requisicao(dados)
     try:
-        matriz_H = carregar_matriz_h(dados.modelo_imagem_id)
+        # Carga fora do event loop: modelos grandes levam segundos para serem lidos do disco
+        with medir_etapa("carga_modelo", dados):
+            matriz_H = await asyncio.get_running_loop().run_in_executor(
+                None, carregar_matriz_h, dados.modelo_imagem_id, precisao
+            )
         
-        # Escolher parâmetros específicos com base no modelo_imagem_id
-        if dados.modelo_imagem_id == "30x30_modelo1":
-            S_usado, N_usado = S_PARA_GANHO_30X30, N_PARA_GANHO_30X30
-            dimensoes_esperadas_h_matriz = DIMENSOES_H_30X30
-            dimensoes_esperadas_imagem = DIMENSOES_IMAGEM_30X30
-            max_iter_algo = MAX_ITERACOES_30X30
-            tol_algo = TOLERANCIA_30X30
-        elif dados.modelo_imagem_id == "60x60_modelo1":
-            S_usado, N_usado = S_PARA_GANHO_60X60, N_PARA_GANHO_60X60
-            dimensoes_esperadas_h_matriz = DIMENSOES_H_60X60
-            dimensoes_esperadas_imagem = DIMENSOES_IMAGEM_60X60
-            max_iter_algo = MAX_ITERACOES_60X60
-            tol_algo = TOLERANCIA_60X60
-        else:
-            raise HTTPException(status_code=400, detail=f"Modelo de imagem '{dados.modelo_imagem_id}' não reconhecido. Verifique os IDs de modelo disponíveis.")
+        dimensoes_esperadas_h_matriz = config.dimensoes_h
+        dimensoes_esperadas_imagem = config.dimensoes_imagem
 
         # Validações de dimensão 
         if matriz_H.shape != dimensoes_esperadas_h_matriz:
             raise HTTPException(status_code=400, detail=f"Dimensões da matriz H carregada ({matriz_H.shape}) não correspondem às esperadas para o modelo '{dados.modelo_imagem_id}' ({dimensoes_esperadas_h_matriz}).")
         
-        if matriz_H.shape[0] != vetor_g_original.shape[0]:
-             raise HTTPException(status_code=400, detail=f"Incompatibilidade de dimensões: Linhas de H ({matriz_H.shape[0]}) != elementos do vetor g ({vetor_g_original.shape[0]}).")
+        if tamanho_sinal is not None and matriz_H.shape[0] != tamanho_sinal:
+             raise HTTPException(status_code=400, detail=f"Incompatibilidade de dimensões: Linhas de H ({matriz_H.shape[0]}) != elementos do vetor g ({tamanho_sinal}).")
         
         tamanho_vetor_imagem_esperado = dimensoes_esperadas_imagem[0] * dimensoes_esperadas_imagem[1]
         if matriz_H.shape[1] != tamanho_vetor_imagem_esperado:
@@ -133,20 +262,53 @@ async def rota_reconstruir_imagem(
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao carregar/validar Matriz H e parâmetros: {e}")
+    return config, precisao, matriz_H
 
-    # 3. Aplicar o ganho de sinal
-    try:
-        vetor_g_com_ganho = aplicar_ganho_sinal(vetor_g_original, N_sensores=N_usado, S_amostras=S_usado)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=f"Erro ao aplicar ganho de sinal: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro inesperado ao aplicar ganho: {e}")
+
+async def executar_reconstrucao(dados: DadosReconstrucao, conteudo_sinal: bytes,
+                                tipo_conteudo: str = None, nome_arquivo: str = None,
+                                controle: ControleReconstrucao = None, sinal_preparado: tuple = None) -> dict:
+    # Etapas 1 a 5 de uma reconstrução, executadas pelos workers da fila de tarefas. Devolve a
+    # resolução, que não depende de quem a pediu (compartilhada no single-flight e guardada no
+    # cache); concluir_reconstrucao monta e persiste o resultado de cada requisição.
+    # controle recebe o progresso de cada iteração e pode interromper o algoritmo (cancelamento/prazo).
+    # sinal_preparado: (g com ganho, Hᵀg) do envio em fluxo, que dispensa as etapas 1 e 3.
+
+    data_hora_inicio_reconstrucao = datetime.datetime.now()
+    
+    # 1. Validar e carregar o vetor de sinal 'g' (CSV, .npy ou binário bruto, opcionalmente comprimido)
+    Htg = None
+    if sinal_preparado is None:
+        try:
+            with medir_etapa("interpretacao_sinal", dados):
+                vetor_g_original = ler_sinal(conteudo_sinal, tipo_conteudo, nome_arquivo)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Erro ao processar arquivo do sinal: {e}")
+    else:
+        vetor_g_original = vetor_g_com_ganho = sinal_preparado[0]
+        Htg = sinal_preparado[1]
+
+    # 2. Carregar a matriz H (na precisão da requisição ou do modelo) e obter os parâmetros do modelo no registro
+    config, precisao, matriz_H = await carregar_modelo_validado(dados, vetor_g_original.shape[0])
+    S_usado, N_usado = config.S_amostras, config.N_sensores
+    max_iter_algo = config.max_iteracoes
+    tol_algo = config.tolerancia
+
+    # 3. Normalizar e aplicar o ganho de sinal (uma única passagem, ganho em cache por N/S)
+    if sinal_preparado is None:
+        try:
+            with medir_etapa("ganho", dados):
+                vetor_g_com_ganho = preprocessar_sinal(vetor_g_original, N_sensores=N_usado, S_amostras=S_usado, inplace=True)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Erro ao aplicar ganho de sinal: {e}")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro inesperado ao aplicar ganho: {e}")
 
     # 4. Calcular o coeficiente de regularização (lambda)
     
-    lambda_bruto = calculo_coeficiente_regularizacao(matriz_H, vetor_g_com_ganho)
+    with medir_etapa("lambda", dados):
+        lambda_bruto = calculo_coeficiente_regularizacao(matriz_H, vetor_g_com_ganho, Htg)
 
-    LIMITE_LAMBDA = 1e2 
     lambda_regularizacao = min(lambda_bruto, LIMITE_LAMBDA)
 
     print(f"Lambda calculado bruto: {lambda_bruto:.2e} | Lambda final usado: {lambda_regularizacao:.2e}")
@@ -154,57 +316,880 @@ async def rota_reconstruir_imagem(
     # 5. Executar o algoritmo de reconstrução
     imagem_reconstruida_vetor = None
     num_iteracoes_executadas = 0
-    try:
-        loop = asyncio.get_event_loop()
-        if dados.algoritmo_selecionado.upper() == "CGNE":
-            imagem_reconstruida_vetor, num_iteracoes_executadas = await loop.run_in_executor(
-                None, reconstruir_cgne, vetor_g_com_ganho, matriz_H, lambda_regularizacao, max_iter_algo, tol_algo
+    tamanho_lote = 1
+    ao_iterar = controle.registrar_iteracao if controle is not None else None
+    precondicionador = config.precondicionador if dados.algoritmo_selecionado.upper() in ("CGNE", "CGNR") else None
+    # Critérios de parada do modelo, com o ruído deste sinal já estimado quando a discrepância está ativa
+    parada = config.parada.para_sinal(vetor_g_com_ganho) if dados.algoritmo_selecionado.upper() in ("CGNE", "CGNR") else None
+    motivo_parada = None
+    # Partida aquecida: solução anterior da sessão (ou do frame_anterior) do mesmo modelo como x0
+    solucao_anterior = None
+    if partida_aquecida_solicitada(dados):
+        solucao_anterior = ARMAZEM_SOLUCOES.obter(
+            dados.identificacao_usuario, dados.modelo_imagem_id, matriz_H.shape[1], dados.sessao_id, dados.frame_anterior
+        )
+    x0 = solucao_anterior.f if solucao_anterior is not None else None
+    with medir_etapa("solver", dados):
+        try:
+            # Modelos com precondicionador são resolvidos um sinal por vez (as variantes em bloco não o usam);
+            # com partida aquecida também, pois cada coluna do bloco partiria de zeros
+            if (LOTES_ATIVOS and precondicionador is None and x0 is None
+                    and dados.algoritmo_selecionado.upper() in ALGORITMOS_BLOCO):
+                imagem_reconstruida_vetor, num_iteracoes_executadas, tamanho_lote, motivo_parada = await AGENDADOR_LOTES.resolver(
+                    dados.modelo_imagem_id, dados.algoritmo_selecionado.upper(), matriz_H,
+                    vetor_g_com_ganho, lambda_regularizacao, max_iter_algo, tol_algo, ACUMULAR_FLOAT64, controle,
+                    config.parada
+                )
+            elif dados.algoritmo_selecionado.upper() == "CGNE":
+                imagem_reconstruida_vetor, num_iteracoes_executadas, motivo_parada = await EXECUTOR_SOLVER.executar(
+                    reconstruir_cgne, vetor_g_com_ganho, matriz_H, lambda_regularizacao, max_iter_algo, tol_algo, ACUMULAR_FLOAT64,
+                    ao_iterar, controle, precondicionador, Htg, x0, parada, modelo_id=dados.modelo_imagem_id
+                )
+            elif dados.algoritmo_selecionado.upper() == "CGNR":
+                imagem_reconstruida_vetor, num_iteracoes_executadas, motivo_parada = await EXECUTOR_SOLVER.executar(
+                    reconstruir_cgnr, vetor_g_com_ganho, matriz_H, lambda_regularizacao, max_iter_algo, tol_algo, ACUMULAR_FLOAT64,
+                    ao_iterar, controle, precondicionador, Htg, x0, parada, modelo_id=dados.modelo_imagem_id
+                )
+            elif dados.algoritmo_selecionado.upper() == "SVD":
+                # Fatoração do modelo calculada (ou lida do disco) uma única vez, fora do event loop
+                await asyncio.get_running_loop().run_in_executor(None, lambda: matriz_H.fatoracao_svd)
+                imagem_reconstruida_vetor, num_iteracoes_executadas, motivo_parada = await EXECUTOR_SOLVER.executar(
+                    reconstruir_svd, vetor_g_com_ganho, matriz_H, lambda_regularizacao, max_iter_algo, tol_algo, ACUMULAR_FLOAT64,
+                    ao_iterar, controle, config.posto_svd, Htg, modelo_id=dados.modelo_imagem_id
+                )
+            else:
+                raise HTTPException(status_code=400, detail="Algoritmo selecionado inválido. Use 'CGNE', 'CGNR' ou 'SVD'.")
+        except Exception as e:
+            print(f"Erro durante a execução do algoritmo: {e}")
+            raise HTTPException(status_code=500, detail=f"Erro na execução do algoritmo de reconstrução: {e}")
+    HISTOGRAMA_ITERACOES.observar(
+        num_iteracoes_executadas, *rotulos_metricas(dados.modelo_imagem_id, dados.algoritmo_selecionado)
+    )
+    CONTADOR_PARADAS.incrementar(*rotulos_metricas(dados.modelo_imagem_id, dados.algoritmo_selecionado), motivo_parada)
+
+    # Cancelada: o resultado é descartado. Prazo esgotado: segue com o último iterado
+    motivo_interrupcao = controle.motivo_interrupcao if controle is not None else None
+    if motivo_interrupcao == "cancelada":
+        raise TarefaCancelada()
+
+    # Qualidade numérica: resíduo relativo final ||g - Hf|| / ||g|| (sempre em float64) e,
+    # opcionalmente, comparação da solução float32 com a mesma reconstrução em float64
+    loop = asyncio.get_running_loop()
+    residuo_relativo = await loop.run_in_executor(
+        None, matriz_H.residuo_relativo, vetor_g_com_ganho, imagem_reconstruida_vetor
+    )
+    comparacao_float64 = None
+    if COMPARAR_PRECISAO and precisao != "float64":
+        try:
+            comparacao_float64 = await comparar_com_float64(
+                dados, vetor_g_com_ganho, imagem_reconstruida_vetor, lambda_regularizacao, max_iter_algo, tol_algo, parada
             )
-        elif dados.algoritmo_selecionado.upper() == "CGNR":
-            imagem_reconstruida_vetor, num_iteracoes_executadas = await loop.run_in_executor(
-                None, reconstruir_cgnr, vetor_g_com_ganho, matriz_H, lambda_regularizacao, max_iter_algo, tol_algo
+        except Exception as e:
+            print(f"[AVISO] Comparação com float64 falhou: {e}")
+
+    data_hora_termino_reconstrucao = datetime.datetime.now()
+
+    # Iterações economizadas: em relação à última reconstrução da cadeia que partiu de zeros
+    # com o mesmo algoritmo (quadros diferentes; é uma estimativa, não uma medida do mesmo sinal)
+    iteracoes_referencia = None
+    partida_aquecida = None
+    if solucao_anterior is not None:
+        if solucao_anterior.algoritmo == dados.algoritmo_selecionado.upper():
+            iteracoes_referencia = solucao_anterior.iteracoes_referencia
+        partida_aquecida = {
+            "origem": "frame_anterior" if dados.frame_anterior is not None else "sessao",
+            "id_reconstrucao_anterior": solucao_anterior.id_reconstrucao,
+            "iteracoes_referencia": iteracoes_referencia,
+            "iteracoes_economizadas": (
+                max(iteracoes_referencia - num_iteracoes_executadas, 0) if iteracoes_referencia is not None else None
+            ),
+        }
+    elif x0 is None and dados.algoritmo_selecionado.upper() in ("CGNE", "CGNR"):
+        iteracoes_referencia = num_iteracoes_executadas
+
+    metadados_extras = {
+        "modelo_imagem_id": dados.modelo_imagem_id,
+        "formato_matriz_h": matriz_H.formato,
+        "densidade_matriz_h": matriz_H.densidade,
+        "tamanho_lote": tamanho_lote,
+        "precisao": precisao,
+        "acumulacao_float64": ACUMULAR_FLOAT64 and precisao != "float64",
+        "residuo_relativo": residuo_relativo,
+        "comparacao_float64": comparacao_float64,
+        "interrupcao": motivo_interrupcao,
+        "precondicionador": precondicionador,
+        "envio_fluxo": sinal_preparado is not None,
+        "politica_parada": descrever_parada(config, parada),
+        "motivo_parada": motivo_parada,
+        "partida_aquecida": partida_aquecida,
+        # Norma do resíduo no critério de parada do algoritmo, na última iteração
+        "norma_residuo_final": controle.progresso[1] if controle is not None and num_iteracoes_executadas else None,
+    }
+    if dados.algoritmo_selecionado.upper() == "SVD":
+        metadados_extras["posto_svd"] = config.posto_svd or matriz_H.shape[1]
+    return {
+        "imagem": imagem_reconstruida_vetor,
+        "num_iteracoes": num_iteracoes_executadas,
+        "data_hora_inicio": data_hora_inicio_reconstrucao,
+        "data_hora_termino": data_hora_termino_reconstrucao,
+        "iteracoes_referencia": iteracoes_referencia,
+        "metadados_extras": metadados_extras,
+    }
+
+
+def concluir_reconstrucao(dados: DadosReconstrucao, resolucao: dict, origem_cache: bool = False) -> dict:
+    # 6. Salvar a imagem e os metadados: id, usuário e sessão são desta requisição, mesmo quando a
+    # resolução veio de outra (single-flight) ou do cache
+    metadados_extras = {**resolucao["metadados_extras"], "sessao_id": dados.sessao_id}
+    if origem_cache:
+        metadados_extras["origem_cache"] = True
+    nome_arquivo_imagem_salva, metadados_completos = persistir_reconstrucao(
+        dados, resolucao["imagem"], resolucao["data_hora_inicio"], resolucao["data_hora_termino"],
+        resolucao["num_iteracoes"], metadados_extras
+    )
+
+    # Soluções de CGNE/CGNR ficam disponíveis como ponto de partida (as parciais, por prazo, não)
+    if metadados_extras["interrupcao"] is None and dados.algoritmo_selecionado.upper() in ("CGNE", "CGNR"):
+        ARMAZEM_SOLUCOES.guardar(dados.identificacao_usuario, SolucaoAnterior(
+            resolucao["imagem"], dados.modelo_imagem_id, dados.algoritmo_selecionado.upper(),
+            metadados_completos["id_reconstrucao"], resolucao["iteracoes_referencia"]
+        ), dados.sessao_id)
+
+    resultado = {
+        "status": "sucesso",
+        "id_reconstrucao": metadados_completos["id_reconstrucao"],
+        "mensagem": "Imagem reconstruída com sucesso!",
+        "caminho_imagem_servidor": nome_arquivo_imagem_salva,
+        "metadados": metadados_completos
+    }
+    if origem_cache:
+        resultado["origem_cache"] = True
+    return resultado
+
+
+def resolucao_para_cache(resolucao: dict) -> dict:
+    # Versão serializável (JSON) da resolução; a imagem vai como base64 dos bytes do vetor
+    imagem = np.ascontiguousarray(resolucao["imagem"])
+    return {
+        **resolucao,
+        "imagem": {"dtype": imagem.dtype.str, "dados": base64.b64encode(imagem.tobytes()).decode("ascii")},
+        "data_hora_inicio": resolucao["data_hora_inicio"].isoformat(),
+        "data_hora_termino": resolucao["data_hora_termino"].isoformat(),
+    }
+
+
+def resolucao_do_cache(entrada: dict) -> dict:
+    return {
+        **entrada,
+        "imagem": np.frombuffer(base64.b64decode(entrada["imagem"]["dados"]), dtype=entrada["imagem"]["dtype"]),
+        "data_hora_inicio": datetime.datetime.fromisoformat(entrada["data_hora_inicio"]),
+        "data_hora_termino": datetime.datetime.fromisoformat(entrada["data_hora_termino"]),
+    }
+
+
+def descrever_parada(config, parada) -> dict:
+    # Política de parada em vigor, para os metadados (None no SVD, que não itera)
+    if parada is None:
+        return None
+    return {"max_iteracoes": config.max_iteracoes, "tolerancia": config.tolerancia, **parada.descrever()}
+
+
+def persistir_reconstrucao(dados: DadosReconstrucao, f_reconstruido: np.ndarray,
+                           data_hora_inicio: datetime.datetime, data_hora_termino: datetime.datetime,
+                           num_iteracoes: int, metadados_extras: dict) -> tuple[str, dict]:
+    # Retorna (caminho da imagem, metadados completos)
+    try:
+        if GRAVADOR_RECONSTRUCOES is not None:
+            # Responde já; PNG e registro no banco são gravados em segundo plano
+            id_reconstrucao = str(uuid.uuid4())
+            nome_arquivo_imagem_salva = GRAVADOR_RECONSTRUCOES.caminho_relativo_imagem(id_reconstrucao)
+            metadados_completos = montar_metadados(
+                id_reconstrucao, dados.identificacao_usuario, dados.algoritmo_selecionado,
+                data_hora_inicio, data_hora_termino, dados.dimensoes_imagem,
+                num_iteracoes, GRAVADOR_RECONSTRUCOES.caminho_imagem(id_reconstrucao), metadados_extras
             )
+            GRAVADOR_RECONSTRUCOES.registrar(f_reconstruido, dados.dimensoes_imagem, metadados_completos)
         else:
-            raise HTTPException(status_code=400, detail="Algoritmo selecionado inválido. Use 'CGNE' ou 'CGNR'.")
+            # Codificação e gravação na própria requisição: medidas juntas como persistência
+            with medir_etapa("persistencia", dados):
+                nome_arquivo_imagem_salva, metadados_completos = salvar_imagem_e_metadados(
+                    f_reconstruido=f_reconstruido,
+                    identificacao_usuario=dados.identificacao_usuario,
+                    algoritmo_utilizado=dados.algoritmo_selecionado,
+                    data_hora_inicio=data_hora_inicio,
+                    data_hora_termino=data_hora_termino,
+                    dimensoes_imagem=dados.dimensoes_imagem,
+                    num_iteracoes=num_iteracoes,
+                    metadados_extras=metadados_extras
+                )
     except Exception as e:
-        print(f"Erro durante a execução do algoritmo: {e}")
-        raise HTTPException(status_code=500, detail=f"Erro na execução do algoritmo de reconstrução: {e}")
+        print(f"Erro ao salvar imagem/metadados: {e}")
+        raise HTTPException(status_code=500, detail=f"Erro ao salvar resultado da reconstrução: {e}")
+    return nome_arquivo_imagem_salva, metadados_completos
 
-    data_hora_termino_reconstrucao = datetime.datetime.now()
 
-    # 6. Salvar a imagem e os metadados
+async def executar_reconstrucao_lote(dados: DadosReconstrucao, quadros: list, controle: ControleReconstrucao,
+                                     id_lote: str, emitir) -> dict:
+    # Vários sinais do mesmo modelo como uma unidade: modelo carregado e validado uma vez, lambdas
+    # de todos os sinais em um único produto Hᵀ G e sinais resolvidos em blocos multi-RHS de
+    # LOTE_TAMANHO_MAXIMO colunas. emitir(resultado) recebe cada quadro assim que ele termina;
+    # quadros inválidos são emitidos como erro sem interromper os demais.
+    config, precisao, matriz_H = await carregar_modelo_validado(dados)
+    algoritmo = dados.algoritmo_selecionado.upper()
+    rotulos = rotulos_metricas(dados.modelo_imagem_id, algoritmo)
+    contagem = {"sucessos": 0, "erros": 0}
+    ids_reconstrucao = []
+
+    def emitir_erro(indice: int, nome: str, status_code: int, detalhe: str) -> None:
+        contagem["erros"] += 1
+        CONTADOR_RECONSTRUCOES.incrementar(*rotulos, "erro")
+        emitir({"quadro": indice, "nome_quadro": nome, "status": "erro", "status_code": status_code, "detalhe": detalhe})
+
+    # Ganho por sinal; sinais com tamanho errado não entram no lote
+    validos, colunas = [], []
+    with medir_etapa("ganho", dados):
+        for indice, (nome, g) in enumerate(quadros):
+            if g.shape[0] != matriz_H.shape[0]:
+                emitir_erro(indice, nome, 400, f"Incompatibilidade de dimensões: Linhas de H ({matriz_H.shape[0]}) != elementos do vetor g ({g.shape[0]}).")
+                continue
+            try:
+                colunas.append(preprocessar_sinal(g, N_sensores=config.N_sensores, S_amostras=config.S_amostras, inplace=True))
+                validos.append((indice, nome))
+            except ValueError as e:
+                emitir_erro(indice, nome, 400, f"Erro ao aplicar ganho de sinal: {e}")
+
+    loop = asyncio.get_running_loop()
+    if validos:
+        G = np.column_stack(colunas)
+        del colunas
+        with medir_etapa("lambda", dados):
+            lambdas = np.minimum(
+                await loop.run_in_executor(None, calculo_coeficiente_regularizacao, matriz_H, G), LIMITE_LAMBDA
+            )
+        if algoritmo == "SVD":
+            await loop.run_in_executor(None, lambda: matriz_H.fatoracao_svd)
+
+    precondicionador = config.precondicionador if algoritmo in ("CGNE", "CGNR") else None
+    for inicio in range(0, len(validos), LOTE_TAMANHO_MAXIMO):
+        bloco = validos[inicio:inicio + LOTE_TAMANHO_MAXIMO]
+        motivo_interrupcao = controle.motivo_interrupcao
+        if motivo_interrupcao == "cancelada":
+            raise TarefaCancelada()
+        if motivo_interrupcao == "prazo":
+            # Blocos ainda não iniciados não são resolvidos depois do prazo
+            for indice, nome in validos[inicio:]:
+                emitir_erro(indice, nome, 504, "Prazo esgotado antes da reconstrução do sinal.")
+            break
+
+        data_hora_inicio = datetime.datetime.now()
+        G_bloco = G[:, inicio:inicio + len(bloco)]
+        lambdas_bloco = lambdas[inicio:inicio + len(bloco)]
+        try:
+            with medir_etapa("solver", dados):
+                F, iteracoes, motivos_parada = await resolver_bloco_lote(
+                    algoritmo, G_bloco, matriz_H, lambdas_bloco, config, precondicionador, controle
+                )
+        except Exception as e:
+            print(f"Erro durante a execução do algoritmo em lote: {e}")
+            for indice, nome in bloco:
+                emitir_erro(indice, nome, 500, f"Erro na execução do algoritmo de reconstrução: {e}")
+            continue
+        residuos = await loop.run_in_executor(None, matriz_H.residuos_relativos, G_bloco, F)
+        data_hora_termino = datetime.datetime.now()
+
+        motivo_interrupcao = controle.motivo_interrupcao
+        if motivo_interrupcao == "cancelada":
+            raise TarefaCancelada()
+        for k, (indice, nome) in enumerate(bloco):
+            num_iteracoes = int(iteracoes[k])
+            HISTOGRAMA_ITERACOES.observar(num_iteracoes, *rotulos)
+            CONTADOR_PARADAS.incrementar(*rotulos, motivos_parada[k])
+            parada = config.parada.para_sinal(G_bloco[:, k]) if algoritmo in ("CGNE", "CGNR") else None
+            metadados_extras = {
+                "modelo_imagem_id": dados.modelo_imagem_id,
+                "formato_matriz_h": matriz_H.formato,
+                "densidade_matriz_h": matriz_H.densidade,
+                "tamanho_lote": len(bloco),
+                "precisao": precisao,
+                "acumulacao_float64": ACUMULAR_FLOAT64 and precisao != "float64",
+                "residuo_relativo": residuos[k],
+                "comparacao_float64": None,
+                "interrupcao": motivo_interrupcao,
+                "precondicionador": precondicionador,
+                "politica_parada": descrever_parada(config, parada),
+                "motivo_parada": motivos_parada[k],
+                "norma_residuo_final": None,
+                "id_lote": id_lote,
+                "quadro": indice,
+                "nome_quadro": nome,
+            }
+            if algoritmo == "SVD":
+                metadados_extras["posto_svd"] = config.posto_svd or matriz_H.shape[1]
+            try:
+                nome_arquivo_imagem_salva, metadados_completos = persistir_reconstrucao(
+                    dados, F[:, k].copy(), data_hora_inicio, data_hora_termino, num_iteracoes, metadados_extras
+                )
+            except HTTPException as e:
+                emitir_erro(indice, nome, e.status_code, e.detail)
+                continue
+            contagem["sucessos"] += 1
+            CONTADOR_RECONSTRUCOES.incrementar(*rotulos, motivo_interrupcao or "sucesso")
+            ids_reconstrucao.append(metadados_completos["id_reconstrucao"])
+            emitir({
+                "quadro": indice,
+                "nome_quadro": nome,
+                "status": "sucesso",
+                "id_reconstrucao": metadados_completos["id_reconstrucao"],
+                "caminho_imagem_servidor": nome_arquivo_imagem_salva,
+                "metadados": metadados_completos,
+            })
+
+    return {
+        "status": "sucesso" if not contagem["erros"] else "parcial",
+        "id_lote": id_lote,
+        "total_quadros": len(quadros),
+        **contagem,
+        "ids_reconstrucao": ids_reconstrucao,
+    }
+
+
+async def resolver_bloco_lote(algoritmo: str, G: np.ndarray, matriz_H: OperadorH, lambdas: np.ndarray,
+                              config, precondicionador: str, controle: ControleReconstrucao) -> tuple:
+    # (imagens, iterações e motivo da parada por sinal) de um bloco; o progresso acompanhado é o da primeira coluna
+    max_iter, tol = config.max_iteracoes, config.tolerancia
+    ao_iterar = [controle.registrar_iteracao] + [None] * (G.shape[1] - 1)
+    cancelamentos = [controle] * G.shape[1]
+    if algoritmo == "SVD":
+        return await EXECUTOR_SOLVER.executar(
+            reconstruir_svd_bloco, G, matriz_H, lambdas, max_iter, tol, ACUMULAR_FLOAT64, ao_iterar, cancelamentos,
+            config.posto_svd, modelo_id=config.modelo_id
+        )
+    if precondicionador is None:
+        return await EXECUTOR_SOLVER.executar(
+            ALGORITMOS_BLOCO[algoritmo], G, matriz_H, lambdas, max_iter, tol, ACUMULAR_FLOAT64, ao_iterar, cancelamentos,
+            config.parada, modelo_id=config.modelo_id
+        )
+    # As variantes em bloco não usam precondicionador: um sinal por vez
+    funcao = reconstruir_cgne if algoritmo == "CGNE" else reconstruir_cgnr
+    resultados = [
+        await EXECUTOR_SOLVER.executar(
+            funcao, G[:, k], matriz_H, lambdas[k], max_iter, tol, ACUMULAR_FLOAT64,
+            ao_iterar[k], controle, precondicionador, None, None, config.parada, modelo_id=config.modelo_id
+        )
+        for k in range(G.shape[1])
+    ]
+    return (np.column_stack([f for f, _, _ in resultados]), np.array([n for _, n, _ in resultados]),
+            [motivo for _, _, motivo in resultados])
+
+
+async def comparar_com_float64(dados: DadosReconstrucao, g: np.ndarray, f_reconstruido: np.ndarray,
+                               lam: float, max_iter: int, tol: float, parada=None) -> dict:
+    # Resolve o mesmo problema em float64 para medir o erro introduzido pela precisão simples
+    loop = asyncio.get_running_loop()
+    matriz_H64 = await loop.run_in_executor(None, carregar_matriz_h, dados.modelo_imagem_id, "float64")
+    algoritmo = dados.algoritmo_selecionado.upper()
+    if algoritmo == "SVD":
+        await loop.run_in_executor(None, lambda: matriz_H64.fatoracao_svd)
+        f64, num_iteracoes64, _ = await EXECUTOR_SOLVER.executar(
+            reconstruir_svd, g, matriz_H64, lam, max_iter, tol, False, None, None,
+            REGISTRO_MODELOS.obter_config(dados.modelo_imagem_id).posto_svd, modelo_id=dados.modelo_imagem_id
+        )
+    else:
+        funcao = reconstruir_cgne if algoritmo == "CGNE" else reconstruir_cgnr
+        f64, num_iteracoes64, _ = await EXECUTOR_SOLVER.executar(
+            funcao, g, matriz_H64, lam, max_iter, tol, False, None, None,
+            REGISTRO_MODELOS.obter_config(dados.modelo_imagem_id).precondicionador, None, None, parada,
+            modelo_id=dados.modelo_imagem_id
+        )
+    residuo64 = await loop.run_in_executor(None, matriz_H64.residuo_relativo, g, f64)
+    return {
+        "diferenca_relativa": float(np.linalg.norm(f_reconstruido - f64) / np.linalg.norm(f64)),
+        "residuo_relativo_float64": residuo64,
+        "numero_iteracoes_float64": int(num_iteracoes64),
+    }
+
+
+def precisao_requisicao(dados: DadosReconstrucao) -> str:
+    return dados.precisao or REGISTRO_MODELOS.obter_config(dados.modelo_imagem_id).precisao
+
+
+def chave_resultado(dados: DadosReconstrucao, conteudo_sinal: bytes, arquivo_sinal: UploadFile) -> str:
+    # Tudo que altera a imagem reconstruída; o usuário que a solicitou não faz parte da chave (a
+    # entrada guarda só a resolução; metadados e persistência são montados por requisição)
+    config = REGISTRO_MODELOS.obter_config(dados.modelo_imagem_id)
+    return calcular_chave(
+        conteudo_sinal, FORMATO_CACHE_RESULTADOS, arquivo_sinal.content_type, os.path.splitext(arquivo_sinal.filename or "")[1],
+        dados.modelo_imagem_id, dados.algoritmo_selecionado.upper(), tuple(dados.dimensoes_imagem),
+        precisao_requisicao(dados), ACUMULAR_FLOAT64, POLITICA_LAMBDA, config.max_iteracoes, config.tolerancia,
+        config.posto_svd, config.precondicionador, config.parada.chave()
+    )
+
+
+def partida_aquecida_solicitada(dados: DadosReconstrucao) -> bool:
+    # A imagem passa a depender da solução anterior: sem cache de resultados nem tarefas compartilhadas
+    return (dados.sessao_id is not None or dados.frame_anterior is not None) and \
+        dados.algoritmo_selecionado.upper() in ("CGNE", "CGNR")
+
+
+def resolvida_em_lote(dados: DadosReconstrucao) -> bool:
+    # Mesma condição de executar_reconstrucao para usar o agendador de lotes
+    config = REGISTRO_MODELOS.obter_config(dados.modelo_imagem_id)
+    return (LOTES_ATIVOS and config.precondicionador is None and not partida_aquecida_solicitada(dados)
+            and dados.algoritmo_selecionado.upper() in ALGORITMOS_BLOCO)
+
+
+def validar_dados_json(dados_json: str) -> DadosReconstrucao:
+    # Desserializar a string JSON para o modelo Pydantic
+    try:
+        return DadosReconstrucao.model_validate_json(dados_json)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Erro de validação dos dados JSON: {e}. Recebido: {dados_json}")
+
+
+def submeter_tarefa(dados: DadosReconstrucao, conteudo_sinal: bytes, arquivo_sinal: UploadFile, prioridade: str,
+                    sinal_preparado: tuple = None) -> Tarefa:
+    # sinal_preparado (envio em fluxo) substitui conteudo_sinal/arquivo_sinal e não passa pelo cache
+    if REGISTRO_MODELOS.obter_config(dados.modelo_imagem_id) is None:
+        raise HTTPException(status_code=400, detail=f"Modelo de imagem '{dados.modelo_imagem_id}' não reconhecido. Verifique os IDs de modelo disponíveis.")
+
+    chave = None
+    if CACHE_RESULTADOS is not None and sinal_preparado is None and not partida_aquecida_solicitada(dados):
+        chave = chave_resultado(dados, conteudo_sinal, arquivo_sinal)
+        # Consulta e, no acerto, a persistência desta requisição (tempo exportado como a etapa 'cache')
+        with medir_etapa("cache", dados):
+            entrada = CACHE_RESULTADOS.obter(chave)
+            resultado = concluir_reconstrucao(dados, resolucao_do_cache(entrada), origem_cache=True) if entrada else None
+        if resultado is not None:
+            return FILA_TAREFAS.registrar_concluida(
+                dados.modelo_imagem_id, dados.identificacao_usuario, prioridade, resultado
+            )
+
+    prazo = time.time() + dados.prazo_ms / 1000 if dados.prazo_ms is not None else None
+
+    async def executar():
+        rotulos = rotulos_metricas(dados.modelo_imagem_id, dados.algoritmo_selecionado)
+        HISTOGRAMA_ETAPAS.observar((datetime.datetime.now() - tarefa.criada_em).total_seconds(), "fila", *rotulos)
+        # Estado de progresso/cancelamento da execução, em memória compartilhada no backend de processos
+        controle = ControleReconstrucao(prazo, EXECUTOR_SOLVER.entre_processos)
+        tarefa.controle = controle
+        if tarefa.cancelamento_solicitado:
+            controle.cancelar()
+        try:
+            if sinal_preparado is None:
+                resolucao = await executar_reconstrucao(
+                    dados, conteudo_sinal, arquivo_sinal.content_type, arquivo_sinal.filename, controle
+                )
+            else:
+                resolucao = await executar_reconstrucao(dados, None, controle=controle, sinal_preparado=sinal_preparado)
+        except TarefaCancelada:
+            CONTADOR_RECONSTRUCOES.incrementar(*rotulos, "cancelada")
+            raise
+        except Exception:
+            CONTADOR_RECONSTRUCOES.incrementar(*rotulos, "erro")
+            raise
+        finally:
+            controle.fechar()
+        interrupcao = resolucao["metadados_extras"]["interrupcao"]
+        CONTADOR_RECONSTRUCOES.incrementar(*rotulos, interrupcao or "sucesso")
+        # Resultados parciais (prazo esgotado) e os encerrados pelo orçamento de tempo da política de
+        # parada (iterações dependem da carga do servidor) não vão para o cache
+        parada_por_tempo = resolucao["metadados_extras"]["motivo_parada"] == "tempo"
+        if chave is not None and interrupcao is None and not parada_por_tempo:
+            CACHE_RESULTADOS.guardar(chave, resolucao_para_cache(resolucao))
+        return resolucao
+
+    try:
+        # Requisições idênticas a uma tarefa ainda em andamento aguardam essa mesma tarefa; com prazo
+        # o resultado pode ser parcial, então a tarefa não é compartilhada
+        tarefa = FILA_TAREFAS.submeter(
+            dados.modelo_imagem_id, dados.identificacao_usuario, prioridade, executar,
+            chave if prazo is None else None, agrupavel=resolvida_em_lote(dados),
+            concluir=lambda resolucao: concluir_reconstrucao(dados, resolucao)
+        )
+        return tarefa
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FilaCheia as e:
+        raise HTTPException(status_code=e.status_code, detail=e.mensagem, headers={"Retry-After": str(e.retry_after)})
+
+
+@app.post("/reconstruir_imagem/")
+async def rota_reconstruir_imagem(
+    request: Request,
+    dados_json: str = Form(...),
+    arquivo_sinal: UploadFile = File(...)
+):
+    #Endpoint para receber os dados do sinal; aguarda a tarefa na fila até o fim da reconstrução
+
+    dados = validar_dados_json(dados_json)
+    with medir_etapa("leitura_upload", dados):
+        conteudo_sinal = await arquivo_sinal.read()
+    tarefa = submeter_tarefa(dados, conteudo_sinal, arquivo_sinal, "normal")
+    await aguardar_tarefa(request, tarefa)
+    if tarefa.estado in ("erro", "cancelada"):
+        raise HTTPException(status_code=tarefa.status_code, detail=tarefa.erro)
+    return JSONResponse(content=tarefa.resultado)
+
+
+@app.post("/reconstruir_fluxo/")
+async def rota_reconstruir_fluxo(request: Request, dados_json: str):
+    # Sinal enviado como corpo da requisição, em partes (Transfer-Encoding: chunked), em binário bruto
+    # (application/x-float32 ou x-float64) ou CSV com um valor por linha; dados_json vai na query string.
+    # O modelo é carregado antes do sinal chegar e cada bloco recebido já soma sua parcela de Hᵀg,
+    # de modo que a reconstrução começa assim que a última parte chega.
+
+    dados = validar_dados_json(dados_json)
+    config, _, matriz_H = await carregar_modelo_validado(dados)
+    # Admissão antes de receber o sinal: a tarefa seria recusada na submissão, ou já há
+    # FLUXO_MAXIMO_SIMULTANEOS sinais sendo acumulados
+    try:
+        FILA_TAREFAS.verificar_admissao(dados.modelo_imagem_id, dados.identificacao_usuario)
+    except FilaCheia as e:
+        raise HTTPException(status_code=e.status_code, detail=e.mensagem, headers={"Retry-After": str(e.retry_after)})
+    if FLUXOS_SIMULTANEOS.locked():
+        raise HTTPException(
+            status_code=503, detail=f"Já há {FLUXO_MAXIMO_SIMULTANEOS} envios em fluxo em andamento.",
+            headers={"Retry-After": str(FILA_TAREFAS.estimar_espera(dados.modelo_imagem_id))}
+        )
+    async with FLUXOS_SIMULTANEOS:
+        sinal_preparado = await receber_sinal_fluxo(request, dados, config, matriz_H)
+
+    tarefa = submeter_tarefa(dados, None, None, "normal", sinal_preparado)
+    await aguardar_tarefa(request, tarefa)
+    if tarefa.estado in ("erro", "cancelada"):
+        raise HTTPException(status_code=tarefa.status_code, detail=tarefa.erro)
+    return JSONResponse(content=tarefa.resultado)
+
+
+async def receber_sinal_fluxo(request: Request, dados: DadosReconstrucao, config, matriz_H) -> tuple[np.ndarray, np.ndarray]:
     try:
-        nome_arquivo_imagem_salva, metadados_completos = salvar_imagem_e_metadados(
-            f_reconstruido=imagem_reconstruida_vetor,
-            identificacao_usuario=dados.identificacao_usuario,
-            algoritmo_utilizado=dados.algoritmo_selecionado,
-            data_hora_inicio=data_hora_inicio_reconstrucao,
-            data_hora_termino=data_hora_termino_reconstrucao,
-            dimensoes_imagem=dados.dimensoes_imagem,
-            num_iteracoes=num_iteracoes_executadas
+        acumulador = AcumuladorSinal(
+            matriz_H, config.N_sensores, config.S_amostras, request.headers.get("content-type"), FLUXO_LINHAS_POR_BLOCO
         )
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+
+    async def somar(trechos):
+        # Produtos com blocos de H no backend dos algoritmos; a próxima parte é lida quando terminam
+        for trecho, inicio in trechos:
+            acumulador.somar(await EXECUTOR_SOLVER.executar(
+                parcela_transposta, matriz_H, trecho, inicio, modelo_id=dados.modelo_imagem_id
+            ))
+
+    loop = asyncio.get_running_loop()
+    try:
+        with medir_etapa("leitura_upload", dados):
+            async for parte in request.stream():
+                if parte:
+                    await somar(await loop.run_in_executor(None, acumulador.adicionar, parte))
+        with medir_etapa("ganho", dados):
+            await somar(acumulador.encerrar())
+            return acumulador.finalizar()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Erro ao processar o sinal recebido em fluxo: {e}")
+
+
+async def aguardar_tarefa(request: Request, tarefa: Tarefa) -> None:
+    # Aguarda a tarefa verificando periodicamente a conexão: se o cliente desconectar, a
+    # requisição desiste da tarefa, que é cancelada quando ninguém mais a aguarda
+    while not tarefa.concluida.is_set():
+        try:
+            await asyncio.wait_for(tarefa.concluida.wait(), INTERVALO_VERIFICACAO_DESCONEXAO_MS / 1000)
+        except asyncio.TimeoutError:
+            if await request.is_disconnected():
+                print(f"Cliente desconectado; desistindo da tarefa {tarefa.id_tarefa}.")
+                FILA_TAREFAS.desistir(tarefa)
+                raise HTTPException(status_code=TarefaCancelada.status_code, detail="Cliente desconectado.")
+
+
+def progresso_tarefa(tarefa: Tarefa) -> dict:
+    iteracao, norma_residuo = tarefa.controle.progresso if tarefa.controle is not None else (0, None)
+    inicio = tarefa.iniciada_em
+    fim = tarefa.concluida_em or datetime.datetime.now()
+    return {
+        "estado": tarefa.estado,
+        "iteracao": iteracao,
+        "norma_residuo": norma_residuo if iteracao else None,
+        "tempo_decorrido_s": (fim - inicio).total_seconds() if inicio else 0.0,
+    }
+
+
+@app.post("/jobs", status_code=202)
+async def rota_criar_tarefa(
+    dados_json: str = Form(...),
+    arquivo_sinal: UploadFile = File(...),
+    prioridade: str = Form("normal")
+):
+    # Enfileira a reconstrução e retorna imediatamente; o resultado é consultado em GET /jobs/{id}
+
+    dados = validar_dados_json(dados_json)
+    with medir_etapa("leitura_upload", dados):
+        conteudo_sinal = await arquivo_sinal.read()
+    tarefa = submeter_tarefa(dados, conteudo_sinal, arquivo_sinal, prioridade)
+    return JSONResponse(
+        status_code=202,
+        content={
+            "id_tarefa": tarefa.id_tarefa,
+            "estado": tarefa.estado,
+            "posicao_fila": FILA_TAREFAS.profundidade(tarefa.modelo_id),
+        },
+        headers={"Location": f"/jobs/{tarefa.id_tarefa}"}
+    )
+
+
+@app.get("/jobs/{id_tarefa}")
+async def rota_consultar_tarefa(id_tarefa: str):
+    tarefa = FILA_TAREFAS.obter(id_tarefa)
+    if tarefa is None:
+        raise HTTPException(status_code=404, detail=f"Tarefa '{id_tarefa}' não encontrada.")
+    return JSONResponse(content={**tarefa.para_dict(), "progresso": progresso_tarefa(tarefa)})
+
+
+@app.delete("/jobs/{id_tarefa}", status_code=202)
+async def rota_cancelar_tarefa(id_tarefa: str):
+    # Cancela a tarefa (na fila ou em execução); em execução, o algoritmo para na próxima iteração
+    tarefa = FILA_TAREFAS.obter(id_tarefa)
+    if tarefa is None:
+        raise HTTPException(status_code=404, detail=f"Tarefa '{id_tarefa}' não encontrada.")
+    if not FILA_TAREFAS.cancelar(tarefa):
+        raise HTTPException(status_code=409, detail=f"Tarefa '{id_tarefa}' já finalizada ({tarefa.estado}).")
+    return JSONResponse(status_code=202, content={"id_tarefa": tarefa.id_tarefa, "estado": tarefa.estado})
+
+
+@app.get("/jobs/{id_tarefa}/progresso")
+async def rota_progresso_tarefa(id_tarefa: str):
+    # Server-Sent Events: um evento 'progresso' a cada mudança (iteração, norma do resíduo,
+    # tempo decorrido) e um evento 'fim' com o estado final da tarefa
+    tarefa = FILA_TAREFAS.obter(id_tarefa)
+    if tarefa is None:
+        raise HTTPException(status_code=404, detail=f"Tarefa '{id_tarefa}' não encontrada.")
+
+    async def eventos():
+        ultimo = None
+        while True:
+            progresso = progresso_tarefa(tarefa)
+            atual = (progresso["estado"], progresso["iteracao"])
+            if atual != ultimo:
+                ultimo = atual
+                yield f"event: progresso\ndata: {json.dumps(progresso)}\n\n"
+            if tarefa.concluida.is_set():
+                fim = {"estado": tarefa.estado, "erro": tarefa.erro,
+                       "id_reconstrucao": (tarefa.resultado or {}).get("id_reconstrucao")}
+                yield f"event: fim\ndata: {json.dumps(fim)}\n\n"
+                return
+            try:
+                await asyncio.wait_for(tarefa.concluida.wait(), INTERVALO_PROGRESSO_MS / 1000)
+            except asyncio.TimeoutError:
+                pass
+
+    return StreamingResponse(eventos(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.post("/reconstruir_lote/")
+async def rota_reconstruir_lote(
+    request: Request,
+    dados_json: str = Form(...),
+    arquivo_sinais: UploadFile = File(...),
+    prioridade: str = Form("normal")
+):
+    # Vários sinais do mesmo modelo em um único envio: .npz, .zip (ex.: de CSVs) ou uma pilha (.npy 2D,
+    # CSV com um sinal por coluna ou binário bruto). O lote é uma única tarefa da fila e a resposta é
+    # NDJSON: uma linha 'inicio', uma linha 'quadro' por sinal assim que seu bloco termina e uma linha 'fim'.
+
+    dados = validar_dados_json(dados_json)
+    config = REGISTRO_MODELOS.obter_config(dados.modelo_imagem_id)
+    if config is None:
+        raise HTTPException(status_code=400, detail=f"Modelo de imagem '{dados.modelo_imagem_id}' não reconhecido. Verifique os IDs de modelo disponíveis.")
+    if dados.algoritmo_selecionado.upper() not in ALGORITMOS_SUPORTADOS:
+        raise HTTPException(status_code=400, detail="Algoritmo selecionado inválido. Use 'CGNE', 'CGNR' ou 'SVD'.")
+
+    with medir_etapa("leitura_upload", dados):
+        conteudo_sinais = await arquivo_sinais.read()
+    try:
+        with medir_etapa("interpretacao_sinal", dados):
+            quadros = await asyncio.get_running_loop().run_in_executor(
+                None, ler_sinais_lote, conteudo_sinais, arquivo_sinais.content_type, arquivo_sinais.filename,
+                config.dimensoes_h[0], LOTE_ENVIO_MAXIMO_SINAIS
+            )
+    except LimiteExcedido as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
-        print(f"Erro ao salvar imagem/metadados: {e}")
-        raise HTTPException(status_code=500, detail=f"Erro ao salvar resultado da reconstrução: {e}")
+        raise HTTPException(status_code=400, detail=f"Erro ao processar arquivo de sinais: {e}")
+    del conteudo_sinais
+    if not quadros:
+        raise HTTPException(status_code=400, detail="O arquivo não contém sinais.")
+
+    prazo = time.time() + dados.prazo_ms / 1000 if dados.prazo_ms is not None else None
+    resultados = asyncio.Queue()
+
+    async def executar():
+        HISTOGRAMA_ETAPAS.observar(
+            (datetime.datetime.now() - tarefa.criada_em).total_seconds(), "fila",
+            *rotulos_metricas(dados.modelo_imagem_id, dados.algoritmo_selecionado)
+        )
+        controle = ControleReconstrucao(prazo, EXECUTOR_SOLVER.entre_processos)
+        tarefa.controle = controle
+        if tarefa.cancelamento_solicitado:
+            controle.cancelar()
+        try:
+            return await executar_reconstrucao_lote(dados, quadros, controle, tarefa.id_tarefa, resultados.put_nowait)
+        finally:
+            controle.fechar()
+            resultados.put_nowait(None) # fim dos quadros
 
+    try:
+        tarefa = FILA_TAREFAS.submeter(dados.modelo_imagem_id, dados.identificacao_usuario, prioridade, executar)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FilaCheia as e:
+        raise HTTPException(status_code=e.status_code, detail=e.mensagem, headers={"Retry-After": str(e.retry_after)})
+
+    async def linhas():
+        yield json.dumps({"evento": "inicio", "id_lote": tarefa.id_tarefa, "total_quadros": len(quadros)}) + "\n"
+        try:
+            while True:
+                try:
+                    quadro = await asyncio.wait_for(resultados.get(), INTERVALO_VERIFICACAO_DESCONEXAO_MS / 1000)
+                except asyncio.TimeoutError:
+                    # Cancelada ainda na fila: a execução nunca começou e não há marcador de fim
+                    if tarefa.concluida.is_set() and resultados.empty():
+                        break
+                    if await request.is_disconnected():
+                        print(f"Cliente desconectado; desistindo do lote {tarefa.id_tarefa}.")
+                        return
+                    continue
+                if quadro is None:
+                    break
+                yield json.dumps({"evento": "quadro", **quadro}) + "\n"
+            await tarefa.concluida.wait()
+            yield json.dumps({
+                "evento": "fim", "estado": tarefa.estado, "erro": tarefa.erro, "resultado": tarefa.resultado
+            }) + "\n"
+        finally:
+            if not tarefa.concluida.is_set():
+                FILA_TAREFAS.desistir(tarefa)
+
+    return StreamingResponse(linhas(), media_type="application/x-ndjson", headers={"Cache-Control": "no-cache"})
+
+@app.get("/cache_resultados/")
+async def rota_cache_resultados():
+    if CACHE_RESULTADOS is None:
+        return JSONResponse(content={"ativo": False})
     return JSONResponse(content={
-        "status": "sucesso",
-        "id_reconstrucao": metadados_completos["id_reconstrucao"],
-        "mensagem": "Imagem reconstruída com sucesso!",
-        "caminho_imagem_servidor": nome_arquivo_imagem_salva,
-        "metadados": metadados_completos
+        "ativo": True,
+        **CACHE_RESULTADOS.estatisticas(),
+        "requisicoes_coalescidas": FILA_TAREFAS.coalescidas,
     })
 
+@app.get("/reconstrucoes")
+def rota_reconstrucoes(usuario: str = None, algoritmo: str = None, modelo: str = None,
+                       inicio: datetime.datetime = None, fim: datetime.datetime = None,
+                       limite: int = 50, cursor: str = None):
+    # Histórico das reconstruções (mais recentes primeiro), filtrado pelo índice do banco;
+    # para a próxima página, repita a consulta com cursor=proximo_cursor
+    if GRAVADOR_RECONSTRUCOES is None:
+        raise HTTPException(status_code=404, detail="Consulta disponível apenas com PERSISTENCIA_RECONSTRUCOES='sqlite'.")
+    if not 1 <= limite <= 1000:
+        raise HTTPException(status_code=400, detail="'limite' deve estar entre 1 e 1000.")
+    if cursor is not None and "|" not in cursor:
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+    reconstrucoes, proximo_cursor = GRAVADOR_RECONSTRUCOES.consultar(
+        usuario, algoritmo, modelo,
+        inicio.isoformat() if inicio is not None else None,
+        fim.isoformat() if fim is not None else None,
+        limite, cursor
+    )
+    return {
+        "reconstrucoes": reconstrucoes,
+        "proximo_cursor": proximo_cursor,
+        "gravacao": GRAVADOR_RECONSTRUCOES.estatisticas(),
+    }
+
+@app.get("/modelos/")
+async def rota_modelos():
+    return JSONResponse(content=REGISTRO_MODELOS.estado())
+
+@app.get("/prontidao/")
+async def rota_prontidao():
+    # 200 quando todos os modelos pré-carregados estão prontos; 503 enquanto aquecem (ou se falharam)
+    estado = REGISTRO_MODELOS.estado()
+    pronto = REGISTRO_MODELOS.prontos()
+    return JSONResponse(
+        status_code=200 if pronto else 503,
+        content={
+            "pronto": pronto,
+            "modelos": {modelo_id: info["estado"] for modelo_id, info in estado["modelos"].items()},
+        }
+    )
+
+def coletar_estado_servidor() -> list:
+    # Estado lido a cada exportação de /metrics
+    modelos = REGISTRO_MODELOS.estado()["modelos"]
+    metricas = [
+        ("fila_tarefas_profundidade", "gauge", "Tarefas aguardando na fila, por modelo.",
+         [({"modelo": modelo_id}, FILA_TAREFAS.profundidade(modelo_id)) for modelo_id in REGISTRO_MODELOS.configs]),
+        ("tarefas_coalescidas_total", "counter", "Requisições atendidas por uma tarefa idêntica em andamento.",
+         [({}, FILA_TAREFAS.coalescidas)]),
+        ("modelos_bytes_residentes", "gauge", "Bytes dos operadores H carregados em memória.",
+         [({"modelo": modelo_id, "precisao": precisao}, nbytes)
+          for modelo_id, info in modelos.items() for precisao, nbytes in info["bytes_por_precisao"].items()]),
+        ("modelos_bytes_mapeados", "gauge", "Bytes dos operadores H abertos com mmap de arquivos (cache de páginas do SO).",
+         [({"modelo": modelo_id, "precisao": precisao}, nbytes)
+          for modelo_id, info in modelos.items() for precisao, nbytes in info["bytes_mapeados_por_precisao"].items()]),
+        ("processo_cpu_percent", "gauge", "Uso de CPU do processo do servidor (amostrado em segundo plano).",
+         [({}, AMOSTRADOR_CPU.cpu_processo_percent)]),
+        ("sistema_cpu_percent", "gauge", "Uso de CPU do sistema (amostrado em segundo plano).",
+         [({}, AMOSTRADOR_CPU.cpu_percent)]),
+        ("sistema_memoria_percent", "gauge", "Uso de memória do sistema.", [({}, AMOSTRADOR_CPU.memoria_percent)]),
+        ("processo_memoria_residente_bytes", "gauge", "Memória residente do processo do servidor.",
+         [({}, AMOSTRADOR_CPU.memoria_processo_bytes)]),
+    ]
+    if CACHE_RESULTADOS is not None:
+        estatisticas = CACHE_RESULTADOS.estatisticas()
+        metricas += [
+            ("cache_resultados_consultas_total", "counter", "Consultas ao cache de resultados, por resultado.",
+             [({"resultado": resultado}, estatisticas[resultado])
+              for resultado in ("acertos_memoria", "acertos_disco", "falhas")]),
+            ("cache_resultados_taxa_acerto", "gauge", "Fração das consultas atendidas pelo cache.",
+             [({}, estatisticas["taxa_acerto"])]),
+            ("cache_resultados_bytes", "gauge", "Bytes ocupados pelo cache de resultados, por nível.",
+             [({"nivel": "memoria"}, estatisticas["bytes_memoria"]), ({"nivel": "disco"}, estatisticas["bytes_disco"])]),
+        ]
+    estatisticas = ARMAZEM_SOLUCOES.estatisticas()
+    metricas += [
+        ("partida_aquecida_consultas_total", "counter", "Consultas de solução anterior (sessão ou frame_anterior), por resultado.",
+         [({"resultado": resultado}, estatisticas[resultado]) for resultado in ("acertos", "falhas")]),
+        ("partida_aquecida_solucoes", "gauge", "Soluções guardadas para partida aquecida, por índice.",
+         [({"indice": "sessao"}, estatisticas["sessoes"]), ({"indice": "reconstrucao"}, estatisticas["reconstrucoes"])]),
+    ]
+    if ORCAMENTO_THREADS is not None:
+        estado = ORCAMENTO_THREADS.estado()
+        metricas += [
+            ("orcamento_nucleos_blas", "gauge", "Núcleos do orçamento de threads do BLAS, por situação.",
+             [({"situacao": "total"}, estado["nucleos"]), ({"situacao": "livres"}, estado["livres"])]),
+            ("orcamento_execucoes", "gauge", "Execuções de algoritmos com núcleos concedidos ou aguardando.",
+             [({"situacao": "em_execucao"}, estado["em_execucao"]), ({"situacao": "aguardando"}, estado["aguardando"])]),
+        ]
+    if GRAVADOR_RECONSTRUCOES is not None:
+        estatisticas = GRAVADOR_RECONSTRUCOES.estatisticas()
+        metricas += [
+            ("gravacao_pendentes", "gauge", "Reconstruções aguardando gravação.", [({}, estatisticas["pendentes"])]),
+            ("gravacao_falhas_total", "counter", "Reconstruções cuja gravação falhou.", [({}, estatisticas["falhas"])]),
+        ]
+    return metricas
+
+METRICAS.adicionar_coletor(coletar_estado_servidor)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def rota_metricas():
+    # Formato texto de exposição do Prometheus
+    return PlainTextResponse(METRICAS.exportar(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/status_servidor/")
 async def rota_status_servidor():
-    
-    cpu_percent = psutil.cpu_percent(interval=0.1)
-    mem_info = psutil.virtual_memory()
-    mem_percent = mem_info.percent
-    
+    # Última amostra do AMOSTRADOR_CPU: a rota não espera uma janela de medição
     return JSONResponse(content={
-        "cpu_percent": cpu_percent,
-        "memory_percent": mem_percent,
+        "cpu_percent": AMOSTRADOR_CPU.cpu_percent,
+        "memory_percent": AMOSTRADOR_CPU.memoria_percent,
         "timestamp": datetime.datetime.now().isoformat()
     })
 
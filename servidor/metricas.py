@@ -0,0 +1,159 @@
+import math
+import threading
+
+import psutil
+
+LIMITES_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LIMITES_ITERACOES = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+LIMITES_THREADS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def _formatar_rotulos(nomes: tuple, valores: tuple, extra: str = "") -> str:
+    pares = [f'{nome}="{_escapar(str(valor))}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar_valor(valor: float) -> str:
+    if math.isinf(valor):
+        return "+Inf" if valor > 0 else "-Inf"
+    return repr(float(valor))
+
+
+class Histograma:
+    # Histograma cumulativo no formato do Prometheus, uma série por combinação de rótulos
+
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple, limites: tuple):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self.limites = tuple(limites) + (math.inf,)
+        self._series = {} # valores dos rótulos -> [contagens por limite, soma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, *valores_rotulos) -> None:
+        with self._lock:
+            serie = self._series.get(valores_rotulos)
+            if serie is None:
+                serie = self._series[valores_rotulos] = [[0] * len(self.limites), 0.0, 0]
+            for i, limite in enumerate(self.limites):
+                if valor <= limite:
+                    serie[0][i] += 1
+                    break
+            serie[1] += valor
+            serie[2] += 1
+
+    def exportar(self) -> list[str]:
+        linhas = []
+        with self._lock:
+            series = [(valores, list(contagens), soma, total) for valores, (contagens, soma, total) in self._series.items()]
+        for valores, contagens, soma, total in sorted(series):
+            acumulado = 0
+            for limite, contagem in zip(self.limites, contagens):
+                acumulado += contagem
+                rotulos = _formatar_rotulos(self.rotulos, valores, f'le="{_formatar_valor(limite)}"')
+                linhas.append(f"{self.nome}_bucket{rotulos} {acumulado}")
+            rotulos = _formatar_rotulos(self.rotulos, valores)
+            linhas.append(f"{self.nome}_sum{rotulos} {_formatar_valor(soma)}")
+            linhas.append(f"{self.nome}_count{rotulos} {total}")
+        return linhas
+
+
+class Contador:
+    tipo = "counter"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, *valores_rotulos, valor: float = 1) -> None:
+        with self._lock:
+            self._series[valores_rotulos] = self._series.get(valores_rotulos, 0) + valor
+
+    def exportar(self) -> list[str]:
+        with self._lock:
+            series = sorted(self._series.items())
+        return [f"{self.nome}{_formatar_rotulos(self.rotulos, valores)} {_formatar_valor(v)}" for valores, v in series]
+
+
+class RegistroMetricas:
+    # Métricas do servidor exportadas no formato texto do Prometheus (GET /metrics).
+    # Histogramas e contadores são atualizados durante as reconstruções; os coletores são
+    # funções chamadas a cada exportação para ler o estado atual (fila, cache, modelos, CPU)
+    # e devolvem [(nome, tipo, ajuda, [(rótulos (dict), valor), ...]), ...].
+
+    def __init__(self):
+        self._metricas = []
+        self._coletores = []
+
+    def histograma(self, nome: str, ajuda: str, rotulos: tuple, limites: tuple) -> Histograma:
+        metrica = Histograma(nome, ajuda, rotulos, limites)
+        self._metricas.append(metrica)
+        return metrica
+
+    def contador(self, nome: str, ajuda: str, rotulos: tuple = ()) -> Contador:
+        metrica = Contador(nome, ajuda, rotulos)
+        self._metricas.append(metrica)
+        return metrica
+
+    def adicionar_coletor(self, coletor) -> None:
+        self._coletores.append(coletor)
+
+    def exportar(self) -> str:
+        linhas = []
+        for metrica in self._metricas:
+            linhas.append(f"# HELP {metrica.nome} {metrica.ajuda}")
+            linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            linhas.extend(metrica.exportar())
+        for coletor in self._coletores:
+            for nome, tipo, ajuda, amostras in coletor():
+                linhas.append(f"# HELP {nome} {ajuda}")
+                linhas.append(f"# TYPE {nome} {tipo}")
+                for rotulos, valor in amostras:
+                    if valor is None:
+                        continue
+                    linhas.append(f"{nome}{_formatar_rotulos(tuple(rotulos), tuple(rotulos.values()))} {_formatar_valor(valor)}")
+        return "\n".join(linhas) + "\n"
+
+
+class AmostradorCPU:
+    # Uso de CPU e memória medido por uma thread a cada intervalo_s segundos; as rotas leem a
+    # última amostra em vez de bloquear esperando uma janela de medição (cpu_percent(interval=...))
+
+    def __init__(self, intervalo_s: float):
+        self.intervalo_s = intervalo_s
+        self.cpu_percent = 0.0
+        self.cpu_processo_percent = 0.0
+        self.memoria_percent = psutil.virtual_memory().percent
+        self.memoria_processo_bytes = 0
+        self._processo = psutil.Process()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self) -> None:
+        if self._thread is None:
+            # A primeira leitura só define a referência; as seguintes medem desde a anterior
+            psutil.cpu_percent(interval=None)
+            self._processo.cpu_percent(interval=None)
+            self._thread = threading.Thread(target=self._amostrar, name="amostrador-cpu", daemon=True)
+            self._thread.start()
+
+    def parar(self) -> None:
+        self._parar.set()
+
+    def _amostrar(self) -> None:
+        while not self._parar.wait(self.intervalo_s):
+            self.cpu_percent = psutil.cpu_percent(interval=None)
+            self.cpu_processo_percent = self._processo.cpu_percent(interval=None)
+            self.memoria_percent = psutil.virtual_memory().percent
+            self.memoria_processo_bytes = self._processo.memory_info().rss
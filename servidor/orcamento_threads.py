@@ -0,0 +1,164 @@
+import asyncio
+import collections
+import contextlib
+import time
+
+from servidor.algoritmos.operador_h import OperadorHBlocos
+from servidor.execucao import ExecutorSolver
+
+
+def _modulo_threadpoolctl():
+    # threadpoolctl é dependência opcional: só é necessária com o orçamento de threads ativo
+    try:
+        import threadpoolctl
+    except ImportError as e:
+        raise ImportError("O orçamento de threads do BLAS (ORCAMENTO_NUCLEOS_BLAS) requer o pacote 'threadpoolctl'.") from e
+    return threadpoolctl
+
+
+# Controlador do threadpoolctl de cada processo, criado no primeiro uso: inspecionar as
+# bibliotecas carregadas a cada chamada custaria mais que a reconstrução dos modelos pequenos
+_CONTROLADOR = None
+
+
+def executar_com_limite(threads: int, funcao, *args):
+    # Roda funcao(*args) com no máximo `threads` threads do BLAS. O limite vale para o processo
+    # inteiro: é exato nos workers do backend 'processo' (uma chamada por vez) e no 'inline'.
+    # No backend 'thread', chamadas simultâneas sobrescreveriam o limite umas das outras e o
+    # restaurariam fora de ordem; por isso ExecutorComOrcamento não o aceita.
+    # Operadores em blocos processam vários blocos ao mesmo tempo: as threads são divididas
+    # entre os blocos e o BLAS de cada um, para que o total não passe da concessão.
+    global _CONTROLADOR
+    if _CONTROLADOR is None:
+        _CONTROLADOR = _modulo_threadpoolctl().ThreadpoolController()
+    with contextlib.ExitStack() as pilha:
+        threads_blas = threads
+        for operador in [a for a in args if isinstance(a, OperadorHBlocos)]:
+            threads_blas = min(threads_blas, pilha.enter_context(operador.limitar_threads(threads)))
+        pilha.enter_context(_CONTROLADOR.limit(limits=threads_blas, user_api="blas"))
+        return funcao(*args)
+
+
+class OrcamentoThreads:
+    # Divide `nucleos` núcleos entre as reconstruções em execução. Cada reconstrução recebe um
+    # número de threads do BLAS ao começar e o devolve ao terminar; a soma das concessões nunca
+    # passa do orçamento, e quem não encontra livre o mínimo do seu modelo aguarda, em ordem de
+    # chegada. A parcela acompanha a demanda: sem concorrência uma reconstrução usa até o máximo
+    # do modelo; com muitas em execução, aguardando ou prestes a sair da fila, cada uma fica com nucleos / demanda.
+    # Usado apenas pelo event loop (sem locks).
+
+    def __init__(self, nucleos: int, limites_modelo, demanda_externa=None, ao_conceder=None):
+        # limites_modelo(modelo_id) -> (mínimo, máximo) de threads por reconstrução (máximo 0 = todos os núcleos);
+        # demanda_externa() -> tarefas da fila que começariam agora (há worker livre no modelo) e logo
+        # disputarão os núcleos; as que só começam depois de outra terminar não entram na divisão;
+        # ao_conceder(modelo_id, threads, espera_s) é chamada a cada concessão (métricas)
+        self.nucleos = nucleos
+        self.limites_modelo = limites_modelo
+        self.demanda_externa = demanda_externa
+        self.ao_conceder = ao_conceder
+        self.livres = nucleos
+        self.em_execucao = 0
+        self._espera = collections.deque() # (modelo_id, futuro, início da espera)
+
+    @property
+    def aguardando(self) -> int:
+        return len(self._espera)
+
+    def _limites(self, modelo_id: str) -> tuple[int, int]:
+        minimo, maximo = self.limites_modelo(modelo_id)
+        maximo = max(1, min(maximo or self.nucleos, self.nucleos))
+        return max(1, min(minimo, maximo)), maximo
+
+    def _parcela(self, modelo_id: str) -> int:
+        # Threads para a reconstrução que está sendo admitida (fora da fila de espera),
+        # ou None se o mínimo do modelo não estiver livre
+        minimo, maximo = self._limites(modelo_id)
+        if self.livres < minimo:
+            return None
+        demanda = self.em_execucao + len(self._espera) + 1
+        if self.demanda_externa is not None:
+            demanda += self.demanda_externa()
+        return max(minimo, min(maximo, self.livres, self.nucleos // demanda))
+
+    def _conceder(self, modelo_id: str, threads: int, inicio: float) -> None:
+        self.livres -= threads
+        self.em_execucao += 1
+        if self.ao_conceder is not None:
+            self.ao_conceder(modelo_id, threads, time.perf_counter() - inicio)
+
+    def _liberar(self, threads: int) -> None:
+        self.livres += threads
+        self.em_execucao -= 1
+        self._despertar()
+
+    def _despertar(self) -> None:
+        # Admite, em ordem de chegada, enquanto o primeiro da espera couber no que está livre
+        while self._espera:
+            item = self._espera.popleft()
+            modelo_id, futuro, inicio = item
+            if futuro.done():
+                continue
+            threads = self._parcela(modelo_id)
+            if threads is None:
+                self._espera.appendleft(item)
+                break
+            self._conceder(modelo_id, threads, inicio)
+            futuro.set_result(threads)
+
+    @contextlib.asynccontextmanager
+    async def reservar(self, modelo_id: str):
+        inicio = time.perf_counter()
+        threads = None if self._espera else self._parcela(modelo_id)
+        if threads is not None:
+            self._conceder(modelo_id, threads, inicio)
+        else:
+            item = (modelo_id, asyncio.get_running_loop().create_future(), inicio)
+            self._espera.append(item)
+            try:
+                threads = await item[1]
+            except asyncio.CancelledError:
+                # Cancelada na espera; se a concessão chegou junto com o cancelamento, é devolvida
+                if item in self._espera:
+                    self._espera.remove(item)
+                    self._despertar()
+                elif item[1].done() and not item[1].cancelled():
+                    self._liberar(item[1].result())
+                raise
+        try:
+            yield threads
+        finally:
+            self._liberar(threads)
+
+    def estado(self) -> dict:
+        return {
+            "nucleos": self.nucleos,
+            "livres": self.livres,
+            "em_execucao": self.em_execucao,
+            "aguardando": self.aguardando,
+        }
+
+
+class ExecutorComOrcamento(ExecutorSolver):
+    # Envolve outro backend: cada chamada aguarda sua parcela do orçamento e roda com esse
+    # limite de threads do BLAS
+
+    def __init__(self, executor: ExecutorSolver, orcamento: OrcamentoThreads):
+        if not self.suporta(executor):
+            raise ValueError(f"O orçamento de threads do BLAS não é suportado no backend '{executor.nome}'.")
+        _modulo_threadpoolctl() # falta da dependência aparece na inicialização, não na primeira reconstrução
+        self.executor = executor
+        self.orcamento = orcamento
+        self.nome = executor.nome
+        self.entre_processos = executor.entre_processos
+
+    @staticmethod
+    def suporta(executor: ExecutorSolver) -> bool:
+        # O limite do threadpoolctl é global ao processo: só é exato com uma chamada por vez em cada um
+        return executor.nome != "thread"
+
+    async def executar(self, funcao, *args, modelo_id: str = None):
+        async with self.orcamento.reservar(modelo_id) as threads:
+            return await self.executor.executar(executar_com_limite, threads, funcao, *args)
+
+    def encerrar(self) -> None:
+        self.executor.encerrar()
@@ -0,0 +1,186 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from compartilhado.util import gerar_imagem_reconstruida
+
+# Colunas indexáveis; o registro completo fica em 'metadados' (JSON)
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS reconstrucoes (
+    id_reconstrucao TEXT PRIMARY KEY,
+    identificacao_usuario TEXT NOT NULL,
+    algoritmo_utilizado TEXT NOT NULL,
+    modelo_imagem_id TEXT,
+    data_hora_inicio TEXT NOT NULL,
+    data_hora_termino TEXT NOT NULL,
+    tempo_reconstrucao_ms REAL,
+    numero_iteracoes INTEGER,
+    caminho_imagem TEXT,
+    metadados TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reconstrucoes_inicio ON reconstrucoes (data_hora_inicio, id_reconstrucao);
+CREATE INDEX IF NOT EXISTS idx_reconstrucoes_usuario ON reconstrucoes (identificacao_usuario, data_hora_inicio);
+CREATE INDEX IF NOT EXISTS idx_reconstrucoes_algoritmo ON reconstrucoes (algoritmo_utilizado, data_hora_inicio);
+CREATE INDEX IF NOT EXISTS idx_reconstrucoes_modelo ON reconstrucoes (modelo_imagem_id, data_hora_inicio);
+"""
+
+_INSERCAO = """
+INSERT OR REPLACE INTO reconstrucoes (
+    id_reconstrucao, identificacao_usuario, algoritmo_utilizado, modelo_imagem_id, data_hora_inicio,
+    data_hora_termino, tempo_reconstrucao_ms, numero_iteracoes, caminho_imagem, metadados
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_FIM = object()
+
+
+def _conectar(caminho_banco: str) -> sqlite3.Connection:
+    conexao = sqlite3.connect(caminho_banco, timeout=30)
+    conexao.execute("PRAGMA journal_mode=WAL") # leitores não bloqueiam o gravador
+    conexao.execute("PRAGMA synchronous=NORMAL")
+    return conexao
+
+
+class GravadorReconstrucoes:
+    # Persistência fora do caminho da requisição: a resposta sai assim que a reconstrução termina
+    # e uma thread grava as imagens PNG (em subpastas pelos primeiros caracteres do id) e insere
+    # os metadados no SQLite em lotes de até tamanho_lote registros por transação.
+    # ao_medir(etapa, segundos, metadados), opcional, recebe o tempo de codificação da imagem e
+    # de persistência de cada reconstrução (a transação do lote é dividida entre os registros).
+
+    def __init__(self, caminho_banco: str, pasta_imagens: str, tamanho_lote: int, intervalo_s: float,
+                 ao_medir=None):
+        self.caminho_banco = caminho_banco
+        self.ao_medir = ao_medir
+        self.pasta_imagens = pasta_imagens
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_s = intervalo_s
+        self.gravados = 0
+        self.falhas = 0
+        self._fila = queue.Queue()
+        self._pendentes = set() # ids enfileirados e ainda não gravados
+        self._trava = threading.Lock()
+        os.makedirs(os.path.dirname(caminho_banco), exist_ok=True)
+        with _conectar(caminho_banco) as conexao:
+            conexao.executescript(_ESQUEMA)
+        conexao.close()
+        self._thread = threading.Thread(target=self._gravar, name="gravador-reconstrucoes", daemon=True)
+        self._thread.start()
+
+    def caminho_relativo_imagem(self, id_reconstrucao: str) -> str:
+        # Duas camadas de 256 subpastas: nenhuma pasta acumula milhões de arquivos
+        return os.path.join(id_reconstrucao[:2], id_reconstrucao[2:4], f"imagem_reconstruida_{id_reconstrucao}.png")
+
+    def caminho_imagem(self, id_reconstrucao: str) -> str:
+        return os.path.join(self.pasta_imagens, self.caminho_relativo_imagem(id_reconstrucao))
+
+    def registrar(self, f_reconstruido, dimensoes_imagem: tuple, metadados: dict) -> None:
+        with self._trava:
+            self._pendentes.add(metadados["id_reconstrucao"])
+        self._fila.put((f_reconstruido, dimensoes_imagem, metadados))
+
+    def estatisticas(self) -> dict:
+        with self._trava:
+            pendentes = len(self._pendentes)
+        return {"pendentes": pendentes, "gravados": self.gravados, "falhas": self.falhas}
+
+    def encerrar(self) -> None:
+        # Grava o que ainda estiver na fila antes de retornar
+        self._fila.put(_FIM)
+        self._thread.join()
+
+    def consultar(self, usuario: str = None, algoritmo: str = None, modelo: str = None,
+                  inicio: str = None, fim: str = None, limite: int = 50, cursor: str = None) -> tuple[list, str]:
+        # Mais recentes primeiro; paginação por cursor (data_hora_inicio|id do último item da página)
+        condicoes, parametros = [], []
+        for coluna, valor in (("identificacao_usuario", usuario), ("algoritmo_utilizado", algoritmo),
+                              ("modelo_imagem_id", modelo)):
+            if valor is not None:
+                condicoes.append(f"{coluna} = ?")
+                parametros.append(valor)
+        if inicio is not None:
+            condicoes.append("data_hora_inicio >= ?")
+            parametros.append(inicio)
+        if fim is not None:
+            condicoes.append("data_hora_inicio < ?")
+            parametros.append(fim)
+        if cursor is not None:
+            data_cursor, id_cursor = cursor.split("|", 1)
+            condicoes.append("(data_hora_inicio, id_reconstrucao) < (?, ?)")
+            parametros.extend([data_cursor, id_cursor])
+
+        sql = "SELECT data_hora_inicio, id_reconstrucao, metadados FROM reconstrucoes"
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        sql += " ORDER BY data_hora_inicio DESC, id_reconstrucao DESC LIMIT ?"
+        parametros.append(limite + 1)
+
+        conexao = _conectar(self.caminho_banco)
+        try:
+            linhas = conexao.execute(sql, parametros).fetchall()
+        finally:
+            conexao.close()
+        proximo_cursor = None
+        if len(linhas) > limite:
+            linhas = linhas[:limite]
+            proximo_cursor = f"{linhas[-1][0]}|{linhas[-1][1]}"
+        return [json.loads(metadados) for _, _, metadados in linhas], proximo_cursor
+
+    def _gravar(self) -> None:
+        conexao = _conectar(self.caminho_banco)
+        encerrar = False
+        while not encerrar:
+            item = self._fila.get()
+            lote = []
+            # Junta o que chegar até completar o lote ou passar o intervalo
+            while item is not _FIM:
+                lote.append(item)
+                if len(lote) >= self.tamanho_lote:
+                    break
+                try:
+                    item = self._fila.get(timeout=self.intervalo_s)
+                except queue.Empty:
+                    break
+            encerrar = item is _FIM
+
+            linhas, gravados = [], []
+            for f_reconstruido, dimensoes_imagem, metadados in lote:
+                try:
+                    inicio = time.perf_counter()
+                    os.makedirs(os.path.dirname(metadados["caminho_imagem"]), exist_ok=True)
+                    gerar_imagem_reconstruida(f_reconstruido, dimensoes_imagem).save(metadados["caminho_imagem"])
+                    self._medir("codificacao_imagem", time.perf_counter() - inicio, metadados)
+                    linhas.append(_linha(metadados))
+                    gravados.append(metadados)
+                except Exception as e:
+                    self.falhas += 1
+                    print(f"[AVISO] Falha ao gravar a reconstrução {metadados['id_reconstrucao']}: {e}")
+            try:
+                inicio = time.perf_counter()
+                with conexao:
+                    conexao.executemany(_INSERCAO, linhas)
+                self.gravados += len(linhas)
+                for metadados in gravados:
+                    self._medir("persistencia", (time.perf_counter() - inicio) / len(gravados), metadados)
+            except sqlite3.Error as e:
+                self.falhas += len(linhas)
+                print(f"[AVISO] Falha ao inserir {len(linhas)} reconstruções no banco: {e}")
+            with self._trava:
+                self._pendentes.difference_update(metadados["id_reconstrucao"] for _, _, metadados in lote)
+        conexao.close()
+
+    def _medir(self, etapa: str, segundos: float, metadados: dict) -> None:
+        if self.ao_medir is not None:
+            self.ao_medir(etapa, segundos, metadados)
+
+
+def _linha(metadados: dict) -> tuple:
+    return (
+        metadados["id_reconstrucao"], metadados["identificacao_usuario"], metadados["algoritmo_utilizado"],
+        metadados.get("modelo_imagem_id"), metadados["data_hora_inicio"], metadados["data_hora_termino"],
+        metadados["tempo_reconstrucao_ms"], metadados["numero_iteracoes"], metadados["caminho_imagem"],
+        json.dumps(metadados),
+    )
@@ -0,0 +1,378 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from compartilhado.constantes import (
+    DIMENSOES_H_30X30, S_PARA_GANHO_30X30, N_PARA_GANHO_30X30, MAX_ITERACOES_30X30, TOLERANCIA_30X30,
+    DIMENSOES_H_60X60, S_PARA_GANHO_60X60, N_PARA_GANHO_60X60, MAX_ITERACOES_60X60, TOLERANCIA_60X60,
+    DIMENSOES_IMAGEM_30X30, DIMENSOES_IMAGEM_60X60,
+    N_SENSORES_PADRAO, MAX_ITERACOES_PADRAO, TOLERANCIA_PADRAO,
+    FORMATO_MATRIZ_H, LIMIAR_DENSIDADE_ESPARSA, MODELOS_COMPARTILHADOS,
+    PRECISAO_PADRAO, PRECISAO_MODELOS, CONCORRENCIA_TAREFAS, CONCORRENCIA_TAREFAS_PADRAO,
+    POSTO_SVD_PADRAO, POSTO_SVD_MODELOS, PRECONDICIONADOR_PADRAO, PRECONDICIONADOR_MODELOS,
+    THREADS_BLAS_MINIMO, THREADS_BLAS_MAXIMO, THREADS_BLAS_MINIMO_PADRAO, THREADS_BLAS_MAXIMO_PADRAO,
+    LIMITE_H_EM_MEMORIA_MB, BLOCOS_H_MB, BLOCOS_H_THREADS, BLOCOS_H_ANTECIPADOS, BLOCOS_H_COMPRESSAO,
+    PARADA_MIN_ITERACOES, PARADA_TAU_DISCREPANCIA, PARADA_RUIDO_SINAL,
+    PARADA_JANELA_ESTAGNACAO, PARADA_REDUCAO_ESTAGNACAO, PARADA_TEMPO_MAXIMO_S
+)
+from servidor.algoritmos.precondicionadores import validar_precondicionador
+from servidor.algoritmos.parada import PoliticaParada
+from servidor.algoritmos.operador_h import (
+    OperadorH, OperadorHEsparso, OperadorHBlocos, MatrizBlocos, ARQUIVO_INDICE_BLOCOS,
+    converter_para_esparsa, salvar_esparsa, carregar_esparsa, carregar_derivado, salvar_blocos
+)
+
+# matriz_h_<id>.npy; arquivos derivados (Hᵀ, HᵀH, SVD, cópias em outra precisão) não são modelos
+_PADRAO_ARQUIVO_MODELO = re.compile(r"^matriz_h_(?P<id>.+)\.npy$")
+_PADRAO_ARQUIVO_DERIVADO = re.compile(r"_(ht|gram|float32|float64|svd_\w+)$")
+
+
+class ConfigModelo:
+    # Geometria e parâmetros de reconstrução de um modelo
+
+    def __init__(self, modelo_id: str, arquivo: str, dimensoes_h: tuple, dimensoes_imagem: tuple,
+                 S_amostras: int, N_sensores: int, max_iteracoes: int, tolerancia: float,
+                 precisao: str, concorrencia: int, posto_svd: int = None, precondicionador: str = None,
+                 threads_blas_minimo: int = THREADS_BLAS_MINIMO_PADRAO, threads_blas_maximo: int = THREADS_BLAS_MAXIMO_PADRAO,
+                 parada: PoliticaParada = None):
+        self.modelo_id = modelo_id
+        self.arquivo = arquivo
+        self.dimensoes_h = tuple(dimensoes_h) if dimensoes_h else None
+        self.dimensoes_imagem = tuple(dimensoes_imagem) if dimensoes_imagem else None
+        self.S_amostras = S_amostras
+        self.N_sensores = N_sensores
+        self.max_iteracoes = max_iteracoes
+        self.tolerancia = tolerancia
+        self.precisao = precisao
+        self.concorrencia = concorrencia
+        self.posto_svd = posto_svd # valores singulares usados pelo algoritmo SVD (None = todos)
+        self.precondicionador = validar_precondicionador(precondicionador) # CGNE/CGNR: 'jacobi', 'bloco[:tamanho]' ou None
+        # Threads do BLAS por reconstrução quando há orçamento de núcleos (máximo 0 = todo o orçamento)
+        self.threads_blas_minimo = threads_blas_minimo
+        self.threads_blas_maximo = threads_blas_maximo
+        # Critérios de parada do CGNE/CGNR além de max_iteracoes e tolerancia
+        self.parada = parada if parada is not None else _politica_parada({})
+
+    def para_dict(self) -> dict:
+        return {
+            "arquivo": os.path.basename(self.arquivo),
+            "dimensoes_h": self.dimensoes_h,
+            "dimensoes_imagem": self.dimensoes_imagem,
+            "S_amostras": self.S_amostras,
+            "N_sensores": self.N_sensores,
+            "max_iteracoes": self.max_iteracoes,
+            "tolerancia": self.tolerancia,
+            "precisao": self.precisao,
+            "concorrencia": self.concorrencia,
+            "posto_svd": self.posto_svd,
+            "precondicionador": self.precondicionador,
+            "threads_blas_minimo": self.threads_blas_minimo,
+            "threads_blas_maximo": self.threads_blas_maximo,
+            "parada": self.parada.descrever(),
+        }
+
+
+def _politica_parada(entrada: dict) -> PoliticaParada:
+    # Campos do manifesto, com os valores globais (PARADA_*) como padrão
+    return PoliticaParada(
+        entrada.get("min_iteracoes", PARADA_MIN_ITERACOES),
+        entrada.get("tau_discrepancia", PARADA_TAU_DISCREPANCIA),
+        entrada.get("ruido_sinal", PARADA_RUIDO_SINAL),
+        entrada.get("janela_estagnacao", PARADA_JANELA_ESTAGNACAO),
+        entrada.get("reducao_estagnacao", PARADA_REDUCAO_ESTAGNACAO),
+        entrada.get("tempo_maximo_s", PARADA_TEMPO_MAXIMO_S),
+    )
+
+
+def _modelos_embutidos(pasta: str) -> dict:
+    # Modelos originais do projeto, disponíveis mesmo sem manifesto
+    def config(modelo_id, dimensoes_h, dimensoes_imagem, S, N, max_iter, tol):
+        return ConfigModelo(
+            modelo_id, os.path.join(pasta, f"matriz_h_{modelo_id}.npy"), dimensoes_h, dimensoes_imagem,
+            S, N, max_iter, tol, PRECISAO_MODELOS.get(modelo_id, PRECISAO_PADRAO),
+            CONCORRENCIA_TAREFAS.get(modelo_id, CONCORRENCIA_TAREFAS_PADRAO),
+            POSTO_SVD_MODELOS.get(modelo_id, POSTO_SVD_PADRAO) or None,
+            PRECONDICIONADOR_MODELOS.get(modelo_id, PRECONDICIONADOR_PADRAO) or None,
+            THREADS_BLAS_MINIMO.get(modelo_id, THREADS_BLAS_MINIMO_PADRAO),
+            THREADS_BLAS_MAXIMO.get(modelo_id, THREADS_BLAS_MAXIMO_PADRAO),
+        )
+    # Configuração inválida vinda do ambiente (ex.: PRECONDICIONADOR_30X30) exclui o modelo, como no manifesto
+    configs = {}
+    for argumentos in (
+        ("30x30_modelo1", DIMENSOES_H_30X30, DIMENSOES_IMAGEM_30X30,
+         S_PARA_GANHO_30X30, N_PARA_GANHO_30X30, MAX_ITERACOES_30X30, TOLERANCIA_30X30),
+        ("60x60_modelo1", DIMENSOES_H_60X60, DIMENSOES_IMAGEM_60X60,
+         S_PARA_GANHO_60X60, N_PARA_GANHO_60X60, MAX_ITERACOES_60X60, TOLERANCIA_60X60),
+    ):
+        try:
+            configs[argumentos[0]] = config(*argumentos)
+        except ValueError as e:
+            print(f"[AVISO] Modelo '{argumentos[0]}' ignorado: {e}")
+    return configs
+
+
+def _config_inferida(modelo_id: str, arquivo: str, entrada: dict) -> ConfigModelo:
+    # Completa o que o manifesto não informa a partir do cabeçalho do .npy:
+    # imagem quadrada com n = lado² pixels e m = N·S linhas
+    dimensoes_h = entrada.get("dimensoes_h")
+    if dimensoes_h is None:
+        if not os.path.exists(arquivo):
+            raise ValueError("dimensoes_h não informada e arquivo da matriz H inexistente")
+        dimensoes_h = np.load(arquivo, mmap_mode="r").shape
+    m, n = dimensoes_h
+
+    dimensoes_imagem = entrada.get("dimensoes_imagem")
+    if dimensoes_imagem is None:
+        lado = math.isqrt(n)
+        if lado * lado != n:
+            raise ValueError(f"{n} colunas não formam uma imagem quadrada; informe dimensoes_imagem")
+        dimensoes_imagem = (lado, lado)
+
+    N = entrada.get("N_sensores", N_SENSORES_PADRAO)
+    S = entrada.get("S_amostras", m // N)
+    if N * S != m:
+        raise ValueError(f"N_sensores*S_amostras ({N}*{S}) difere das {m} linhas de H")
+
+    return ConfigModelo(
+        modelo_id, arquivo, dimensoes_h, dimensoes_imagem, S, N,
+        entrada.get("max_iteracoes", MAX_ITERACOES_PADRAO),
+        entrada.get("tolerancia", TOLERANCIA_PADRAO),
+        entrada.get("precisao", PRECISAO_MODELOS.get(modelo_id, PRECISAO_PADRAO)),
+        entrada.get("concorrencia", CONCORRENCIA_TAREFAS.get(modelo_id, CONCORRENCIA_TAREFAS_PADRAO)),
+        entrada.get("posto_svd", POSTO_SVD_MODELOS.get(modelo_id, POSTO_SVD_PADRAO)) or None,
+        entrada.get("precondicionador", PRECONDICIONADOR_MODELOS.get(modelo_id, PRECONDICIONADOR_PADRAO)),
+        entrada.get("threads_blas_minimo", THREADS_BLAS_MINIMO.get(modelo_id, THREADS_BLAS_MINIMO_PADRAO)),
+        entrada.get("threads_blas_maximo", THREADS_BLAS_MAXIMO.get(modelo_id, THREADS_BLAS_MAXIMO_PADRAO)),
+        _politica_parada(entrada),
+    )
+
+
+def carregar_operador(config: ConfigModelo, precisao: str) -> OperadorH:
+    modelo_id = config.modelo_id
+    dtype = np.dtype(precisao)
+    caminho_npy = config.arquivo
+    # Arquivo auxiliar com a versão CSR da matriz, gerado na primeira conversão
+    caminho_csr = f"{os.path.splitext(caminho_npy)[0]}_csr.npz"
+    usar_esparsa = FORMATO_MATRIZ_H in ("esparsa", "auto")
+
+    if usar_esparsa and os.path.exists(caminho_csr):
+        print(f"Carregando matriz H esparsa para modelo {modelo_id} de {caminho_csr}...")
+        return OperadorHEsparso(carregar_esparsa(caminho_csr).astype(dtype, copy=False), arquivo_modelo=caminho_csr)
+
+    limite_bytes = int(LIMITE_H_EM_MEMORIA_MB * 1024 * 1024)
+    if limite_bytes and config.dimensoes_h and math.prod(config.dimensoes_h) * dtype.itemsize > limite_bytes:
+        return carregar_operador_blocos(config, precisao, limite_bytes)
+
+    if not os.path.exists(caminho_npy):
+
+        raise FileNotFoundError(
+            f"Arquivo da matriz H não encontrado para o modelo '{modelo_id}' em {caminho_npy}. "
+            "Por favor, coloque os arquivos .npy das matrizes H na pasta 'servidor/modelos/'."
+        )
+
+    print(f"Carregando matriz H para modelo {modelo_id} de {caminho_npy} ({precisao})...")
+    if MODELOS_COMPARTILHADOS:
+        caminho_mapeado = caminho_npy
+        if dtype != np.float64:
+            # Cópia em precisão simples persistida ao lado do .npy original e mapeada por todos os workers
+            caminho_mapeado = f"{os.path.splitext(caminho_npy)[0]}_{precisao}.npy"
+            carregar_derivado(caminho_mapeado, caminho_npy,
+                              lambda: np.load(caminho_npy, mmap_mode='r').astype(dtype))
+        matriz_h = OperadorH(np.load(caminho_mapeado, mmap_mode='r'), arquivo_origem=caminho_mapeado)
+    elif dtype != np.float64:
+        # Conversão lida do mapeamento: a versão float64 nunca fica inteira na memória do processo
+        matriz_h = OperadorH(np.load(caminho_npy, mmap_mode='r').astype(dtype), arquivo_modelo=caminho_npy)
+    else:
+        matriz_h = OperadorH(np.load(caminho_npy), arquivo_modelo=caminho_npy)
+    if usar_esparsa:
+        densidade = matriz_h.densidade
+        print(f"Densidade da matriz H do modelo {modelo_id}: {densidade:.2%}")
+        if FORMATO_MATRIZ_H == "esparsa" or densidade < LIMIAR_DENSIDADE_ESPARSA:
+            h_csr = converter_para_esparsa(matriz_h.H)
+            if dtype == np.float64:
+                # O arquivo CSR guarda sempre a versão float64; as demais precisões convertem ao carregar
+                salvar_esparsa(caminho_csr, h_csr)
+                print(f"Matriz H convertida para CSR e salva em {caminho_csr}.")
+            matriz_h = OperadorHEsparso(h_csr, arquivo_modelo=caminho_csr if dtype == np.float64 else caminho_npy)
+    return matriz_h
+
+
+def carregar_operador_blocos(config: ConfigModelo, precisao: str, limite_bytes: int) -> OperadorHBlocos:
+    # H maior que o limite de memória: blocos de linhas em disco, gerados uma vez a partir do .npy
+    # (lido com mmap, um bloco por vez). A pasta pode também ser fornecida pronta, sem o .npy.
+    caminho_npy = config.arquivo
+    pasta = f"{os.path.splitext(caminho_npy)[0]}_blocos_{precisao}"
+    caminho_indice = os.path.join(pasta, ARQUIVO_INDICE_BLOCOS)
+    desatualizada = os.path.exists(caminho_npy) and (
+        not os.path.exists(caminho_indice) or os.path.getmtime(caminho_indice) < os.path.getmtime(caminho_npy)
+        or MatrizBlocos(pasta).compressao != BLOCOS_H_COMPRESSAO
+    )
+    if desatualizada:
+        H = np.load(caminho_npy, mmap_mode="r")
+        linhas_por_bloco = max(1, int(BLOCOS_H_MB * 1024 * 1024) // (H.shape[1] * np.dtype(precisao).itemsize))
+        print(f"Dividindo a matriz H do modelo {config.modelo_id} em blocos de {linhas_por_bloco} linhas em {pasta}...")
+        salvar_blocos(pasta, H, linhas_por_bloco, precisao, BLOCOS_H_COMPRESSAO)
+    elif not os.path.exists(caminho_indice):
+        raise FileNotFoundError(
+            f"Arquivo da matriz H não encontrado para o modelo '{config.modelo_id}' em {caminho_npy} nem em blocos em {pasta}."
+        )
+    print(f"Usando a matriz H do modelo {config.modelo_id} em blocos fora da memória ({pasta}).")
+    return OperadorHBlocos(MatrizBlocos(pasta), BLOCOS_H_THREADS, BLOCOS_H_ANTECIPADOS, limite_bytes)
+
+
+class RegistroModelos:
+    # Catálogo dos modelos servidos: modelos embutidos, entradas do manifesto (JSON
+    # {modelo_id: {campo: valor}}) e arquivos matriz_h_<id>.npy encontrados na pasta.
+    # Os operadores carregados ficam em um LRU por (modelo, precisão) limitado em bytes;
+    # ao passar do limite, os modelos frios mais antigos são descartados. Modelos fixos
+    # (pré-carregados) nunca são descartados.
+
+    def __init__(self, pasta: str, arquivo_manifesto: str, limite_bytes: int, fixos: list):
+        self.pasta = pasta
+        self.arquivo_manifesto = arquivo_manifesto
+        self.limite_bytes = limite_bytes
+        self.fixos = set(fixos)
+        self.configs = {}
+        self.remocoes = 0
+        self._operadores = OrderedDict() # (modelo_id, precisao) -> OperadorH, do menos ao mais recente
+        self._estados = {}
+        self._lock = threading.Lock()
+        self._locks_carga = {}
+
+    def descobrir(self) -> None:
+        configs = _modelos_embutidos(self.pasta)
+
+        manifesto = {}
+        if os.path.exists(self.arquivo_manifesto):
+            with open(self.arquivo_manifesto) as f:
+                manifesto = json.load(f)
+        arquivos = {}
+        for nome in sorted(os.listdir(self.pasta)):
+            encontrado = _PADRAO_ARQUIVO_MODELO.match(nome)
+            if encontrado and not _PADRAO_ARQUIVO_DERIVADO.search(encontrado["id"]):
+                arquivos[encontrado["id"]] = os.path.join(self.pasta, nome)
+
+        for modelo_id in list(manifesto) + [m for m in arquivos if m not in manifesto and m not in configs]:
+            entrada = dict(manifesto.get(modelo_id, {}))
+            if modelo_id in configs:
+                # Manifesto sobrescreve campos de um modelo embutido
+                entrada = {**configs[modelo_id].para_dict(), "arquivo": configs[modelo_id].arquivo, **entrada}
+            arquivo = os.path.join(self.pasta, entrada.get("arquivo", f"matriz_h_{modelo_id}.npy"))
+            try:
+                configs[modelo_id] = _config_inferida(modelo_id, arquivo, entrada)
+            except Exception as e:
+                print(f"[AVISO] Modelo '{modelo_id}' ignorado: {e}")
+
+        self.configs = configs
+        for modelo_id, config in configs.items():
+            if modelo_id not in self._estados:
+                self._estados[modelo_id] = {"estado": "nao_carregado" if os.path.exists(config.arquivo) else "arquivo_ausente"}
+        print(f"Modelos registrados: {', '.join(sorted(configs))}")
+
+    def obter_config(self, modelo_id: str) -> ConfigModelo:
+        return self.configs.get(modelo_id)
+
+    def limites_threads_blas(self, modelo_id: str) -> tuple[int, int]:
+        config = self.configs.get(modelo_id)
+        if config is None:
+            return THREADS_BLAS_MINIMO_PADRAO, THREADS_BLAS_MAXIMO_PADRAO
+        return config.threads_blas_minimo, config.threads_blas_maximo
+
+    def obter_operador(self, modelo_id: str, precisao: str = None) -> OperadorH:
+        config = self.configs[modelo_id]
+        chave = (modelo_id, precisao or config.precisao)
+        with self._lock:
+            if chave in self._operadores:
+                self._operadores.move_to_end(chave)
+                # Hᵀ/HᵀH são montadas sob demanda: o tamanho do operador cresce após a carga
+                self._limitar_memoria()
+                return self._operadores[chave]
+            lock_carga = self._locks_carga.setdefault(chave, threading.Lock())
+
+        # Um único carregamento por chave; as demais threads aguardam e reaproveitam o resultado
+        with lock_carga:
+            with self._lock:
+                if chave in self._operadores:
+                    self._operadores.move_to_end(chave)
+                    return self._operadores[chave]
+            self._definir_estado(modelo_id, "carregando")
+            inicio = time.perf_counter()
+            try:
+                operador = carregar_operador(config, chave[1])
+            except Exception as e:
+                self._definir_estado(modelo_id, "arquivo_ausente" if isinstance(e, FileNotFoundError) else "erro", erro=str(e))
+                raise
+            with self._lock:
+                self._operadores[chave] = operador
+                self._limitar_memoria()
+            self._definir_estado(modelo_id, "carregado", tempo_carga_s=time.perf_counter() - inicio)
+        return operador
+
+    def aquecer(self, modelo_id: str) -> OperadorH:
+        # Carrega o modelo (precisão configurada) e traz H, Hᵀ e HᵀH para a memória
+        operador = self.obter_operador(modelo_id)
+        self._definir_estado(modelo_id, "aquecendo")
+        operador.aquecer()
+        with self._lock:
+            self._limitar_memoria()
+        return operador
+
+    def registrar_pronto(self, modelo_id: str, tempo_aquecimento_s: float) -> None:
+        self._definir_estado(modelo_id, "pronto", tempo_aquecimento_s=tempo_aquecimento_s)
+
+    def registrar_erro(self, modelo_id: str, erro: str) -> None:
+        self._definir_estado(modelo_id, "erro", erro=erro)
+
+    def prontos(self) -> bool:
+        return all(self._estados.get(m, {}).get("estado") == "pronto" for m in self.fixos)
+
+    def estado(self) -> dict:
+        with self._lock:
+            carregados, mapeados = {}, {}
+            for (modelo_id, precisao), operador in self._operadores.items():
+                carregados.setdefault(modelo_id, {})[precisao] = operador.nbytes
+                mapeados.setdefault(modelo_id, {})[precisao] = operador.nbytes_mapeados
+            return {
+                "limite_bytes": self.limite_bytes,
+                "bytes_carregados": sum(sum(p.values()) for p in carregados.values()),
+                "remocoes": self.remocoes,
+                "modelos": {
+                    modelo_id: {
+                        **self._estados.get(modelo_id, {}),
+                        "fixo": modelo_id in self.fixos,
+                        "bytes_por_precisao": carregados.get(modelo_id, {}),
+                        "bytes_mapeados_por_precisao": mapeados.get(modelo_id, {}),
+                        "config": config.para_dict(),
+                    }
+                    for modelo_id, config in self.configs.items()
+                },
+            }
+
+    def _definir_estado(self, modelo_id: str, estado: str, **info) -> None:
+        anterior = self._estados.get(modelo_id, {})
+        # Tempos de carga/aquecimento são preservados entre as transições
+        self._estados[modelo_id] = {**{k: v for k, v in anterior.items() if k.startswith("tempo_")},
+                                    **info, "estado": estado}
+
+    def _limitar_memoria(self) -> None:
+        # Chamado com self._lock adquirido; o operador mais recente nunca é descartado
+        if self.limite_bytes <= 0:
+            return
+        total = sum(op.nbytes for op in self._operadores.values())
+        for chave in list(self._operadores)[:-1]:
+            if total <= self.limite_bytes:
+                break
+            if chave[0] in self.fixos:
+                continue
+            operador = self._operadores.pop(chave)
+            total -= operador.nbytes
+            self.remocoes += 1
+            print(f"Modelo {chave[0]} ({chave[1]}) descartado da memória (limite de {self.limite_bytes} bytes).")
+            if not any(m == chave[0] for m, _ in self._operadores):
+                self._estados[chave[0]] = {"estado": "nao_carregado"}
@@ -0,0 +1,78 @@
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SolucaoAnterior:
+    # Reconstrução guardada como ponto de partida de quadros seguintes
+
+    def __init__(self, f: np.ndarray, modelo_id: str, algoritmo: str, id_reconstrucao: str,
+                 iteracoes_referencia: int = None):
+        self.f = np.array(f, copy=True)
+        self.f.flags.writeable = False
+        self.modelo_id = modelo_id
+        self.algoritmo = algoritmo
+        self.id_reconstrucao = id_reconstrucao
+        # Iterações da última reconstrução da cadeia que partiu de zero (base das iterações economizadas)
+        self.iteracoes_referencia = iteracoes_referencia
+        self.instante = time.monotonic()
+
+
+class ArmazemSolucoes:
+    # Última solução de cada sessão e soluções recentes por id de reconstrução (frame_anterior),
+    # em memória. As chaves incluem o usuário: um sessao_id (escolhido pelo cliente) ou id de
+    # reconstrução de outro usuário não é encontrado. Cada índice guarda no máximo `capacidade`
+    # entradas (LRU); entradas sem uso há mais de ttl_s segundos são descartadas. Usado apenas
+    # pelo event loop (sem locks).
+
+    def __init__(self, capacidade: int, ttl_s: float):
+        self.capacidade = capacidade
+        self.ttl_s = ttl_s
+        self._sessoes = OrderedDict() # (usuário, sessao_id) -> SolucaoAnterior
+        self._reconstrucoes = OrderedDict() # (usuário, id_reconstrucao) -> SolucaoAnterior
+        self.contadores = {"acertos": 0, "falhas": 0, "expiradas": 0}
+
+    def obter(self, usuario: str, modelo_id: str, n: int, sessao_id: str = None,
+              id_reconstrucao: str = None) -> SolucaoAnterior:
+        # frame_anterior explícito tem precedência sobre a sessão; soluções de outro modelo não servem
+        self._expirar()
+        solucao = None
+        if id_reconstrucao is not None:
+            solucao = self._reconstrucoes.get((usuario, id_reconstrucao))
+        elif sessao_id is not None:
+            solucao = self._sessoes.get((usuario, sessao_id))
+        if solucao is None or solucao.modelo_id != modelo_id or solucao.f.shape[0] != n:
+            self.contadores["falhas"] += 1
+            return None
+        self.contadores["acertos"] += 1
+        solucao.instante = time.monotonic()
+        return solucao
+
+    def guardar(self, usuario: str, solucao: SolucaoAnterior, sessao_id: str = None) -> None:
+        if self.capacidade <= 0:
+            return
+        indices = [(self._reconstrucoes, (usuario, solucao.id_reconstrucao))]
+        if sessao_id is not None:
+            indices.append((self._sessoes, (usuario, sessao_id)))
+        for indice, chave in indices:
+            indice[chave] = solucao
+            indice.move_to_end(chave)
+            while len(indice) > self.capacidade:
+                indice.popitem(last=False)
+
+    def _expirar(self) -> None:
+        limite = time.monotonic() - self.ttl_s
+        for indice in (self._sessoes, self._reconstrucoes):
+            for chave in [c for c, solucao in indice.items() if solucao.instante < limite]:
+                del indice[chave]
+                self.contadores["expiradas"] += 1
+
+    def estatisticas(self) -> dict:
+        return {
+            "sessoes": len(self._sessoes),
+            "reconstrucoes": len(self._reconstrucoes),
+            "capacidade": self.capacidade,
+            "ttl_s": self.ttl_s,
+            **self.contadores,
+        }
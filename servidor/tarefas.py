@@ -0,0 +1,321 @@
+import asyncio
+import datetime
+import itertools
+import math
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+# Menor valor = atendida primeiro
+PRIORIDADES = {"alta": 0, "normal": 1, "baixa": 2}
+
+
+class FilaCheia(Exception):
+    # Rejeição imediata na admissão, com estimativa (segundos) para o cabeçalho Retry-After
+    def __init__(self, status_code: int, mensagem: str, retry_after: int):
+        super().__init__(mensagem)
+        self.status_code = status_code
+        self.mensagem = mensagem
+        self.retry_after = retry_after
+
+
+class TarefaCancelada(Exception):
+    # Lançada pela execução de uma tarefa interrompida por cancelamento
+    status_code = 499
+    detail = "Reconstrução cancelada."
+
+
+class Tarefa:
+
+    def __init__(self, modelo_id: str, usuario: str, prioridade: str, executar, chave: str = None,
+                 agrupavel: bool = False, concluir=None):
+        self.id_tarefa = str(uuid.uuid4())
+        self.chave = chave
+        self.agrupavel = agrupavel # resolvida pelo agendador de lotes, junto com outras tarefas
+        self.modelo_id = modelo_id
+        self.usuario = usuario
+        self.prioridade = prioridade
+        self.estado = "na_fila"
+        self.criada_em = datetime.datetime.now()
+        self.iniciada_em = None
+        self.concluida_em = None
+        self.resultado = None
+        self.status_code = None
+        self.erro = None
+        self.concluida = asyncio.Event()
+        self.cancelamento_solicitado = False # execução abandonada: nenhuma tarefa a aguarda mais
+        self.em_execucao = False
+        self.na_fila = False # entrada viva na fila do modelo (contada em FilaTarefas._na_fila)
+        self.lider = None # tarefa cuja execução esta acompanha (single-flight)
+        self.seguidoras = []
+        self._controle = None
+        self._executar = executar
+        self._concluir = concluir
+
+    @property
+    def controle(self):
+        # Objeto com cancelar(), definido pela execução (ex.: ControleReconstrucao); o da líder nas seguidoras
+        return self.lider.controle if self.lider is not None else self._controle
+
+    @controle.setter
+    def controle(self, controle) -> None:
+        self._controle = controle
+
+    def para_dict(self) -> dict:
+        return {
+            "id_tarefa": self.id_tarefa,
+            "estado": self.estado,
+            "modelo_imagem_id": self.modelo_id,
+            "identificacao_usuario": self.usuario,
+            "prioridade": self.prioridade,
+            "criada_em": self.criada_em.isoformat(),
+            "iniciada_em": self.iniciada_em.isoformat() if self.iniciada_em else None,
+            "concluida_em": self.concluida_em.isoformat() if self.concluida_em else None,
+            "resultado": self.resultado,
+            "erro": self.erro,
+        }
+
+
+class FilaTarefas:
+    # Fila limitada de reconstruções: uma fila com prioridades por modelo, cada uma atendida
+    # por um número fixo de workers (concorrência por tamanho de modelo). Quando a fila do
+    # modelo ou a cota do usuário estão cheias, a tarefa é rejeitada na hora (503/429).
+    # Tarefas submetidas com a mesma chave enquanto uma delas não terminou compartilham
+    # a mesma execução (single-flight): cada requisição mantém a própria tarefa (id, usuário,
+    # cota e resultado), e as seguidoras acompanham a execução da líder, com a prioridade dela.
+    # Um worker que retira uma tarefa agrupável leva junto as
+    # agrupáveis seguintes da fila (até tamanho_grupo), executadas ao mesmo tempo para que o
+    # agendador de lotes as resolva numa única chamada multi-RHS.
+
+    def __init__(self, capacidade_por_modelo: int, maximo_por_usuario: int,
+                 concorrencia_por_modelo: dict, concorrencia_padrao: int, tarefas_retidas: int,
+                 tamanho_grupo: int = 1):
+        self.capacidade_por_modelo = capacidade_por_modelo
+        self.maximo_por_usuario = maximo_por_usuario
+        self.concorrencia_por_modelo = concorrencia_por_modelo
+        self.concorrencia_padrao = concorrencia_padrao
+        self.tarefas_retidas = tarefas_retidas
+        self.tamanho_grupo = tamanho_grupo
+        self._filas = {}
+        self._workers = {}
+        self._workers_ocupados = Counter() # modelo_id -> workers executando uma tarefa (ou grupo)
+        # modelo_id -> tarefas na fila ainda aguardadas; as abandonadas continuam na PriorityQueue
+        # até um worker descartá-las, mas não ocupam capacidade
+        self._na_fila = Counter()
+        self._duracao_media_s = {}
+        self._pendentes_por_usuario = Counter()
+        self._tarefas = OrderedDict()
+        self._em_andamento = {} # chave -> tarefa ainda não finalizada
+        self._sequencia = itertools.count()
+        self.coalescidas = 0
+
+    def concorrencia(self, modelo_id: str) -> int:
+        return self.concorrencia_por_modelo.get(modelo_id, self.concorrencia_padrao)
+
+    def profundidade(self, modelo_id: str = None) -> int:
+        if modelo_id is not None:
+            return self._na_fila[modelo_id]
+        return sum(self._na_fila.values())
+
+    def iniciaveis(self) -> int:
+        # Tarefas na fila que começariam agora: por modelo, no máximo os workers livres
+        return sum(
+            min(self._na_fila[modelo_id], self.concorrencia(modelo_id) - self._workers_ocupados[modelo_id])
+            for modelo_id in self._filas
+        )
+
+    def estimar_espera(self, modelo_id: str) -> int:
+        duracao = self._duracao_media_s.get(modelo_id, 1.0)
+        return max(1, math.ceil((self.profundidade(modelo_id) + 1) * duracao / self.concorrencia(modelo_id)))
+
+    def submeter(self, modelo_id: str, usuario: str, prioridade: str, executar, chave: str = None,
+                 agrupavel: bool = False, concluir=None) -> Tarefa:
+        # executar: função sem argumentos que devolve a corrotina da execução, compartilhada pelas
+        # tarefas de mesma chave; concluir(resultado_execucao): resultado desta requisição
+        if prioridade not in PRIORIDADES:
+            raise ValueError(f"Prioridade '{prioridade}' inválida. Use uma de {list(PRIORIDADES)}.")
+        self._verificar_usuario(modelo_id, usuario)
+        lider = self._em_andamento.get(chave) if chave is not None else None
+        if lider is not None:
+            self.coalescidas += 1
+            tarefa = Tarefa(modelo_id, usuario, prioridade, None, chave, concluir=concluir)
+            tarefa.lider = lider
+            if lider.em_execucao:
+                tarefa.estado = "executando"
+                tarefa.iniciada_em = datetime.datetime.now()
+            lider.seguidoras.append(tarefa)
+            self._registrar(tarefa)
+            self._pendentes_por_usuario[usuario] += 1
+            return tarefa
+        fila = self._obter_fila(modelo_id)
+        self._verificar_fila(modelo_id)
+
+        tarefa = Tarefa(modelo_id, usuario, prioridade, executar, chave, agrupavel, concluir)
+        self._registrar(tarefa)
+        if chave is not None:
+            self._em_andamento[chave] = tarefa
+        self._pendentes_por_usuario[usuario] += 1
+        fila.put_nowait((PRIORIDADES[prioridade], next(self._sequencia), tarefa))
+        tarefa.na_fila = True
+        self._na_fila[modelo_id] += 1
+        return tarefa
+
+    def verificar_admissao(self, modelo_id: str, usuario: str) -> None:
+        # FilaCheia se uma submissão agora seria rejeitada; permite recusar antes de receber o sinal
+        self._verificar_usuario(modelo_id, usuario)
+        self._verificar_fila(modelo_id)
+
+    def _verificar_usuario(self, modelo_id: str, usuario: str) -> None:
+        if self._pendentes_por_usuario[usuario] >= self.maximo_por_usuario:
+            raise FilaCheia(429, f"Usuário '{usuario}' já possui {self.maximo_por_usuario} tarefas pendentes.",
+                            self.estimar_espera(modelo_id))
+
+    def _verificar_fila(self, modelo_id: str) -> None:
+        if self._na_fila[modelo_id] >= self.capacidade_por_modelo:
+            raise FilaCheia(503, f"Fila do modelo '{modelo_id}' cheia ({self.capacidade_por_modelo} tarefas).",
+                            self.estimar_espera(modelo_id))
+
+    def registrar_concluida(self, modelo_id: str, usuario: str, prioridade: str, resultado: dict) -> Tarefa:
+        # Tarefa atendida sem execução (ex.: resultado em cache), consultável como as demais
+        tarefa = Tarefa(modelo_id, usuario, prioridade, None)
+        tarefa.estado = "concluida"
+        tarefa.iniciada_em = tarefa.concluida_em = tarefa.criada_em
+        tarefa.resultado = resultado
+        tarefa.concluida.set()
+        self._registrar(tarefa)
+        return tarefa
+
+    def obter(self, id_tarefa: str) -> Tarefa:
+        return self._tarefas.get(id_tarefa)
+
+    def cancelar(self, tarefa: Tarefa) -> bool:
+        # A tarefa é finalizada na hora. A execução só é abandonada quando nenhuma tarefa a
+        # aguarda mais: na fila, o worker ignora a entrada; em andamento, o cancelamento é
+        # repassado ao controle da reconstrução, que para na próxima iteração.
+        # Retorna False se a tarefa já terminou.
+        if tarefa.concluida.is_set():
+            return False
+        self._falhar(tarefa, TarefaCancelada())
+        self._finalizar(tarefa)
+        lider = tarefa.lider or tarefa
+        if not self._aguardando(lider):
+            lider.cancelamento_solicitado = True
+            self._retirar_da_fila(lider)
+            self._encerrar_execucao(lider)
+            if lider.controle is not None:
+                lider.controle.cancelar()
+        return True
+
+    def desistir(self, tarefa: Tarefa) -> None:
+        # Uma requisição deixou de aguardar a tarefa (ex.: cliente desconectado); a execução
+        # continua enquanto outra requisição de mesma chave a aguardar
+        self.cancelar(tarefa)
+
+    def _registrar(self, tarefa: Tarefa) -> None:
+        self._tarefas[tarefa.id_tarefa] = tarefa
+        # Descarta as tarefas finalizadas mais antigas além do limite de retenção; as que ainda
+        # estão na fila ou em execução são mantidas, sem impedir o descarte das seguintes
+        excedente = len(self._tarefas) - self.tarefas_retidas
+        if excedente > 0:
+            finalizadas = (id_tarefa for id_tarefa, t in self._tarefas.items() if t.concluida.is_set())
+            for id_antigo in list(itertools.islice(finalizadas, excedente)):
+                del self._tarefas[id_antigo]
+
+    def _obter_fila(self, modelo_id: str) -> asyncio.PriorityQueue:
+        if modelo_id not in self._filas:
+            self._filas[modelo_id] = asyncio.PriorityQueue()
+            self._workers[modelo_id] = [
+                asyncio.ensure_future(self._trabalhar(modelo_id)) for _ in range(self.concorrencia(modelo_id))
+            ]
+        return self._filas[modelo_id]
+
+    async def _trabalhar(self, modelo_id: str) -> None:
+        fila = self._filas[modelo_id]
+        while True:
+            _, _, tarefa = await fila.get()
+            self._retirar_da_fila(tarefa)
+            if tarefa.cancelamento_solicitado: # abandonada enquanto aguardava
+                fila.task_done()
+                continue
+            grupo = [tarefa]
+            if tarefa.agrupavel:
+                self._completar_grupo(fila, grupo)
+            self._workers_ocupados[modelo_id] += 1
+            try:
+                await asyncio.gather(*(self._executar(modelo_id, t) for t in grupo))
+            finally:
+                self._workers_ocupados[modelo_id] -= 1
+            for _ in grupo:
+                fila.task_done()
+
+    def _retirar_da_fila(self, tarefa: Tarefa) -> None:
+        if tarefa.na_fila:
+            tarefa.na_fila = False
+            self._na_fila[tarefa.modelo_id] -= 1
+
+    def _completar_grupo(self, fila: asyncio.PriorityQueue, grupo: list) -> None:
+        # Retira da fila as próximas tarefas agrupáveis; a primeira não agrupável volta para a
+        # fila com a mesma prioridade e sequência e encerra o grupo
+        while len(grupo) < self.tamanho_grupo and not fila.empty():
+            entrada = fila.get_nowait()
+            seguinte = entrada[2]
+            if seguinte.cancelamento_solicitado:
+                fila.task_done()
+            elif seguinte.agrupavel:
+                self._retirar_da_fila(seguinte)
+                grupo.append(seguinte)
+            else:
+                fila.put_nowait(entrada)
+                fila.task_done()
+                break
+
+    async def _executar(self, modelo_id: str, lider: Tarefa) -> None:
+        lider.em_execucao = True
+        for tarefa in self._aguardando(lider):
+            tarefa.estado = "executando"
+            tarefa.iniciada_em = datetime.datetime.now()
+        inicio = time.perf_counter()
+        try:
+            resultado = await lider._executar()
+            for tarefa in self._aguardando(lider):
+                try:
+                    tarefa.resultado = tarefa._concluir(resultado) if tarefa._concluir is not None else resultado
+                    tarefa.estado = "concluida"
+                except Exception as e:
+                    self._falhar(tarefa, e)
+                self._finalizar(tarefa)
+        except Exception as e:
+            for tarefa in self._aguardando(lider):
+                self._falhar(tarefa, e)
+                self._finalizar(tarefa)
+        finally:
+            duracao = time.perf_counter() - inicio
+            anterior = self._duracao_media_s.get(modelo_id, duracao)
+            self._duracao_media_s[modelo_id] = 0.8 * anterior + 0.2 * duracao
+            self._encerrar_execucao(lider)
+
+    def _aguardando(self, lider: Tarefa) -> list:
+        # Tarefas ainda não finalizadas que aguardam a execução da líder
+        return [tarefa for tarefa in (lider, *lider.seguidoras) if not tarefa.concluida.is_set()]
+
+    def _encerrar_execucao(self, lider: Tarefa) -> None:
+        # Novas submissões com a mesma chave passam a iniciar outra execução
+        if lider.chave is not None and self._em_andamento.get(lider.chave) is lider:
+            del self._em_andamento[lider.chave]
+
+    def _falhar(self, tarefa: Tarefa, erro: Exception) -> None:
+        if isinstance(erro, TarefaCancelada):
+            tarefa.estado = "cancelada"
+            tarefa.status_code = erro.status_code
+            tarefa.erro = erro.detail
+        else:
+            tarefa.estado = "erro"
+            tarefa.status_code = getattr(erro, "status_code", 500)
+            tarefa.erro = getattr(erro, "detail", str(erro))
+
+    def _finalizar(self, tarefa: Tarefa) -> None:
+        self._pendentes_por_usuario[tarefa.usuario] -= 1
+        if self._pendentes_por_usuario[tarefa.usuario] <= 0:
+            del self._pendentes_por_usuario[tarefa.usuario]
+        tarefa.concluida_em = datetime.datetime.now()
+        tarefa.concluida.set()